@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Асинхронный API видеоредактора для встраивания в сервисы (asyncio)
+
+Пример:
+    composer = AsyncVideoComposer(VIDEO_CONFIG)
+
+    # Просто дождаться результата
+    ok = await composer.create_video("input/images", "input/audio/music.mp3")
+
+    # Или следить за ходом рендеринга
+    job = composer.start("input/images", "input/audio/music.mp3")
+    async for event in job:
+        print(event.stage, f"{event.progress:.0%}")
+    ok = await job
+
+    # Отмена: FFmpeg завершается, рабочая папка задачи удаляется
+    job.cancel()
+
+Составление плана и рендеринг кадров идут в пуле потоков, FFmpeg
+управляется через asyncio.subprocess, поэтому цикл событий не блокируется
+и из одного цикла можно запускать много рендерингов одновременно.
+
+Видео всегда кодируется одним проходом: прогрессивный вывод и переменная
+частота кадров не поддерживаются (конструктор отклоняет такие настройки),
+а видеоклипы перекодируются вместе со слайдами. Превью строятся после
+кодирования так же, как в VideoComposer.
+
+Автор: [@EvilBabayka]
+Дата: 2025
+"""
+
+import os
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from video_composer import VideoComposer
+from ffmpeg_tools import frame_pipe_command
+from governor import BudgetExceededError, JobGovernor, ResourceBudget
+
+# Этапы задачи (последние три - конечные)
+STAGE_PLAN = "plan"
+STAGE_PREPARE = "prepare"
+STAGE_ENCODE = "encode"
+STAGE_DONE = "done"
+STAGE_FAILED = "failed"
+STAGE_CANCELLED = "cancelled"
+
+FINAL_STAGES = (STAGE_DONE, STAGE_FAILED, STAGE_CANCELLED)
+
+
+class RenderEvent:
+    """
+    Событие хода рендеринга
+    """
+
+    __slots__ = ("stage", "progress", "message")
+
+    def __init__(self, stage: str, progress: float = 0.0, message: str = ""):
+        """
+        Args:
+            stage: этап (plan, prepare, encode, done, failed, cancelled)
+            progress: общий прогресс задачи от 0.0 до 1.0
+            message: пояснение (например, текст ошибки)
+        """
+        self.stage = stage
+        self.progress = progress
+        self.message = message
+
+    @property
+    def final(self) -> bool:
+        """Последнее событие задачи"""
+        return self.stage in FINAL_STAGES
+
+    def to_dict(self) -> dict:
+        return {"stage": self.stage, "progress": self.progress, "message": self.message}
+
+    def __repr__(self) -> str:
+        return f"RenderEvent({self.stage!r}, {self.progress:.3f}, {self.message!r})"
+
+
+class RenderJob:
+    """
+    Запущенный рендеринг: его можно ждать (await), читать события
+    (async for) и отменять (cancel)
+    """
+
+    def __init__(self, coroutine_factory):
+        """
+        Args:
+            coroutine_factory: функция, которая получает задачу и возвращает
+                корутину рендеринга
+        """
+        self.events: asyncio.Queue = asyncio.Queue()
+        self.last_event: Optional[RenderEvent] = None
+        self.task = asyncio.ensure_future(coroutine_factory(self))
+        self.task.add_done_callback(self._finished)
+
+    def _finished(self, task: asyncio.Future):
+        # Задачу могли отменить до первого события (или корутина упала
+        # до своего обработчика): конечное событие нужно, иначе async for
+        # ждал бы его вечно
+        if self.last_event is not None and self.last_event.final:
+            return
+        if task.cancelled():
+            self.emit(STAGE_CANCELLED, 0.0)
+        elif task.exception() is not None:
+            self.emit(STAGE_FAILED, 0.0, str(task.exception()))
+        else:
+            self.emit(STAGE_DONE if task.result() else STAGE_FAILED, 1.0)
+
+    def emit(self, stage: str, progress: float = 0.0, message: str = ""):
+        """Публикует событие хода рендеринга"""
+        event = RenderEvent(stage, progress, message)
+        self.last_event = event
+        self.events.put_nowait(event)
+
+    def cancel(self) -> bool:
+        """Отменяет рендеринг (FFmpeg завершается, рабочая папка удаляется)"""
+        return self.task.cancel()
+
+    @property
+    def done(self) -> bool:
+        return self.task.done()
+
+    def __await__(self):
+        return self.task.__await__()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> RenderEvent:
+        if self.last_event is not None and self.last_event.final and self.events.empty():
+            raise StopAsyncIteration
+        return await self.events.get()
+
+
+class AsyncVideoComposer:
+    """
+    Асинхронная обертка над VideoComposer
+    """
+
+    def __init__(
+        self,
+        config: dict,
+        executor: Optional[ThreadPoolExecutor] = None,
+        frames_per_batch: Optional[int] = None,
+    ):
+        """
+        Args:
+            config: словарь с настройками (из config.py)
+            executor: пул для этапов, нагружающих процессор
+                (по умолчанию общий пул на все задачи этого объекта)
+            frames_per_batch: сколько кадров рендерить за одно обращение
+                к пулу (по умолчанию - секунда видео)
+
+        Raises:
+            ValueError: если включен прогрессивный вывод или VFR
+        """
+        # Эти режимы пишут файл своим способом, а асинхронный API кодирует
+        # один поток кадров - молча отдать другой файл хуже, чем отказать
+        if config.get("progressive_output"):
+            raise ValueError("Прогрессивный вывод не поддерживается асинхронным API")
+        if config.get("vfr_output"):
+            raise ValueError("Переменная частота кадров не поддерживается асинхронным API")
+
+        self.config = config
+        # Пул не больше бюджета потоков задачи
+        workers = JobGovernor(ResourceBudget.from_config(config)).workers(
+            config.get("async_workers")
+        )
+        self.executor = executor or ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="video_render"
+        )
+        self.frames_per_batch = frames_per_batch
+
+    async def create_video(
+        self,
+        images_folder: str,
+        audio_file: Optional[str],
+        subtitles_file: Optional[str] = None,
+        output_file: str = "output/result.mp4",
+    ) -> bool:
+        """
+        Создает видео и возвращает результат (аналог VideoComposer.create_video)
+
+        Returns:
+            bool: True если видео создано успешно
+        """
+        return await self.start(images_folder, audio_file, subtitles_file, output_file)
+
+    def start(
+        self,
+        images_folder: str,
+        audio_file: Optional[str],
+        subtitles_file: Optional[str] = None,
+        output_file: str = "output/result.mp4",
+    ) -> RenderJob:
+        """
+        Запускает рендеринг в фоне текущего цикла событий
+
+        Returns:
+            RenderJob: задача рендеринга
+        """
+        return RenderJob(
+            lambda job: self._run(
+                job, images_folder, audio_file, subtitles_file, output_file
+            )
+        )
+
+    async def _run(
+        self,
+        job: RenderJob,
+        images_folder: str,
+        audio_file: Optional[str],
+        subtitles_file: Optional[str],
+        output_file: str,
+    ) -> bool:
+        loop = asyncio.get_running_loop()
+
+        # У каждой задачи свой VideoComposer: в нем состояние рабочей папки
+        composer = VideoComposer(self.config)
+        # Кадры кодируются одним потоком, клип без перекодирования вставить
+        # некуда: план честно отмечает, что клипы перекодируются
+        composer.stream_copy_clips = False
+        workspace = None
+        try:
+            composer.governor.start()
+            job.emit(STAGE_PLAN, 0.0)
+            job_id, seed = composer.job_identity(
+                images_folder, audio_file, subtitles_file, output_file
+            )
+            plan = await loop.run_in_executor(
+                self.executor,
+                composer.build_plan,
+                images_folder,
+                audio_file,
+                subtitles_file,
+                output_file,
+                seed,
+            )
+            if not plan.slides:
+                job.emit(STAGE_FAILED, 0.0, "Не найдено изображений для обработки")
+                return False
+
+            # Меньше кадров впрок, если не влезаем в бюджет памяти
+            batch_size = self.frames_per_batch or max(1, int(round(plan.fps)))
+            batch_size = max(1, composer.apply_budget(plan, batch_size))
+
+            workspace = composer.open_workspace(job_id)
+            composer.workspace = workspace
+
+            job.emit(STAGE_PREPARE, 0.05)
+            video_clip = await loop.run_in_executor(
+                self.executor, lambda: composer._compose_clip(plan, with_audio=False)
+            )
+            if video_clip is None:
+                job.emit(STAGE_FAILED, 0.05, "Нет слайдов для рендеринга")
+                return False
+
+            try:
+                await self._encode(job, composer, plan, video_clip, loop, batch_size)
+            finally:
+                video_clip.close()
+
+            if composer.previews_enabled:
+                await loop.run_in_executor(self.executor, composer.write_previews, plan)
+
+            logging.info(f"Видео успешно создано: {plan.output_file}")
+            job.emit(STAGE_DONE, 1.0, plan.output_file)
+            return True
+
+        except asyncio.CancelledError:
+            logging.info(f"Рендеринг отменен: {output_file}")
+            job.emit(STAGE_CANCELLED, 0.0)
+            raise
+
+        except BudgetExceededError as e:
+            logging.error(f"Задача прервана ({e.status}): {e}")
+            job.emit(STAGE_FAILED, 0.0, f"{e.status}: {e}")
+            return False
+
+        except Exception as e:
+            logging.error(f"Ошибка при создании видео: {e}", exc_info=True)
+            job.emit(STAGE_FAILED, 0.0, str(e))
+            return False
+
+        finally:
+            composer.governor.stop()
+            # Отмена освобождает рабочую папку сразу, даже при возобновляемом
+            # рендеринге: задачу отменили намеренно
+            composer.workspace = None
+            if workspace is not None:
+                workspace.cleanup()
+
+    async def _encode(
+        self, job: RenderJob, composer, plan, video_clip, loop, batch_size: int
+    ):
+        """
+        Рендерит кадры в пуле и передает их в FFmpeg через asyncio
+
+        При отмене FFmpeg завершается, а недописанный файл удаляется.
+        """
+        duration = plan.final_duration
+        audio = plan.audio_source
+        part_file = f"{plan.output_file}.part.mp4"
+        command = frame_pipe_command(
+            plan.resolution,
+            plan.fps,
+            [(part_file, plan.encoder)],
+            audio_file=audio.param("path") if audio else None,
+            duration=duration,
+            threads=composer.governor.encoder_threads,
+        )
+
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        composer.governor.track(process.pid)
+        stderr_task = asyncio.ensure_future(process.stderr.read())
+
+        total_frames = max(1, int(round(duration * plan.fps)))
+        frames = video_clip.subclipped(0, duration).iter_frames(
+            fps=plan.fps, dtype="uint8"
+        )
+
+        def next_batch():
+            batch = []
+            for frame in frames:
+                batch.append(frame)
+                if len(batch) >= batch_size:
+                    break
+            return batch
+
+        pending = None
+        written = 0
+        try:
+            while True:
+                composer.governor.check()
+                pending = loop.run_in_executor(self.executor, next_batch)
+                batch = await pending
+                pending = None
+                if not batch:
+                    break
+
+                for frame in batch:
+                    # Непрерывный массив передается без копирования
+                    if frame.flags.c_contiguous:
+                        process.stdin.write(memoryview(frame).cast("B"))
+                    else:
+                        process.stdin.write(frame.tobytes())
+                await process.stdin.drain()
+
+                written += len(batch)
+                job.emit(STAGE_ENCODE, 0.05 + 0.9 * min(1.0, written / total_frames))
+
+            process.stdin.close()
+            returncode = await process.wait()
+            stderr = (await stderr_task).decode("utf-8", "replace").strip()
+            if returncode != 0:
+                error_tail = "\n".join(stderr.splitlines()[-10:])
+                raise RuntimeError(f"Ошибка кодирования FFmpeg\n{error_tail}")
+
+            os.replace(part_file, plan.output_file)
+
+        except BaseException:
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+            stderr_task.cancel()
+            # Поток пула мог еще рендерить кадры: дожидаемся, прежде чем
+            # вызывающий код закроет клип
+            if pending is not None:
+                await asyncio.wait([pending])
+            if os.path.exists(part_file):
+                os.remove(part_file)
+            raise
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Постоянный кеш параметров и анализа аудиофайлов
+
+Параметры аудио (длительность, частота, каналы, кодек) и результаты
+тяжелого анализа (интегральная громкость и истинный пик по EBU R128,
+для которого нужно декодировать весь файл) сохраняются по хешу
+содержимого. Повторная задача с тем же дикторским текстом или той же
+музыкальной подложкой берет их из кеша, даже если файл переименовали
+или положили в другую папку.
+
+Чтобы не хешировать большой файл при каждом запуске, путь, размер
+и время изменения файла запоминаются вместе с его хешем (как в индексе
+каталога изображений).
+
+Структура файла кеша:
+    temp/audio/index.json
+        paths:   путь -> {size, mtime_ns, hash}
+        entries: хеш -> {duration, sample_rate, channels, codec, bitrate,
+                         loudness, peak}
+
+Автор: [@EvilBabayka]
+Дата: 2025
+"""
+
+import os
+import json
+import logging
+import threading
+from typing import Dict, Optional
+
+from ffmpeg_tools import analyze_loudness, probe_media
+from image_catalog import file_hash
+
+# Версия формата кеша
+AUDIO_CACHE_VERSION = 1
+
+# Поля из заголовков контейнера (probe_media -> запись кеша)
+_PROBE_FIELDS = {
+    "duration": "duration",
+    "sample_rate": "sample_rate",
+    "channels": "channels",
+    "codec": "audio_codec",
+    "bitrate": "bitrate",
+}
+
+
+class AudioAnalysisCache:
+    """
+    Параметры и громкость аудиофайлов, сохраненные по хешу содержимого
+    """
+
+    def __init__(self, folder: Optional[str] = "temp/audio"):
+        """
+        Открывает кеш (файл кеша читается, если он уже есть)
+
+        Args:
+            folder: папка кеша (None - кеш только в памяти процесса)
+        """
+        self.path = os.path.join(folder, "index.json") if folder else None
+        self._lock = threading.Lock()
+        self.paths: Dict[str, dict] = {}
+        self.entries: Dict[str, dict] = {}
+        self._load()
+
+    def _load(self):
+        if not self.path:
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as cache_file:
+                data = json.load(cache_file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+
+        if data.get("version") == AUDIO_CACHE_VERSION:
+            self.paths = data["paths"]
+            self.entries = data["entries"]
+
+    def save(self):
+        """Сохраняет кеш на диск (атомарно)"""
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as cache_file:
+            json.dump(
+                {
+                    "version": AUDIO_CACHE_VERSION,
+                    "paths": self.paths,
+                    "entries": self.entries,
+                },
+                cache_file,
+                ensure_ascii=False,
+            )
+        os.replace(temp_path, self.path)
+
+    def content_hash(self, path: str) -> str:
+        """
+        Хеш содержимого файла (пересчитывается, только если файл изменился)
+
+        Args:
+            path: путь к аудиофайлу
+
+        Returns:
+            str: sha256 содержимого
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        known = self.paths.get(path)
+        if (
+            known is not None
+            and known["size"] == stat.st_size
+            and known["mtime_ns"] == stat.st_mtime_ns
+        ):
+            return known["hash"]
+
+        content_hash = file_hash(path)
+        self.paths[path] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "hash": content_hash,
+        }
+        return content_hash
+
+    def get(self, path: str, loudness: bool = False) -> dict:
+        """
+        Параметры аудиофайла (из кеша или по заголовкам и анализу)
+
+        Args:
+            path: путь к аудиофайлу
+            loudness: нужны ли громкость и пик (при первом запросе
+                декодируется весь файл)
+
+        Returns:
+            dict: hash, duration, sample_rate, channels, codec, bitrate,
+                loudness, peak (None - неизвестно или не измерялось)
+
+        Raises:
+            RuntimeError: если FFmpeg не смог прочитать файл
+        """
+        with self._lock:
+            known = self.paths.get(os.path.abspath(path))
+            content_hash = self.content_hash(path)
+            changed = self.paths[os.path.abspath(path)] is not known
+
+            entry = self.entries.get(content_hash)
+            if entry is None:
+                info = probe_media(path)
+                entry = {name: info[field] for name, field in _PROBE_FIELDS.items()}
+                entry.update({"loudness": None, "peak": None})
+                self.entries[content_hash] = entry
+                changed = True
+            else:
+                logging.info(f"Параметры аудио {path} взяты из кеша")
+
+            if loudness and entry["loudness"] is None:
+                print(f"🔊 Анализ громкости: {os.path.basename(path)}...")
+                entry.update(analyze_loudness(path))
+                changed = True
+
+            if changed:
+                self.save()
+            return dict(entry, hash=content_hash)
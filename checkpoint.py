@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Контрольные точки для возобновляемого рендеринга
+
+Видео рендерится по сегментам в рабочую папку задачи. После каждого
+готового сегмента обновляется манифест, поэтому после сбоя или Ctrl-C
+повторный запуск той же задачи продолжает с первого незавершенного
+сегмента. Рабочая папка удаляется только после успешной финальной сборки.
+
+Структура рабочей папки задачи:
+    temp/jobs/<job_id>/manifest.json     - план и список готовых сегментов
+    temp/jobs/<job_id>/segments/*.mp4    - закодированные сегменты
+
+Автор: [@EvilBabayka]
+Дата: 2025
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+from pathlib import Path
+from typing import Optional
+
+from render_plan import RenderPlan
+
+# Версия формата манифеста
+MANIFEST_VERSION = 1
+
+# Имя файла манифеста в рабочей папке задачи
+MANIFEST_NAME = "manifest.json"
+
+
+def job_id_for(*parts) -> str:
+    """
+    Вычисляет стабильный идентификатор задачи по ее входным данным
+
+    Одни и те же входные файлы, настройки и выходной файл всегда дают
+    один и тот же идентификатор, поэтому повторный запуск находит
+    свои контрольные точки.
+
+    Args:
+        parts: значения, сериализуемые в JSON (пути, словарь настроек и т.п.)
+
+    Returns:
+        str: короткий шестнадцатеричный идентификатор
+    """
+    canonical = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+class JobCheckpoint:
+    """
+    Манифест готовых сегментов одной задачи
+    """
+
+    def __init__(self, work_dir: str, plan: RenderPlan):
+        """
+        Открывает (или создает) рабочую папку задачи
+
+        Если в папке лежат контрольные точки другого плана (входные
+        файлы изменились), они удаляются.
+
+        Args:
+            work_dir: рабочая папка задачи
+            plan: план рендеринга
+        """
+        self.work_dir = Path(work_dir)
+        self.segments_dir = self.work_dir / "segments"
+        self.manifest_path = self.work_dir / MANIFEST_NAME
+        self.plan = plan
+        self.fingerprint = plan.fingerprint()
+
+        manifest = self._load()
+        if manifest is not None and manifest.get("fingerprint") != self.fingerprint:
+            logging.info(f"План задачи изменился, старые сегменты удалены: {work_dir}")
+            self.discard()
+            manifest = None
+
+        self.segments_dir.mkdir(parents=True, exist_ok=True)
+        if manifest is None:
+            manifest = {
+                "version": MANIFEST_VERSION,
+                "fingerprint": self.fingerprint,
+                "created_at": time.time(),
+                "plan": plan.to_dict(),
+                "segments": {},
+            }
+            self._save(manifest)
+
+        self.manifest = manifest
+
+    @staticmethod
+    def exists(work_dir: str) -> bool:
+        """Есть ли в рабочей папке манифест, с которого можно продолжить"""
+        return (Path(work_dir) / MANIFEST_NAME).is_file()
+
+    def _load(self) -> Optional[dict]:
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as manifest_file:
+                manifest = json.load(manifest_file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        if manifest.get("version") != MANIFEST_VERSION:
+            return None
+        return manifest
+
+    def _save(self, manifest: dict):
+        # Манифест заменяется атомарно, чтобы сбой не оставил его битым
+        temp_path = self.manifest_path.with_suffix(".tmp")
+        with open(temp_path, "w", encoding="utf-8") as manifest_file:
+            json.dump(manifest, manifest_file, ensure_ascii=False)
+        os.replace(temp_path, self.manifest_path)
+
+    def segment_path(self, number: int) -> str:
+        """Путь к файлу сегмента с заданным номером"""
+        return str(self.segments_dir / f"seg_{number:05d}.mp4")
+
+    def is_done(self, number: int) -> bool:
+        """Сегмент уже закодирован и его файл на месте"""
+        entry = self.manifest["segments"].get(str(number))
+        return entry is not None and os.path.isfile(entry["file"])
+
+    def mark_done(self, number: int):
+        """Записывает готовый сегмент в манифест"""
+        self.manifest["segments"][str(number)] = {
+            "file": self.segment_path(number),
+            "finished_at": time.time(),
+        }
+        self._save(self.manifest)
+
+    @property
+    def completed(self) -> int:
+        """Количество готовых сегментов"""
+        return sum(1 for number in self.manifest["segments"] if self.is_done(int(number)))
+
+    def discard(self):
+        """Удаляет рабочую папку задачи со всеми сегментами"""
+        shutil.rmtree(self.work_dir, ignore_errors=True)
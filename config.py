@@ -8,6 +8,8 @@
 Дата: 2025
 """
 
+import os
+
 # =============================================================================
 # ОСНОВНЫЕ НАСТРОЙКИ ВИДЕО
 # =============================================================================
@@ -45,6 +47,10 @@ ZOOM_FACTOR = 1.2
 # Случайное направление зума для каждого изображения
 RANDOM_ZOOM_DIRECTION = True
 
+# Зерно генератора случайных чисел для выбора направления зума
+# None - каждый запуск случайный, число - повторяемый результат
+RANDOM_SEED = None
+
 # Настройки переходов между изображениями
 # True - плавные переходы, False - резкая смена
 SMOOTH_TRANSITIONS = True
@@ -52,6 +58,17 @@ SMOOTH_TRANSITIONS = True
 # Длительность перехода (в секундах, если включены плавные переходы)
 TRANSITION_DURATION = 0.5
 
+# Наложения поверх видео (водяной знак, логотип, плашка) - список словарей:
+#   source   - путь к изображению (PNG с прозрачностью)
+#   position - 'top-left', 'top', 'top-right', 'left', 'center', 'right',
+#              'bottom-left', 'bottom', 'bottom-right' или (x, y) в пикселях
+#   scale    - ширина в долях ширины кадра (None - исходный размер)
+#   opacity  - непрозрачность от 0.0 до 1.0
+#   margin   - отступ от края кадра в пикселях
+#   start, end - время показа в секундах (None - с начала / до конца видео)
+# Пример: [{"source": "input/logo.png", "position": "top-right", "scale": 0.12, "opacity": 0.8}]
+OVERLAYS = []
+
 # =============================================================================
 # НАСТРОЙКИ СУБТИТРОВ
 # =============================================================================
@@ -103,6 +120,11 @@ AUDIO_VOLUME = 1.0
 AUDIO_FADEIN = 0.5
 AUDIO_FADEOUT = 1.0
 
+# Измерять интегральную громкость и пик аудио (EBU R128) при составлении плана.
+# Требует полного декодирования дорожки, но результат кешируется по хешу
+# содержимого, и повторные задачи с тем же аудио анализ не повторяют
+AUDIO_LOUDNESS_ANALYSIS = False
+
 # =============================================================================
 # НАСТРОЙКИ КОДИРОВАНИЯ И КАЧЕСТВА
 # =============================================================================
@@ -132,6 +154,46 @@ AUDIO_BITRATE = "128k"
 # Качество сжатия (0-51, где 0 = без потерь, 23 = по умолчанию, 51 = худшее)
 VIDEO_CRF = 23
 
+# Прогрессивный вывод во время рендеринга (начало видео можно смотреть сразу)
+# None   - обычный MP4, доступен только после окончания кодирования
+# 'fmp4' - фрагментированный MP4, дописывается по ходу рендеринга
+# 'hls'  - сегменты и плейлист HLS рядом с видео (папка <имя>_hls),
+#          по окончании из них собирается обычный MP4
+PROGRESSIVE_OUTPUT = None
+
+# Длительность фрагмента / сегмента HLS (в секундах)
+PROGRESSIVE_SEGMENT_DURATION = 2.0
+
+# Переменная частота кадров (VFR): серия одинаковых кадров (слайд без зума,
+# пока не меняются субтитры и наложения) кодируется одним кадром с длинной
+# длительностью. Кодировщик получает в разы меньше кадров, но не все
+# плееры и монтажные программы одинаково хорошо работают с VFR
+VFR_OUTPUT = False
+
+# Минимальная доля повторяющихся кадров, при которой VFR имеет смысл
+# (при меньшей, например когда почти везде зум, видео пишется как обычно)
+VFR_MIN_STATIC_SHARE = 0.5
+
+# Превью для CMS рядом с видео: постер, листы миниатюр для перемотки
+# и индекс WebVTT (<имя>_poster.jpg, <имя>_sprites_000.jpg, <имя>_thumbnails.vtt).
+# Кадры строятся по плану, готовое видео повторно не декодируется
+PREVIEWS_ENABLED = False
+
+# Шаг миниатюр в секундах и ширина миниатюры в пикселях
+PREVIEW_INTERVAL = 2.0
+PREVIEW_THUMB_WIDTH = 160
+
+# Размер листа миниатюр (столбцы x строки)
+PREVIEW_SHEET_COLUMNS = 10
+PREVIEW_SHEET_ROWS = 10
+
+# Формат постера и листов: 'jpg' или 'webp', качество сжатия 1-100
+PREVIEW_FORMAT = "jpg"
+PREVIEW_QUALITY = 80
+
+# Момент постера в секундах (None - середина первого слайда)
+PREVIEW_POSTER_TIME = None
+
 # =============================================================================
 # НАСТРОЙКИ ФАЙЛОВ И ПАПОК
 # =============================================================================
@@ -145,6 +207,14 @@ SUPPORTED_AUDIO_FORMATS = [".mp3", ".wav", ".aac", ".ogg", ".m4a"]
 # Поддерживаемые форматы субтитров
 SUPPORTED_SUBTITLE_FORMATS = [".srt", ".vtt"]
 
+# Видеоклипы, которые можно класть в папку изображений вместе с картинками
+# (показываются целиком, без зума и без собственного звука)
+SUPPORTED_VIDEO_FORMATS = [".mp4", ".mov", ".mkv", ".webm", ".avi", ".m4v"]
+
+# Копировать клипы, совпадающие с выходом по кодеку, разрешению и частоте
+# кадров, без перекодирования (видео собирается по сегментам)
+STREAM_COPY_CLIPS = True
+
 # Стандартные папки проекта
 DEFAULT_INPUT_FOLDER = "input"
 DEFAULT_OUTPUT_FOLDER = "output"
@@ -159,6 +229,88 @@ MAX_IMAGE_SIZE = 50 * 1024 * 1024
 # 10 минут = 600 секунд
 MAX_AUDIO_DURATION = 600
 
+# Предварительная проверка входных файлов перед рендерингом (см. preflight.py)
+PREFLIGHT_ENABLED = True
+
+# Куда сохранять JSON-отчет проверки (None - не сохранять)
+PREFLIGHT_REPORT_FILE = "logs/preflight.json"
+
+# Прерывать работу при любой ошибке проверки
+# (False - битые изображения пропускаются, как и раньше)
+PREFLIGHT_STRICT = False
+
+# =============================================================================
+# НАСТРОЙКИ ПРОИЗВОДИТЕЛЬНОСТИ
+# =============================================================================
+
+# Папка каталога изображений: индекс (размер, время изменения, хеш,
+# размеры кадра) и кеш подготовленных слайдов. None - индекс не сохраняется
+IMAGE_CATALOG_FOLDER = "temp/catalog"
+
+# Папка кеша параметров и анализа аудио по хешу содержимого (None - без кеша)
+AUDIO_CACHE_FOLDER = "temp/audio"
+
+# Бюджет ресурсов одной задачи (None - без ограничения):
+# потоки процессора для пула подготовки, NumPy и кодировщика FFmpeg
+JOB_THREADS = None
+
+# Пиковая память задачи в байтах (вместе с процессами FFmpeg,
+# сверх памяти, занятой программой до начала задачи).
+# Если оценка не влезает, слайды читаются из хранилища на диске
+# и кадры готовятся меньшими порциями; иначе задача прерывается
+JOB_MEMORY_LIMIT = None
+
+# Предельное время задачи в секундах
+JOB_TIMEOUT = None
+
+# Папка калибровки оценщика стоимости (см. estimator.py): у каждой машины
+# свой файл <имя хоста>.json, создается командой python estimator.py --calibrate
+CALIBRATION_FOLDER = "temp/calibration"
+
+# Unix-сокет фонового сервиса рендеринга (см. render_daemon.py;
+# None - video_maker-<uid>.sock во временной папке системы)
+DAEMON_SOCKET = None
+
+# Число потоков для рендеринга кадров в асинхронном API (None - по числу ядер)
+ASYNC_WORKERS = None
+
+# Хранить подготовленные слайды в кеше по хешу содержимого
+# (в режиме наблюдения включается всегда; занимает Ш x В x 3 байт на слайд)
+SLIDE_CACHE = False
+
+# Предел размера кеша подготовленных слайдов (None - без предела);
+# при превышении удаляются слайды, которые дольше всех не использовались
+SLIDE_CACHE_MAX_SIZE = 2 * 1024 * 1024 * 1024  # 2 ГБ
+
+# Готовить слайды один раз в общее memory-mapped хранилище
+# (рабочие процессы читают кадры без копирования и повторного декодирования)
+USE_SLIDE_STORE = False
+
+# Файл хранилища подготовленных слайдов
+# None - в рабочей папке задачи (рекомендуется)
+SLIDE_STORE_PATH = None
+
+# Рендерить по сегментам с контрольными точками
+# (после сбоя или Ctrl-C повторный запуск продолжит с места остановки)
+RESUMABLE_RENDER = True
+
+# Количество слайдов в одном сегменте
+SEGMENT_SLIDES = 10
+
+# Папка для рабочих данных задач (у каждой задачи своя подпапка)
+JOBS_FOLDER = "temp/jobs"
+
+# Размещать рабочие папки задач в памяти (tmpfs) вместо диска
+# Быстрее для промежуточных файлов, но контрольные точки не переживут перезагрузку
+SCRATCH_IN_RAM = False
+
+# Папка в tmpfs для рабочих папок задач
+RAM_SCRATCH_FOLDER = "/dev/shm/video_maker"
+
+# Максимальный размер рабочей папки одной задачи (в байтах)
+# None - без ограничения (проверяется только свободное место)
+SCRATCH_SIZE_LIMIT = 4 * 1024 * 1024 * 1024  # 4 ГБ
+
 # =============================================================================
 # НАСТРОЙКИ ЛОГИРОВАНИЯ
 # =============================================================================
@@ -215,6 +367,9 @@ SOCIAL_MEDIA_CONFIG = {
     "subtitle_position": ("center", "center"),
 }
 
+# Набор вариантов для публикации (создаются за один проход, см. get_output_targets)
+OUTPUT_PRESETS = ["default", "high_quality", "social_media"]
+
 # =============================================================================
 # ОСНОВНАЯ КОНФИГУРАЦИЯ
 # =============================================================================
@@ -229,8 +384,10 @@ VIDEO_CONFIG = {
     "zoom_enabled": ZOOM_ENABLED,
     "zoom_factor": ZOOM_FACTOR,
     "random_zoom_direction": RANDOM_ZOOM_DIRECTION,
+    "random_seed": RANDOM_SEED,
     "smooth_transitions": SMOOTH_TRANSITIONS,
     "transition_duration": TRANSITION_DURATION,
+    "overlays": OVERLAYS,
     # Субтитры
     "subtitle_fontsize": SUBTITLE_FONTSIZE,
     "subtitle_color": SUBTITLE_COLOR,
@@ -245,22 +402,59 @@ VIDEO_CONFIG = {
     "audio_volume": AUDIO_VOLUME,
     "audio_fadein": AUDIO_FADEIN,
     "audio_fadeout": AUDIO_FADEOUT,
+    "audio_loudness_analysis": AUDIO_LOUDNESS_ANALYSIS,
     # Кодирование
     "video_codec": VIDEO_CODEC,
     "audio_codec": AUDIO_CODEC,
     "video_bitrate": VIDEO_BITRATE,
     "audio_bitrate": AUDIO_BITRATE,
     "video_crf": VIDEO_CRF,
+    "progressive_output": PROGRESSIVE_OUTPUT,
+    "progressive_segment_duration": PROGRESSIVE_SEGMENT_DURATION,
+    "vfr_output": VFR_OUTPUT,
+    "vfr_min_static_share": VFR_MIN_STATIC_SHARE,
+    "previews_enabled": PREVIEWS_ENABLED,
+    "preview_interval": PREVIEW_INTERVAL,
+    "preview_thumb_width": PREVIEW_THUMB_WIDTH,
+    "preview_sheet_columns": PREVIEW_SHEET_COLUMNS,
+    "preview_sheet_rows": PREVIEW_SHEET_ROWS,
+    "preview_format": PREVIEW_FORMAT,
+    "preview_quality": PREVIEW_QUALITY,
+    "preview_poster_time": PREVIEW_POSTER_TIME,
     # Файлы и форматы
     "supported_image_formats": SUPPORTED_IMAGE_FORMATS,
     "supported_audio_formats": SUPPORTED_AUDIO_FORMATS,
     "supported_subtitle_formats": SUPPORTED_SUBTITLE_FORMATS,
+    "supported_video_formats": SUPPORTED_VIDEO_FORMATS,
+    "stream_copy_clips": STREAM_COPY_CLIPS,
     "max_image_size": MAX_IMAGE_SIZE,
     "max_audio_duration": MAX_AUDIO_DURATION,
+    "preflight_enabled": PREFLIGHT_ENABLED,
+    "preflight_report_file": PREFLIGHT_REPORT_FILE,
+    "preflight_strict": PREFLIGHT_STRICT,
     # Папки
     "default_input_folder": DEFAULT_INPUT_FOLDER,
     "default_output_folder": DEFAULT_OUTPUT_FOLDER,
     "default_temp_folder": DEFAULT_TEMP_FOLDER,
+    # Производительность
+    "image_catalog_folder": IMAGE_CATALOG_FOLDER,
+    "audio_cache_folder": AUDIO_CACHE_FOLDER,
+    "slide_cache": SLIDE_CACHE,
+    "slide_cache_max_size": SLIDE_CACHE_MAX_SIZE,
+    "async_workers": ASYNC_WORKERS,
+    "calibration_folder": CALIBRATION_FOLDER,
+    "daemon_socket": DAEMON_SOCKET,
+    "job_threads": JOB_THREADS,
+    "job_memory_limit": JOB_MEMORY_LIMIT,
+    "job_timeout": JOB_TIMEOUT,
+    "use_slide_store": USE_SLIDE_STORE,
+    "slide_store_path": SLIDE_STORE_PATH,
+    "resumable_render": RESUMABLE_RENDER,
+    "segment_slides": SEGMENT_SLIDES,
+    "jobs_folder": JOBS_FOLDER,
+    "scratch_in_ram": SCRATCH_IN_RAM,
+    "ram_scratch_folder": RAM_SCRATCH_FOLDER,
+    "scratch_size_limit": SCRATCH_SIZE_LIMIT,
     # Логирование
     "log_level": LOG_LEVEL,
     "log_filename": LOG_FILENAME,
@@ -299,6 +493,31 @@ def get_config(config_name="default"):
         return VIDEO_CONFIG
 
 
+def get_output_targets(output_file, presets=None):
+    """
+    Возвращает список вариантов видео для VideoComposer.create_videos
+
+    Имя каждого файла получается из output_file добавлением имени
+    конфигурации: output/result.mp4 -> output/result_social_media.mp4
+
+    Args:
+        output_file (str): базовое имя выходного файла
+        presets (list): имена конфигураций (по умолчанию OUTPUT_PRESETS)
+
+    Returns:
+        list: словари с ключами name, config, output_file
+    """
+    base, extension = os.path.splitext(output_file)
+    return [
+        {
+            "name": name,
+            "config": get_config(name),
+            "output_file": f"{base}_{name}{extension or '.mp4'}",
+        }
+        for name in presets or OUTPUT_PRESETS
+    ]
+
+
 def print_config(config_name="default"):
     """
     Выводит текущую конфигурацию в читаемом виде
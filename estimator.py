@@ -0,0 +1,639 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Оценка стоимости рендеринга без рендеринга (dry run)
+
+По входным файлам и выбранной конфигурации (get_config) строится тот же
+план, что и при рендеринге, и по нему предсказываются время работы,
+пиковая память и размер результата на диске. Это позволяет планировщику
+заранее решить, на какую машину и в какой момент ставить задачу.
+
+Предсказания опираются на калибровку машины: короткий встроенный
+рендеринг синтетических слайдов измеряет, сколько стоит подготовка
+слайда, кадр без зума и с зумом, сколько памяти занимает кодировщик
+и насколько итоговый файл меньше номинального битрейта. Без калибровки
+используются грубые коэффициенты по умолчанию.
+
+Использование:
+    python estimator.py --calibrate [--config high_quality]
+    python estimator.py input/images input/audio/music.mp3 [субтитры.srt]
+        [--config default,social_media] [--json оценка.json]
+
+Структура папки калибровки:
+    temp/calibration/<имя хоста>.json   - коэффициенты машины
+
+Автор: [@EvilBabayka]
+Дата: 2025
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import logging
+import argparse
+import tempfile
+import threading
+import wave
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+from PIL import Image
+
+from governor import (
+    ENCODER_BYTES_PER_PIXEL,
+    WORKING_FRAMES,
+    estimate_memory,
+    memory_usage,
+)
+from video_composer import VideoComposer, letterbox
+
+# Версия формата файла калибровки
+CALIBRATION_VERSION = 1
+
+# Коэффициенты до калибровки (libx264, preset medium, 4 ядра; грубо)
+DEFAULT_COEFFICIENTS = {
+    # Запуск рендеринга: MoviePy, FFmpeg, открытие файлов (на каждый сегмент)
+    "fixed_seconds": 1.5,
+    # Подготовка слайда: на мегапиксель исходника и кадра
+    "prepare_seconds_per_mp": 0.05,
+    # Рендеринг и кодирование кадра: на мегапиксель кадра
+    "still_seconds_per_mp": 0.015,
+    "zoom_seconds_per_mp": 0.035,
+    # Кодирование и сведение аудио: на секунду видео
+    "audio_seconds_per_second": 0.05,
+    # Память кодировщика на пиксель кадра
+    "encoder_bytes_per_pixel": ENCODER_BYTES_PER_PIXEL,
+    # Размер файла относительно номинального битрейта
+    "still_size_ratio": 0.6,
+    "zoom_size_ratio": 1.0,
+}
+
+# Как часто замерять память во время калибровки (секунды)
+MEMORY_SAMPLE_INTERVAL = 0.05
+
+
+def calibration_path(config: dict) -> str:
+    """Файл калибровки этой машины"""
+    folder = config.get("calibration_folder") or "temp/calibration"
+    return os.path.join(folder, f"{socket.gethostname()}.json")
+
+
+class Calibration:
+    """
+    Коэффициенты стоимости рендеринга на одной машине
+    """
+
+    def __init__(
+        self,
+        coefficients: dict,
+        machine: Optional[str] = None,
+        codec: Optional[str] = None,
+        resolution=None,
+        created: Optional[float] = None,
+    ):
+        """
+        Args:
+            coefficients: коэффициенты (ключи как в DEFAULT_COEFFICIENTS)
+            machine: имя хоста, на котором проведена калибровка (None - нет калибровки)
+            codec: кодек, которым проводилась калибровка
+            resolution: разрешение калибровки (ширина, высота)
+            created: время калибровки (unix time)
+        """
+        self.coefficients = dict(DEFAULT_COEFFICIENTS, **coefficients)
+        self.machine = machine
+        self.codec = codec
+        self.resolution = tuple(resolution) if resolution else None
+        self.created = created
+
+    @property
+    def calibrated(self) -> bool:
+        return self.machine is not None
+
+    def __getitem__(self, name: str) -> float:
+        return self.coefficients[name]
+
+    def to_dict(self) -> dict:
+        return {
+            "version": CALIBRATION_VERSION,
+            "machine": self.machine,
+            "codec": self.codec,
+            "resolution": list(self.resolution) if self.resolution else None,
+            "created": self.created,
+            "cpu_count": os.cpu_count(),
+            "coefficients": self.coefficients,
+        }
+
+    def save(self, path: str):
+        """Сохраняет калибровку (атомарно)"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as calibration_file:
+            json.dump(self.to_dict(), calibration_file, ensure_ascii=False, indent=2)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "Calibration":
+        """
+        Читает калибровку из файла
+
+        Returns:
+            Calibration: калибровка или коэффициенты по умолчанию, если файла нет
+        """
+        try:
+            with open(path, "r", encoding="utf-8") as calibration_file:
+                data = json.load(calibration_file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return cls({})
+
+        if data.get("version") != CALIBRATION_VERSION:
+            logging.warning(f"Калибровка {path} устарела, используются значения по умолчанию")
+            return cls({})
+        return cls(
+            data["coefficients"],
+            machine=data.get("machine"),
+            codec=data.get("codec"),
+            resolution=data.get("resolution"),
+            created=data.get("created"),
+        )
+
+
+class CostEstimate:
+    """
+    Предсказанная стоимость одной задачи
+    """
+
+    def __init__(self, name: str, plan, calibration: Calibration):
+        """
+        Args:
+            name: имя конфигурации
+            plan: план рендеринга задачи
+            calibration: калибровка, по которой сделана оценка
+        """
+        self.name = name
+        self.plan = plan
+        self.calibration = calibration
+        self.wall_time = 0.0
+        self.peak_memory = 0
+        self.output_bytes = 0
+        self.scratch_bytes = 0
+        self.warnings: List[str] = []
+
+    @property
+    def frames(self) -> int:
+        return int(round(self.plan.final_duration * self.plan.fps))
+
+    @property
+    def disk_bytes(self) -> int:
+        """Пиковое место на диске: результат и рабочие файлы задачи"""
+        return self.output_bytes + self.scratch_bytes
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "output_file": self.plan.output_file,
+            "calibrated": self.calibration.calibrated,
+            "slides": len(self.plan.slides),
+            "duration": round(self.plan.final_duration, 3),
+            "frames": self.frames,
+            "resolution": list(self.plan.resolution),
+            "fps": self.plan.fps,
+            "codec": self.plan.encoder.codec,
+            "wall_time": round(self.wall_time, 2),
+            "peak_memory": self.peak_memory,
+            "output_bytes": self.output_bytes,
+            "scratch_bytes": self.scratch_bytes,
+            "disk_bytes": self.disk_bytes,
+            "warnings": self.warnings,
+        }
+
+    def print_summary(self):
+        """Выводит краткий итог оценки"""
+        megabyte = 1024 * 1024
+        width, height = self.plan.resolution
+        print(
+            f"🧮 {self.name}: {len(self.plan.slides)} слайдов, "
+            f"{self.plan.final_duration:.1f} с, {width}x{height} @ {self.plan.fps} fps"
+        )
+        print(f"   ⏱️ Время: ~{self.wall_time:.0f} с")
+        print(f"   🧠 Пиковая память: ~{self.peak_memory / megabyte:.0f} МБ")
+        print(
+            f"   💾 Результат: ~{self.output_bytes / megabyte:.1f} МБ "
+            f"(на диске во время работы ~{self.disk_bytes / megabyte:.1f} МБ)"
+        )
+        for warning in self.warnings:
+            print(f"   ⚠️ {warning}")
+
+
+def estimate_cost(
+    images_folder: str,
+    audio_file: Optional[str],
+    subtitles_file: Optional[str],
+    config: dict,
+    output_file: str = "output/result.mp4",
+    calibration: Optional[Calibration] = None,
+    name: str = "default",
+) -> CostEstimate:
+    """
+    Предсказывает стоимость рендеринга, не рендеря видео
+
+    Args:
+        images_folder: папка с изображениями
+        audio_file: путь к аудиофайлу (или None)
+        subtitles_file: путь к субтитрам (или None)
+        config: конфигурация (например, get_config('high_quality'))
+        output_file: путь к будущему видео
+        calibration: калибровка машины (по умолчанию из calibration_folder)
+        name: имя конфигурации для отчета
+
+    Returns:
+        CostEstimate: оценка времени, памяти и размера
+    """
+    if calibration is None:
+        calibration = Calibration.load(calibration_path(config))
+
+    composer = VideoComposer(config)
+    plan = composer.build_plan(
+        images_folder, audio_file, subtitles_file, output_file, composer.random_seed
+    )
+    estimate = CostEstimate(name, plan, calibration)
+    if not plan.slides:
+        estimate.warnings.append("Не найдено изображений для обработки")
+        return estimate
+
+    if not calibration.calibrated:
+        estimate.warnings.append(
+            "Машина не откалибрована (python estimator.py --calibrate), оценка грубая"
+        )
+    elif calibration.codec != plan.encoder.codec:
+        estimate.warnings.append(
+            f"Калибровка проводилась для {calibration.codec}, а не {plan.encoder.codec}"
+        )
+
+    width, height = plan.resolution
+    frame_mp = width * height / 1e6
+    frame_bytes = width * height * 3
+
+    # Рендеринг по сегментам: у каждого сегмента свой запуск и свои слайды в памяти
+    segmented = composer.resumable_render or any(slide.stream_copy for slide in plan.slides)
+    ranges = plan.split(composer.segment_slides) if segmented else [(0, len(plan.slides))]
+    renders = [plan.slides[first:last] for first, last in ranges]
+
+    wall_time = calibration["fixed_seconds"] * (len(renders) + (1 if segmented else 0))
+    video_bytes = 0
+    for number, slide in enumerate(plan.slides):
+        # Видеоряд подгоняется под аудио: слайды после конца не рендерятся,
+        # а последний слайд держится до конца музыки
+        end = plan.final_duration if number == len(plan.slides) - 1 else slide.end
+        duration = min(end, plan.final_duration) - slide.start
+        if duration <= 0:
+            continue
+
+        if slide.stream_copy:
+            # Копируется без перекодирования: время - чтение файла, размер - как есть
+            video_bytes += int(os.path.getsize(slide.source) * duration / slide.duration)
+            continue
+
+        frames = duration * plan.fps
+        if slide.is_video or slide.has_zoom:
+            kind = "zoom"
+        else:
+            kind = "still"
+        wall_time += frames * frame_mp * calibration[f"{kind}_seconds_per_mp"]
+        video_bytes += int(
+            plan.encoder.estimated_bytes(duration, False)
+            * calibration[f"{kind}_size_ratio"]
+        )
+
+        if not slide.is_video:
+            entry = composer.catalog.get(slide.source) if composer.catalog else None
+            source_mp = frame_mp
+            if entry and entry.get("width") and entry.get("height"):
+                source_mp = entry["width"] * entry["height"] / 1e6
+            wall_time += (source_mp + frame_mp) * calibration["prepare_seconds_per_mp"]
+
+    audio_bytes = 0
+    if plan.audio_source is not None:
+        wall_time += plan.final_duration * calibration["audio_seconds_per_second"]
+        audio_bytes = plan.encoder.estimated_bytes(plan.final_duration) - (
+            plan.encoder.estimated_bytes(plan.final_duration, False)
+        )
+
+    # Память: модель бюджета задачи с измеренной памятью кодировщика
+    use_slide_store = composer.use_slide_store
+    images_in_memory = max(
+        sum(1 for slide in slides if not slide.is_video) for slides in renders
+    )
+
+    def peak(store: bool) -> int:
+        return estimate_memory(
+            plan.resolution,
+            min(2, images_in_memory) if store else images_in_memory,
+            0,
+            calibration["encoder_bytes_per_pixel"],
+        )
+
+    peak_memory = peak(use_slide_store)
+    limit = composer.governor.budget.memory
+    if limit is not None and peak_memory > limit and not use_slide_store:
+        use_slide_store = True
+        peak_memory = peak(True)
+        estimate.warnings.append("Не влезает в бюджет памяти: слайды будут читаться из хранилища")
+    if limit is not None and peak_memory > limit:
+        estimate.warnings.append(
+            f"Задача будет прервана: нужно ~{peak_memory / (1024 * 1024):.0f} МБ "
+            f"при бюджете {limit / (1024 * 1024):.0f} МБ"
+        )
+
+    timeout = composer.governor.budget.timeout
+    if timeout is not None and wall_time > timeout:
+        estimate.warnings.append(f"Задача, скорее всего, не уложится в {timeout:g} с")
+
+    # Рабочие файлы: сегменты (или сегменты HLS) живут до финальной сборки
+    scratch_bytes = 0
+    if segmented or composer.progressive_output == "hls":
+        scratch_bytes += video_bytes
+    if use_slide_store:
+        scratch_bytes += images_in_memory * frame_bytes
+
+    estimate.wall_time = wall_time
+    estimate.peak_memory = peak_memory
+    estimate.output_bytes = video_bytes + audio_bytes
+    estimate.scratch_bytes = scratch_bytes
+    logging.info(
+        f"Оценка {name}: ~{wall_time:.1f} с, ~{peak_memory / (1024 * 1024):.0f} МБ памяти, "
+        f"~{estimate.output_bytes / (1024 * 1024):.1f} МБ"
+    )
+    return estimate
+
+
+class _PeakMemory:
+    """Замеряет пиковую память процесса (вместе с FFmpeg) в фоновом потоке"""
+
+    def __init__(self):
+        self.baseline = memory_usage()
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self._stop.wait(MEMORY_SAMPLE_INTERVAL):
+            self.peak = max(self.peak, memory_usage() - self.baseline)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+
+def _synthetic_images(folder: str, resolution, count: int) -> List[Path]:
+    """
+    Создает тестовые "фотографии": градиент, крупные детали и шум
+
+    Исходники в полтора раза больше кадра, как у обычных фотографий,
+    чтобы подготовка слайда включала уменьшение.
+    """
+    width, height = (int(side * 1.5) for side in resolution)
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:height, 0:width]
+    images = []
+    for number in range(count):
+        pixels = np.empty((height, width, 3), dtype=np.float32)
+        pixels[..., 0] = 255 * x / width
+        pixels[..., 1] = 255 * y / height
+        pixels[..., 2] = 128 + 100 * np.sin((x + y + 60 * number) / 40.0)
+        for _ in range(12):
+            left, top = rng.integers(0, width - 50), rng.integers(0, height - 50)
+            right = left + rng.integers(20, width // 3)
+            bottom = top + rng.integers(20, height // 3)
+            pixels[top:bottom, left:right] = rng.integers(0, 256, 3)
+        pixels += rng.normal(0, 6, pixels.shape)
+        path = Path(folder) / f"calibration_{number}.jpg"
+        Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(path, quality=90)
+        images.append(path)
+    return images
+
+
+def _synthetic_audio(path: str, duration: float, sample_rate: int = 44100):
+    """Создает WAV-файл с синусом нужной длительности"""
+    samples = np.arange(int(duration * sample_rate)) / sample_rate
+    tone = (np.sin(2 * np.pi * 440 * samples) * 12000).astype("<i2")
+    with wave.open(path, "wb") as wav_file:
+        wav_file.setnchannels(2)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(np.repeat(tone, 2).tobytes())
+
+
+def _measure_render(
+    config: dict,
+    images: List[Path],
+    duration: float,
+    zoom: bool,
+    output_file: str,
+    audio_file: Optional[str] = None,
+) -> dict:
+    """Рендерит синтетические слайды и замеряет время, память и размер"""
+    composer = VideoComposer(
+        dict(
+            config,
+            image_duration=duration,
+            zoom_enabled=zoom,
+            random_zoom_direction=False,
+        )
+    )
+    audio_duration = len(images) * duration if audio_file else None
+    plan = composer.compile_plan(
+        images, (), audio_file, audio_duration, output_file, seed=0
+    )
+    started = time.perf_counter()
+    with _PeakMemory() as memory:
+        if not composer.render_plan(plan):
+            raise RuntimeError("Калибровочный рендеринг не удался")
+    elapsed = time.perf_counter() - started
+    return {
+        "elapsed": elapsed,
+        "peak": memory.peak,
+        "size": os.path.getsize(output_file),
+        "frames": len(images) * int(round(duration * plan.fps)),
+        "nominal": plan.encoder.estimated_bytes(plan.duration, False),
+    }
+
+
+def calibrate(
+    config: dict,
+    path: Optional[str] = None,
+    slides: int = 3,
+    seconds: float = 2.0,
+) -> Calibration:
+    """
+    Короткий калибровочный рендеринг на этой машине
+
+    Рендерятся четыре коротких видео из синтетических слайдов с разрешением
+    и кодированием из config: без зума короткое и длинное (разница дает
+    стоимость кадра, остаток - стоимость запуска), длинное со звуком
+    и с зумом.
+
+    Args:
+        config: конфигурация (разрешение, fps, кодирование, потоки)
+        path: куда сохранить калибровку (по умолчанию calibration_path)
+        slides: число слайдов в калибровочном видео
+        seconds: длительность слайда в длинном рендеринге
+
+    Returns:
+        Calibration: измеренные коэффициенты
+    """
+    path = path or calibration_path(config)
+    resolution = tuple(config.get("resolution", (1024, 768)))
+    width, height = resolution
+    frame_mp = width * height / 1e6
+    frame_bytes = width * height * 3
+
+    print(f"📏 Калибровка {socket.gethostname()}: {width}x{height}, {config.get('video_codec')}")
+    with tempfile.TemporaryDirectory(prefix="calibration_") as folder:
+        images = _synthetic_images(folder, resolution, slides)
+
+        # Подготовка слайдов: декодирование и вписывание в кадр
+        started = time.perf_counter()
+        source_mp = 0.0
+        for image_path in images:
+            with Image.open(image_path) as img:
+                source_mp += img.width * img.height / 1e6
+                letterbox(img, resolution)
+        prepare_per_mp = (time.perf_counter() - started) / (source_mp + slides * frame_mp)
+
+        render_config = dict(
+            config,
+            resumable_render=False,
+            progressive_output=None,
+            overlays=[],
+            slide_cache=False,
+            use_slide_store=False,
+            image_catalog_folder=None,
+            jobs_folder=os.path.join(folder, "jobs"),
+            job_memory_limit=None,
+            job_timeout=None,
+        )
+        output_file = os.path.join(folder, "calibration.mp4")
+        short = _measure_render(render_config, images, 0.5, False, output_file)
+        still = _measure_render(render_config, images, seconds, False, output_file)
+        zoom = _measure_render(render_config, images, seconds, True, output_file)
+        audio_file = os.path.join(folder, "calibration.wav")
+        _synthetic_audio(audio_file, slides * seconds)
+        with_audio = _measure_render(
+            render_config, images, seconds, False, output_file, audio_file
+        )
+
+    # Время: запуск + подготовка + кадры * стоимость кадра
+    still_per_mp = max(
+        1e-6,
+        (still["elapsed"] - short["elapsed"])
+        / max(1, still["frames"] - short["frames"])
+        / frame_mp,
+    )
+    intercept = short["elapsed"] - short["frames"] * frame_mp * still_per_mp
+    zoom_per_mp = max(
+        still_per_mp, (zoom["elapsed"] - intercept) / zoom["frames"] / frame_mp
+    )
+    fixed = max(0.0, intercept - (source_mp + slides * frame_mp) * prepare_per_mp)
+    audio_per_second = max(
+        0.0, (with_audio["elapsed"] - still["elapsed"]) / (slides * seconds)
+    )
+
+    # Память кодировщика: пик за вычетом слайдов и рабочих кадров
+    encoder_bpp = max(
+        (run["peak"] - (slides + WORKING_FRAMES) * frame_bytes) / (width * height)
+        for run in (still, zoom)
+    )
+
+    calibration = Calibration(
+        {
+            "fixed_seconds": round(fixed, 4),
+            "prepare_seconds_per_mp": round(prepare_per_mp, 6),
+            "still_seconds_per_mp": round(still_per_mp, 6),
+            "zoom_seconds_per_mp": round(zoom_per_mp, 6),
+            "audio_seconds_per_second": round(audio_per_second, 6),
+            "encoder_bytes_per_pixel": round(max(16.0, encoder_bpp), 1),
+            "still_size_ratio": round(still["size"] / still["nominal"], 4),
+            "zoom_size_ratio": round(zoom["size"] / zoom["nominal"], 4),
+        },
+        machine=socket.gethostname(),
+        codec=config.get("video_codec", "libx264"),
+        resolution=resolution,
+        created=time.time(),
+    )
+    calibration.save(path)
+    print(f"✅ Калибровка сохранена: {path}")
+    logging.info(f"Калибровка {path}: {calibration.coefficients}")
+    return calibration
+
+
+def main():
+    """Оценка стоимости и калибровка из командной строки"""
+    parser = argparse.ArgumentParser(description="Оценка стоимости рендеринга без рендеринга")
+    parser.add_argument(
+        "images_folder", nargs="?", help="папка с изображениями или zip/tar-архив"
+    )
+    parser.add_argument("audio_file", nargs="?", help="аудиофайл")
+    parser.add_argument("subtitles_file", nargs="?", help="файл субтитров")
+    parser.add_argument(
+        "--config", default="default", help="имя конфигурации (несколько - через запятую)"
+    )
+    parser.add_argument("--output", default="output/result.mp4", help="путь к будущему видео")
+    parser.add_argument("--json", dest="json_file", help="сохранить оценку в JSON-файл")
+    parser.add_argument(
+        "--calibrate", action="store_true", help="откалибровать эту машину"
+    )
+    args = parser.parse_args()
+
+    from config import get_config, get_output_targets
+
+    if args.calibrate:
+        calibrate(get_config(args.config.split(",")[0]))
+        return 0
+
+    if not args.images_folder:
+        parser.error("нужна папка с изображениями (или --calibrate)")
+
+    presets = args.config.split(",")
+    if len(presets) == 1:
+        targets = [
+            {"name": presets[0], "config": get_config(presets[0]), "output_file": args.output}
+        ]
+    else:
+        targets = get_output_targets(args.output, presets)
+
+    estimates = []
+    for target in targets:
+        estimate = estimate_cost(
+            args.images_folder,
+            args.audio_file,
+            args.subtitles_file,
+            target["config"],
+            target["output_file"],
+            name=target["name"],
+        )
+        estimates.append(estimate)
+
+    report = json.dumps(
+        [estimate.to_dict() for estimate in estimates], ensure_ascii=False, indent=2
+    )
+    if args.json_file:
+        os.makedirs(os.path.dirname(args.json_file) or ".", exist_ok=True)
+        with open(args.json_file, "w", encoding="utf-8") as report_file:
+            report_file.write(report)
+        for estimate in estimates:
+            estimate.print_summary()
+    else:
+        print(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
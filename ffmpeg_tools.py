@@ -0,0 +1,653 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Вспомогательные функции для прямого вызова FFmpeg
+
+MoviePy уже находит бинарник FFmpeg (через imageio-ffmpeg или
+переменную окружения FFMPEG_BINARY), поэтому используем тот же самый.
+
+Автор: [@EvilBabayka]
+Дата: 2025
+"""
+
+import io
+import os
+import re
+import logging
+import tempfile
+import subprocess
+from typing import List, Optional, Tuple
+
+import numpy as np
+from moviepy.config import FFMPEG_BINARY
+from PIL import Image
+
+# Строки вывода "ffmpeg -i", из которых берутся параметры файла
+_DURATION_RE = re.compile(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)")
+_BITRATE_RE = re.compile(r"bitrate: (\d+) kb/s")
+_AUDIO_STREAM_RE = re.compile(
+    r"Stream #\S+.*?: Audio: (\w+)[^,]*(?:, (\d+) Hz)?(?:, ([^,]+))?"
+)
+_VIDEO_STREAM_RE = re.compile(r"Stream #\S+.*?: Video: (\w+).*?, (\d+)x(\d+).*")
+_PIX_FMT_RE = re.compile(r"Video: [^,]+, (\w+)")
+_FPS_RE = re.compile(r"([\d.]+) fps")
+
+# Итоговая сводка фильтра ebur128
+_LOUDNESS_RE = re.compile(r"Integrated loudness:\s*I:\s*(-?[\d.]+|-?inf) LUFS")
+_PEAK_RE = re.compile(r"True peak:\s*Peak:\s*(-?[\d.]+|-?inf) dBFS")
+
+
+def run_ffmpeg(args: List[str], description: str = "FFmpeg"):
+    """
+    Запускает FFmpeg и ждет завершения
+
+    Args:
+        args: аргументы командной строки (без имени бинарника)
+        description: описание операции для сообщений об ошибках
+
+    Raises:
+        RuntimeError: если FFmpeg завершился с ошибкой
+    """
+    command = [FFMPEG_BINARY, "-hide_banner", "-loglevel", "error", "-y"] + args
+    logging.debug(f"Запуск FFmpeg: {' '.join(command)}")
+
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        # Последних строк stderr обычно достаточно, чтобы понять причину
+        error_tail = "\n".join(result.stderr.strip().splitlines()[-10:])
+        raise RuntimeError(f"{description}: ошибка FFmpeg\n{error_tail}")
+
+
+def write_concat_list(segment_files: List[str], list_path: str):
+    """
+    Записывает список файлов для concat-демультиплексора FFmpeg
+
+    Args:
+        segment_files: пути к сегментам в порядке склейки
+        list_path: куда записать список
+    """
+    with open(list_path, "w", encoding="utf-8") as list_file:
+        list_file.write("ffconcat version 1.0\n")
+        for segment_file in segment_files:
+            # Одинарные кавычки внутри пути экранируются по правилам FFmpeg
+            escaped = os.path.abspath(segment_file).replace("'", "'\\''")
+            list_file.write(f"file '{escaped}'\n")
+
+
+def concat_segments(
+    segment_files: List[str],
+    output_file: str,
+    list_path: str,
+    audio_file: Optional[str] = None,
+    duration: Optional[float] = None,
+    audio_codec: str = "aac",
+    audio_bitrate: str = "128k",
+):
+    """
+    Склеивает закодированные сегменты без перекодирования видео
+
+    Все сегменты должны быть закодированы с одинаковыми параметрами.
+    Аудио (если указано) добавляется и кодируется на этом же шаге.
+
+    Args:
+        segment_files: пути к сегментам в порядке склейки
+        output_file: итоговый файл
+        list_path: путь для временного списка concat
+        audio_file: аудиодорожка для итогового файла (опционально)
+        duration: ограничение длительности итогового файла в секундах
+        audio_codec: аудиокодек
+        audio_bitrate: битрейт аудио
+    """
+    if not segment_files:
+        raise ValueError("Нет сегментов для склейки")
+
+    os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+    write_concat_list(segment_files, list_path)
+
+    args = ["-f", "concat", "-safe", "0", "-i", list_path]
+    if audio_file:
+        args += ["-i", audio_file, "-map", "0:v:0", "-map", "1:a:0"]
+        args += ["-c:a", audio_codec, "-b:a", audio_bitrate]
+    args += ["-c:v", "copy"]
+    if duration is not None:
+        args += ["-t", f"{duration:.3f}"]
+    args += ["-movflags", "+faststart", output_file]
+
+    run_ffmpeg(args, "Склейка сегментов")
+
+
+def encoder_args(encoder, threads: Optional[int] = None) -> List[str]:
+    """
+    Аргументы FFmpeg для видеокодера по профилю кодирования
+
+    Параметры совпадают с тем, что передает MoviePy в write_videofile,
+    поэтому файлы, закодированные обоими способами, одинаковы по настройкам.
+
+    Args:
+        encoder: профиль кодирования (EncoderProfile)
+        threads: потоки кодировщика (None - FFmpeg выбирает сам)
+
+    Returns:
+        list: аргументы командной строки
+    """
+    args = ["-c:v", encoder.codec, "-b:v", encoder.bitrate]
+    args += ["-preset", "medium", "-pix_fmt", "yuv420p"]
+    if threads:
+        args += ["-threads", str(threads)]
+    return args
+
+
+def frame_pipe_command(
+    resolution,
+    fps: float,
+    outputs: List[Tuple],
+    audio_file: Optional[str] = None,
+    duration: Optional[float] = None,
+    threads: Optional[int] = None,
+) -> List[str]:
+    """
+    Командная строка FFmpeg, принимающего сырые RGB-кадры из stdin
+
+    Args:
+        resolution: размер кадров (ширина, высота)
+        fps: частота кадров
+        outputs: пары (путь к файлу, EncoderProfile) или тройки
+            (путь, EncoderProfile, дополнительные аргументы выхода)
+        audio_file: аудиодорожка для всех выходов (опционально)
+        duration: длительность выходных файлов в секундах
+        threads: потоки кодировщиков на все выходы вместе (None - без ограничения)
+
+    Returns:
+        list: команда целиком (вместе с бинарником)
+    """
+    if not outputs:
+        raise ValueError("Не указано ни одного выходного файла")
+
+    # Кодировщики выходов работают параллельно: бюджет потоков делится между ними
+    if threads:
+        threads = max(1, threads // len(outputs))
+
+    width, height = resolution
+    args = ["-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}"]
+    args += ["-r", f"{fps}", "-i", "pipe:0"]
+    if audio_file:
+        args += ["-i", audio_file]
+
+    for output in outputs:
+        output_file, encoder = output[0], output[1]
+        extra_args = list(output[2]) if len(output) > 2 else []
+        os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+        args += ["-map", "0:v:0"]
+        if audio_file:
+            args += ["-map", "1:a:0", "-c:a", encoder.audio_codec]
+            args += ["-b:a", encoder.audio_bitrate]
+        args += encoder_args(encoder, threads)
+        if duration is not None:
+            args += ["-t", f"{duration:.3f}"]
+        args += extra_args + [output_file]
+
+    return [FFMPEG_BINARY, "-hide_banner", "-loglevel", "error", "-y"] + args
+
+
+class FramePipe:
+    """
+    Передает сырые RGB-кадры в один процесс FFmpeg
+
+    Процесс может кодировать один и тот же поток кадров сразу в несколько
+    выходных файлов (каждый со своим профилем кодирования): кадры
+    рендерятся и передаются один раз, а кодируются параллельно.
+    """
+
+    def __init__(
+        self,
+        resolution,
+        fps: float,
+        outputs: List[Tuple],
+        audio_file: Optional[str] = None,
+        duration: Optional[float] = None,
+        threads: Optional[int] = None,
+    ):
+        """
+        Запускает FFmpeg
+
+        Args:
+            resolution: размер кадров (ширина, высота)
+            fps: частота кадров
+            outputs: пары (путь к файлу, EncoderProfile) или тройки
+                (путь, EncoderProfile, дополнительные аргументы выхода)
+            audio_file: аудиодорожка для всех выходов (опционально)
+            duration: длительность выходных файлов в секундах
+            threads: потоки кодировщиков на все выходы вместе (None - без ограничения)
+        """
+        width, height = resolution
+        self.frame_bytes = width * height * 3
+        self.output_files = [output[0] for output in outputs]
+
+        command = frame_pipe_command(
+            resolution, fps, outputs, audio_file, duration, threads
+        )
+        logging.debug(f"Запуск FFmpeg: {' '.join(command)}")
+
+        # stderr пишем во временный файл: непрочитанный PIPE может заблокировать FFmpeg
+        self._stderr = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(
+            command, stdin=subprocess.PIPE, stderr=self._stderr
+        )
+
+    def write(self, frame):
+        """
+        Передает один кадр (H x W x 3, uint8)
+
+        Raises:
+            RuntimeError: если FFmpeg завершился раньше времени
+        """
+        # Непрерывный массив передается без копирования
+        if frame.flags.c_contiguous:
+            data = memoryview(frame).cast("B")
+        else:
+            data = frame.tobytes()
+        if len(data) != self.frame_bytes:
+            raise ValueError(
+                f"Неверный размер кадра: {len(data)} байт вместо {self.frame_bytes}"
+            )
+
+        try:
+            self.process.stdin.write(data)
+        except BrokenPipeError:
+            self.process.wait()
+            raise RuntimeError(f"FFmpeg завершился досрочно\n{self._error_tail()}")
+
+    def close(self):
+        """
+        Завершает поток кадров и ждет окончания кодирования
+
+        Raises:
+            RuntimeError: если FFmpeg завершился с ошибкой
+        """
+        try:
+            self.process.stdin.close()
+        except BrokenPipeError:
+            pass
+
+        if self.process.wait() != 0:
+            raise RuntimeError(f"Ошибка кодирования FFmpeg\n{self._error_tail()}")
+        self._stderr.close()
+
+    def abort(self):
+        """Прерывает кодирование (недописанные файлы остаются битыми)"""
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+        self._stderr.close()
+
+    def _error_tail(self) -> str:
+        self._stderr.seek(0)
+        lines = self._stderr.read().decode("utf-8", "replace").strip().splitlines()
+        return "\n".join(lines[-10:])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+class FrameSpanWriter:
+    """
+    Кодирует видео с переменной частотой кадров (VFR)
+
+    Каждый неповторяющийся кадр сохраняется один раз (PPM без сжатия)
+    вместе с длительностью показа, а FFmpeg читает их через
+    concat-демультиплексор и получает метки времени вместо копий кадров.
+    Время считается в целых кадрах и переводится в микросекунды от начала
+    видео, поэтому ошибки округления не накапливаются.
+    """
+
+    def __init__(
+        self,
+        folder: str,
+        resolution,
+        fps: float,
+        output_file: str,
+        encoder,
+        audio_file: Optional[str] = None,
+        duration: Optional[float] = None,
+        threads: Optional[int] = None,
+    ):
+        """
+        Args:
+            folder: папка для кадров и списка concat (временная папка задачи)
+            resolution: размер кадров (ширина, высота)
+            fps: номинальная частота кадров
+            output_file: итоговый файл
+            encoder: профиль кодирования (EncoderProfile)
+            audio_file: аудиодорожка (опционально)
+            duration: длительность итогового файла в секундах
+            threads: потоки кодировщика (None - FFmpeg выбирает сам)
+        """
+        width, height = resolution
+        self.folder = folder
+        self.fps = fps
+        self.output_file = output_file
+        self.encoder = encoder
+        self.audio_file = audio_file
+        self.duration = duration
+        self.threads = threads
+        self.frame_bytes = width * height * 3
+        self._header = f"P6\n{width} {height}\n255\n".encode("ascii")
+        # (файл кадра, номер первого кадра, число кадров)
+        self.entries: List[Tuple[str, int, int]] = []
+        self.frames = 0
+        os.makedirs(folder, exist_ok=True)
+
+    def write(self, frame, count: int = 1):
+        """
+        Добавляет кадр, который показывается count номинальных кадров подряд
+
+        Args:
+            frame: кадр H x W x 3, uint8
+            count: число одинаковых кадров, которые он заменяет
+        """
+        if frame.flags.c_contiguous:
+            data = memoryview(frame).cast("B")
+        else:
+            data = frame.tobytes()
+        if len(data) != self.frame_bytes:
+            raise ValueError(
+                f"Неверный размер кадра: {len(data)} байт вместо {self.frame_bytes}"
+            )
+
+        path = os.path.join(self.folder, f"frame_{len(self.entries):06d}.ppm")
+        with open(path, "wb") as frame_file:
+            frame_file.write(self._header)
+            frame_file.write(data)
+        self.entries.append((path, self.frames, count))
+        self.frames += count
+
+    def _microseconds(self, frame: int) -> int:
+        return int(round(frame * 1_000_000 / self.fps))
+
+    def write_list(self, list_path: str):
+        """Записывает список concat с длительностью каждого кадра"""
+        with open(list_path, "w", encoding="utf-8") as list_file:
+            list_file.write("ffconcat version 1.0\n")
+            for path, first, count in self.entries:
+                escaped = os.path.abspath(path).replace("'", "'\\''")
+                length = self._microseconds(first + count) - self._microseconds(first)
+                list_file.write(f"file '{escaped}'\n")
+                # Без явной частоты кадр получает метку времени с шагом 1/25 с
+                list_file.write(f"option framerate {self.fps}\n")
+                list_file.write(f"duration {length}us\n")
+
+    def close(self):
+        """
+        Кодирует записанные кадры
+
+        Raises:
+            RuntimeError: если FFmpeg завершился с ошибкой
+        """
+        if not self.entries:
+            raise ValueError("Нет кадров для кодирования")
+
+        list_path = os.path.join(self.folder, "frames.ffconcat")
+        self.write_list(list_path)
+        os.makedirs(os.path.dirname(self.output_file) or ".", exist_ok=True)
+
+        args = ["-f", "concat", "-safe", "0", "-i", list_path]
+        if self.audio_file:
+            args += ["-i", self.audio_file, "-map", "0:v:0", "-map", "1:a:0"]
+            args += ["-c:a", self.encoder.audio_codec, "-b:a", self.encoder.audio_bitrate]
+        args += encoder_args(self.encoder, self.threads)
+        args += ["-fps_mode", "vfr"]
+        if self.duration is not None:
+            args += ["-t", f"{self.duration:.3f}"]
+        args += ["-movflags", "+faststart", self.output_file]
+
+        run_ffmpeg(args, "Кодирование VFR")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        return False
+
+
+def progressive_args(mode: str, segment_duration: float, hls_dir: str = "") -> List[str]:
+    """
+    Аргументы выхода для прогрессивной записи во время рендеринга
+
+    Ключевые кадры ставятся каждые segment_duration секунд, чтобы первые
+    фрагменты появлялись сразу, а не через стандартные ~10 секунд.
+
+    Args:
+        mode: 'fmp4' - фрагментированный MP4, 'hls' - плейлист HLS
+        segment_duration: длительность фрагмента в секундах
+        hls_dir: папка для сегментов HLS (только для mode='hls')
+
+    Returns:
+        list: аргументы командной строки (перед именем выходного файла)
+    """
+    args = ["-force_key_frames", f"expr:gte(t,n_forced*{segment_duration})"]
+
+    if mode == "fmp4":
+        # Каждый фрагмент самодостаточен: файл можно смотреть, пока он пишется
+        args += ["-movflags", "frag_keyframe+empty_moov+default_base_moof"]
+        # В empty_moov нет edit list: задержка B-кадров сдвинула бы видео
+        # относительно звука и удлинила бы файл на пару кадров
+        args += ["-bf", "0"]
+    elif mode == "hls":
+        # Плейлист типа event дополняется после каждого готового сегмента
+        args += ["-f", "hls", "-hls_time", f"{segment_duration}"]
+        args += ["-hls_playlist_type", "event", "-hls_segment_type", "fmp4"]
+        args += ["-hls_fmp4_init_filename", "init.mp4"]
+        args += ["-hls_segment_filename", os.path.join(hls_dir, "seg_%05d.m4s")]
+        args += ["-hls_flags", "independent_segments"]
+    else:
+        raise ValueError(f"Неизвестный режим прогрессивного вывода: {mode}")
+
+    return args
+
+
+def copy_video_stream(input_file: str, output_file: str, duration: Optional[float] = None):
+    """
+    Копирует видеодорожку файла без перекодирования (звук отбрасывается)
+
+    Args:
+        input_file: исходный видеофайл
+        output_file: итоговый MP4
+        duration: ограничение длительности в секундах
+    """
+    os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+    args = ["-i", input_file, "-map", "0:v:0", "-c:v", "copy", "-an"]
+    if duration is not None:
+        args += ["-t", f"{duration:.3f}"]
+    args += ["-movflags", "+faststart", output_file]
+    run_ffmpeg(args, "Копирование видеоклипа")
+
+
+def remux_to_mp4(input_file: str, output_file: str):
+    """
+    Перепаковывает поток (например, плейлист HLS) в обычный MP4 без перекодирования
+
+    Args:
+        input_file: исходный файл или плейлист
+        output_file: итоговый MP4 (moov в начале файла)
+    """
+    os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+    run_ffmpeg(
+        ["-i", input_file, "-c", "copy", "-movflags", "+faststart", output_file],
+        "Сборка MP4",
+    )
+
+
+def probe_media(path: str) -> dict:
+    """
+    Читает параметры медиафайла из заголовков контейнера без декодирования
+
+    Используется "ffmpeg -i" без выходного файла: FFmpeg разбирает только
+    заголовки и сразу завершается, поэтому проверка занимает миллисекунды
+    независимо от длины файла.
+
+    Args:
+        path: путь к аудио- или видеофайлу
+
+    Returns:
+        dict: duration, bitrate, audio_codec, sample_rate, channels,
+            video_codec, width, height, pix_fmt, fps (None для отсутствующих значений)
+
+    Raises:
+        RuntimeError: если FFmpeg не смог открыть файл
+    """
+    command = [FFMPEG_BINARY, "-hide_banner", "-i", path]
+    result = subprocess.run(command, capture_output=True, text=True, errors="replace")
+    output = result.stderr
+
+    if "Input #0" not in output:
+        error_tail = "\n".join(output.strip().splitlines()[-3:])
+        raise RuntimeError(f"Не удалось прочитать {path}\n{error_tail}")
+
+    info = {
+        "duration": None,
+        "bitrate": None,
+        "audio_codec": None,
+        "sample_rate": None,
+        "channels": None,
+        "video_codec": None,
+        "width": None,
+        "height": None,
+        "pix_fmt": None,
+        "fps": None,
+    }
+
+    match = _DURATION_RE.search(output)
+    if match:
+        hours, minutes, seconds = match.groups()
+        info["duration"] = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+    match = _BITRATE_RE.search(output)
+    if match:
+        info["bitrate"] = int(match.group(1)) * 1000
+
+    match = _AUDIO_STREAM_RE.search(output)
+    if match:
+        codec, sample_rate, channels = match.groups()
+        info["audio_codec"] = codec
+        info["sample_rate"] = int(sample_rate) if sample_rate else None
+        info["channels"] = channels.strip() if channels else None
+
+    match = _VIDEO_STREAM_RE.search(output)
+    if match:
+        info["video_codec"] = match.group(1)
+        info["width"], info["height"] = int(match.group(2)), int(match.group(3))
+        video_line = match.group(0)
+        pix_fmt = _PIX_FMT_RE.search(video_line)
+        info["pix_fmt"] = pix_fmt.group(1) if pix_fmt else None
+        fps = _FPS_RE.search(video_line)
+        info["fps"] = float(fps.group(1)) if fps else None
+
+    return info
+
+
+def analyze_loudness(path: str) -> dict:
+    """
+    Измеряет громкость аудио по EBU R128 (декодирует весь файл)
+
+    Args:
+        path: путь к аудио- или видеофайлу
+
+    Returns:
+        dict: loudness - интегральная громкость в LUFS,
+            peak - истинный пик в dBFS (-inf для тишины)
+
+    Raises:
+        RuntimeError: если FFmpeg не смог декодировать звук
+    """
+    command = [FFMPEG_BINARY, "-hide_banner", "-nostats", "-i", path, "-map", "0:a:0"]
+    # Покадровый журнал фильтра уходит на уровень verbose, остается только сводка
+    command += ["-af", "ebur128=peak=true:framelog=verbose", "-f", "null", "-"]
+    result = subprocess.run(command, capture_output=True, text=True, errors="replace")
+    output = result.stderr
+
+    loudness = _LOUDNESS_RE.search(output)
+    peak = _PEAK_RE.search(output)
+    if result.returncode != 0 or loudness is None or peak is None:
+        error_tail = "\n".join(output.strip().splitlines()[-3:])
+        raise RuntimeError(f"Не удалось измерить громкость {path}\n{error_tail}")
+
+    return {"loudness": float(loudness.group(1)), "peak": float(peak.group(1))}
+
+
+def extract_frame(path: str, t: float, fps: Optional[float] = None) -> np.ndarray:
+    """
+    Декодирует один кадр видеофайла в момент t
+
+    FFmpeg возвращает первый кадр, который начинается не раньше t, а MoviePy
+    показывает кадр, который начался не позже t. Если частота кадров файла
+    известна, выбирается кадр как в MoviePy: переход идет в середину
+    предыдущего кадра, и округление времени не сдвигает выбор.
+
+    Args:
+        path: путь к видеофайлу
+        t: время от начала файла в секундах
+        fps: частота кадров файла (None - первый кадр не раньше t)
+
+    Returns:
+        np.ndarray: кадр H x W x 3 uint8 в исходном размере
+
+    Raises:
+        RuntimeError: если FFmpeg не вернул кадр
+    """
+    t = max(0.0, t)
+    if fps:
+        # Номер кадра как в FFMPEG_VideoReader.get_frame
+        number = int(fps * t + 0.00001)
+        t = (number - 0.5) / fps if number > 0 else 0.0
+
+    # -ss перед -i: переход по ключевым кадрам, декодируется только хвост GOP
+    command = [FFMPEG_BINARY, "-hide_banner", "-loglevel", "error"]
+    command += ["-ss", f"{t:.6f}", "-i", path, "-frames:v", "1"]
+    command += ["-f", "image2pipe", "-c:v", "ppm", "pipe:1"]
+    result = subprocess.run(command, capture_output=True)
+    if result.returncode != 0 or not result.stdout:
+        error_tail = result.stderr.decode("utf-8", "replace").strip()[-300:]
+        raise RuntimeError(f"Не удалось прочитать кадр {path} ({t:.2f} с)\n{error_tail}")
+
+    with Image.open(io.BytesIO(result.stdout)) as img:
+        return np.asarray(img.convert("RGB"))
+
+
+def decode_frames(path: str, resolution: Tuple[int, int], fps: float) -> List[np.ndarray]:
+    """
+    Декодирует видеофайл в кадры на равномерной сетке fps
+
+    Файл с переменной частотой кадров (VFR) приводится к той же сетке,
+    поэтому кадр n соответствует моменту n / fps, как при рендеринге.
+
+    Args:
+        path: путь к видеофайлу
+        resolution: размер кадров (ширина, высота)
+        fps: частота кадров сетки
+
+    Returns:
+        list: кадры H x W x 3 uint8
+
+    Raises:
+        RuntimeError: если FFmpeg завершился с ошибкой
+    """
+    width, height = resolution
+    command = [FFMPEG_BINARY, "-hide_banner", "-loglevel", "error", "-i", path]
+    command += ["-vf", f"fps={fps},scale={width}:{height}", "-an"]
+    command += ["-f", "rawvideo", "-pix_fmt", "rgb24", "pipe:1"]
+    result = subprocess.run(command, capture_output=True)
+    if result.returncode != 0:
+        error_tail = result.stderr.decode("utf-8", "replace").strip()[-300:]
+        raise RuntimeError(f"Не удалось декодировать {path}\n{error_tail}")
+
+    frames = np.frombuffer(result.stdout, dtype=np.uint8)
+    return list(frames.reshape(-1, height, width, 3))
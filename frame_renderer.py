@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Прямой рендеринг отдельных кадров по плану (NumPy и Pillow, без клипов MoviePy)
+
+Кадр в момент t собирается так же, как в конвейере MoviePy:
+подготовленный (вписанный в разрешение) слайд -> зум по ключевым
+кадрам плана -> наложения, видимые в момент t -> субтитры (по желанию).
+Нужен там, где требуются отдельные кадры, а не весь видеоряд: постер
+и превью для перемотки строятся по плану, без повторного декодирования
+готового видео. Текст реплики растеризуется тем же TextClip, что и в
+конвейере MoviePy, один раз на реплику, и смешивается с кадром по маске.
+
+Здесь же лежат общие операции над пикселями: вписывание изображения
+в кадр (letterbox), зум относительно центра (zoom_frame) и текстовый
+клип реплики (subtitle_clip).
+
+Автор: [@EvilBabayka]
+Дата: 2025
+"""
+
+import logging
+from bisect import bisect_right
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+from moviepy import TextClip
+from moviepy.tools import compute_position
+from PIL import Image, ImageFont
+
+from ffmpeg_tools import extract_frame, probe_media
+from image_archive import open_image
+from overlays import burn_overlays, load_overlays
+from render_plan import RenderPlan, SlidePlan, SubtitleCue, SubtitleStyle
+
+
+def letterbox(img: Image.Image, resolution: Tuple[int, int]) -> Image.Image:
+    """
+    Вписывает изображение в кадр с сохранением пропорций (черные поля)
+
+    Args:
+        img: исходное изображение
+        resolution: размер кадра (ширина, высота)
+
+    Returns:
+        Image.Image: RGB-кадр нужного размера
+    """
+    # Конвертируем в RGB если необходимо
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+
+    # Получаем размеры
+    original_width, original_height = img.size
+    target_width, target_height = resolution
+
+    # Вычисляем пропорции
+    width_ratio = target_width / original_width
+    height_ratio = target_height / original_height
+
+    # Используем меньший коэффициент, чтобы изображение поместилось целиком
+    scale_ratio = min(width_ratio, height_ratio)
+
+    # Новые размеры
+    new_width = int(original_width * scale_ratio)
+    new_height = int(original_height * scale_ratio)
+
+    # Изменяем размер (ИСПРАВЛЕНО: resize вместо resized)
+    resized_img = img.resize((new_width, new_height), resample=Image.Resampling.LANCZOS)
+
+    # Создаем фон нужного размера
+    background = Image.new("RGB", (target_width, target_height), (0, 0, 0))
+
+    # Размещаем изображение по центру
+    paste_x = (target_width - new_width) // 2
+    paste_y = (target_height - new_height) // 2
+    background.paste(resized_img, (paste_x, paste_y))
+
+    return background
+
+
+def zoom_frame(frame: np.ndarray, scale: float) -> np.ndarray:
+    """
+    Увеличивает кадр относительно центра, сохраняя его размер
+
+    Args:
+        frame: исходный кадр (H x W x 3)
+        scale: коэффициент увеличения (1.0 = без изменений)
+
+    Returns:
+        np.ndarray: кадр того же размера
+    """
+    if abs(scale - 1.0) < 1e-6:
+        return frame
+
+    height, width = frame.shape[:2]
+    crop_width = width / scale
+    crop_height = height / scale
+    left = (width - crop_width) / 2
+    top = (height - crop_height) / 2
+
+    # resize с box вырезает и масштабирует за один проход (с субпиксельной точностью)
+    image = Image.fromarray(frame)
+    zoomed = image.resize(
+        (width, height),
+        resample=Image.Resampling.BILINEAR,
+        box=(left, top, left + crop_width, top + crop_height),
+    )
+    return np.asarray(zoomed)
+
+
+def subtitle_font(font: Optional[str]) -> Optional[str]:
+    """
+    Проверяет шрифт субтитров
+
+    MoviePy 2 принимает только файл шрифта (или имя, которое находит
+    Pillow). Если шрифт не найден, используется шрифт Pillow по умолчанию.
+
+    Args:
+        font: путь к файлу шрифта или имя шрифта
+
+    Returns:
+        str: шрифт для TextClip или None (шрифт по умолчанию)
+    """
+    if not font:
+        return None
+    try:
+        ImageFont.truetype(font, 12)
+        return font
+    except OSError:
+        logging.warning(
+            f"Шрифт субтитров {font} не найден, используется шрифт по умолчанию"
+        )
+        return None
+
+
+def subtitle_clip(
+    cue: SubtitleCue,
+    style: SubtitleStyle,
+    font: Optional[str],
+    resolution: Tuple[int, int],
+) -> TextClip:
+    """
+    Текстовый клип одной реплики
+
+    Args:
+        cue: реплика субтитров
+        style: оформление субтитров
+        font: шрифт (см. subtitle_font)
+        resolution: размер кадра (ширина, высота)
+
+    Returns:
+        TextClip: клип с временем и положением реплики
+    """
+    # MoviePy 2: text=, font_size=, font - файл шрифта
+    return (
+        TextClip(
+            font=font,
+            text=cue.text,
+            font_size=style.fontsize,
+            color=style.color,
+            method="caption",
+            size=(resolution[0] - 100, None),  # Отступы по бокам
+        )
+        .with_duration(cue.duration)
+        .with_start(cue.start)
+        .with_position(style.position)
+    )
+
+
+class FrameRenderer:
+    """
+    Рендерит отдельные кадры плана без сборки видеоряда
+    """
+
+    def __init__(
+        self,
+        plan: RenderPlan,
+        canvas: Optional[Callable[[SlidePlan], np.ndarray]] = None,
+        subtitles: bool = False,
+    ):
+        """
+        Args:
+            plan: план рендеринга
+            canvas: подготовленный кадр слайда-изображения (например, из кеша
+                слайдов или SlideStore); по умолчанию изображение вписывается
+                в разрешение плана заново
+            subtitles: рисовать ли субтитры плана
+        """
+        self.plan = plan
+        self.resolution = tuple(plan.resolution)
+        self._canvas = canvas or self._letterbox_canvas
+        self._starts = [slide.start for slide in plan.slides]
+        self._layers = load_overlays(plan.overlays, self.resolution)
+        self.subtitles = subtitles and bool(plan.cues)
+        self._font = subtitle_font(plan.subtitle_style.font) if self.subtitles else None
+        # Растеризованные реплики, видимые в последнем кадре: номер -> (RGBA, x, y)
+        self._cue_layers: Dict[int, Optional[tuple]] = {}
+        # Частота кадров видеоклипов: кадр выбирается так же, как в MoviePy
+        self._video_fps: Dict[str, Optional[float]] = {}
+        # Соседние кадры обычно из одного слайда: последний кадр слайда держим
+        self._last_slide: Optional[SlidePlan] = None
+        self._last_canvas: Optional[np.ndarray] = None
+
+    def _letterbox_canvas(self, slide: SlidePlan) -> np.ndarray:
+        with open_image(slide.source) as img:
+            return np.asarray(letterbox(img, self.resolution), dtype=np.uint8)
+
+    def slide_at(self, t: float) -> Optional[SlidePlan]:
+        """Слайд, который показывается в момент t (или None)"""
+        number = bisect_right(self._starts, t) - 1
+        if number < 0:
+            return None
+        slide = self.plan.slides[number]
+        return slide if t < slide.end or number == len(self._starts) - 1 else None
+
+    def _slide_canvas(self, slide: SlidePlan) -> np.ndarray:
+        if slide is not self._last_slide:
+            try:
+                self._last_canvas = self._canvas(slide)
+            except Exception as e:
+                # Как при рендеринге видео: нечитаемый слайд - черный кадр
+                logging.warning(f"Слайд {slide.source} не прочитан: {e}")
+                width, height = self.resolution
+                self._last_canvas = np.zeros((height, width, 3), dtype=np.uint8)
+            self._last_slide = slide
+        return self._last_canvas
+
+    def _cue_layer(self, number: int) -> Optional[tuple]:
+        """Реплика как RGBA и ее положение (None - реплику не удалось построить)"""
+        cue = self.plan.cues[number]
+        try:
+            style = self.plan.subtitle_style
+            clip = subtitle_clip(cue, style, self._font, self.resolution)
+            pixels = clip.get_frame(0).astype("uint8")
+            height, width = pixels.shape[:2]
+            alpha = np.full((height, width), 255, dtype=np.uint8)
+            if clip.mask is not None:
+                # Как в CompositeVideoClip: маска в 0-255 с отбрасыванием дробной части
+                alpha = (clip.mask.get_frame(0) * 255).astype("uint8")
+            x, y = compute_position(
+                (width, height), self.resolution, clip.pos(0), clip.relative_pos
+            )
+            return np.dstack([pixels, alpha]), int(x), int(y)
+        except Exception as e:
+            logging.warning(f"Ошибка создания субтитра '{cue.text}': {e}")
+            return None
+
+    def _burn_subtitles(self, frame: np.ndarray, t: float) -> np.ndarray:
+        """Смешивает с кадром реплики, видимые в момент t"""
+        active = [
+            number for number, cue in enumerate(self.plan.cues) if cue.start <= t < cue.end
+        ]
+        # Держим только видимые реплики: на длинном видео их тысячи
+        self._cue_layers = {
+            number: (
+                self._cue_layers[number]
+                if number in self._cue_layers
+                else self._cue_layer(number)
+            )
+            for number in active
+        }
+
+        width, height = self.resolution
+        # Кадр может быть подготовленным слайдом из кеша: рисуем на копии
+        copied = False
+        for number in active:
+            layer = self._cue_layers[number]
+            if layer is None:
+                continue
+            rgba, x, y = layer
+            left, top = max(x, 0), max(y, 0)
+            right = min(x + rgba.shape[1], width)
+            bottom = min(y + rgba.shape[0], height)
+            if left >= right or top >= bottom:
+                continue
+
+            if not copied:
+                frame, copied = np.array(frame), True
+            # alpha_composite, как в CompositeVideoClip, но только в прямоугольнике реплики
+            region = Image.fromarray(frame[top:bottom, left:right]).convert("RGBA")
+            text = Image.fromarray(rgba[top - y : bottom - y, left - x : right - x], "RGBA")
+            composed = Image.alpha_composite(region, text)
+            frame[top:bottom, left:right] = np.asarray(composed)[:, :, :3]
+        return frame
+
+    def frame_at(self, t: float) -> np.ndarray:
+        """
+        Кадр видео в момент t (субтитры - если они включены)
+
+        Args:
+            t: время от начала видео в секундах
+
+        Returns:
+            np.ndarray: кадр H x W x 3 uint8
+        """
+        width, height = self.resolution
+        slide = self.slide_at(t)
+        if slide is None:
+            frame = np.zeros((height, width, 3), dtype=np.uint8)
+        elif slide.is_video:
+            if slide.source not in self._video_fps:
+                self._video_fps[slide.source] = probe_media(slide.source)["fps"]
+            frame = extract_frame(
+                slide.source,
+                min(t - slide.start, slide.duration),
+                self._video_fps[slide.source],
+            )
+            if frame.shape[:2] != (height, width):
+                frame = np.asarray(letterbox(Image.fromarray(frame), self.resolution))
+        else:
+            local_t = t - slide.start
+            frame = zoom_frame(self._slide_canvas(slide), slide.scale_at(local_t))
+
+        active = [layer for layer in self._layers if layer.spec.shown_at(t)]
+        if active:
+            frame = burn_overlays(frame, active)
+        if self.subtitles:
+            frame = self._burn_subtitles(frame, t)
+        return frame
+
+    def thumbnail_at(self, t: float, width: int) -> Image.Image:
+        """
+        Уменьшенный кадр видео в момент t
+
+        Args:
+            t: время от начала видео в секундах
+            width: ширина миниатюры (высота - по пропорциям кадра)
+
+        Returns:
+            Image.Image: RGB-миниатюра
+        """
+        frame_width, frame_height = self.resolution
+        height = max(1, int(round(frame_height * width / frame_width)))
+        try:
+            frame = self.frame_at(t)
+        except Exception as e:
+            logging.warning(f"Кадр {t:.2f} с не построен: {e}")
+            frame = np.zeros((frame_height, frame_width, 3), dtype=np.uint8)
+        return Image.fromarray(frame).resize(
+            (width, height), resample=Image.Resampling.LANCZOS
+        )
@@ -0,0 +1,434 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бюджет ресурсов задачи: потоки, память и время
+
+Когда на одной машине идет несколько рендерингов, FFmpeg, NumPy и
+MoviePy сами выбирают число потоков, а одна большая задача может
+занять всю память. Бюджет задачи задает единые ограничения:
+    - threads - потоки для пула подготовки, кодировщика FFmpeg и NumPy;
+    - memory  - пиковая память задачи вместе с ее процессами FFmpeg
+                сверх того, что процесс занимал до ее начала;
+    - timeout - предельное время задачи.
+
+В одном процессе может идти несколько задач (асинхронный API). Задаче
+засчитываются ее собственные процессы FFmpeg (см. JobGovernor.track) и
+равная доля роста памяти самого процесса и незарегистрированных дочерних
+процессов. Ограничение потоков NumPy действует на весь процесс, поэтому
+оно ставится один раз - самое строгое из бюджетов идущих задач - и
+снимается, когда завершается последняя из них.
+
+До начала рендеринга оценивается, сколько памяти понадобится. Если
+оценка не влезает в бюджет, задача упрощается (слайды читаются из
+memory-mapped хранилища, кадры готовятся меньшими порциями), а если
+не помогает и это - прерывается с понятной причиной. Во время рендеринга
+бюджет проверяется в цикле кадров.
+
+Автор: [@EvilBabayka]
+Дата: 2025
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import List, Optional
+
+# threadpoolctl (опционально) ограничивает потоки BLAS/OpenMP внутри NumPy
+try:
+    from threadpoolctl import threadpool_limits
+except ImportError:
+    threadpool_limits = None
+
+# Состояния задачи
+STATUS_OK = "ok"
+STATUS_DEGRADED = "degraded"
+STATUS_TIMEOUT = "timeout"
+STATUS_MEMORY = "memory"
+
+# Проверять память не чаще, чем раз в столько секунд (чтение /proc не бесплатно)
+CHECK_INTERVAL = 0.25
+
+# Память кодировщика на пиксель кадра (libx264, preset medium: lookahead,
+# опорные кадры, потоки; замерено на 1280x720 - около 220 МБ)
+ENCODER_BYTES_PER_PIXEL = 240
+
+# Рабочие кадры Python помимо слайдов (текущий кадр, зум, буферы записи)
+WORKING_FRAMES = 12
+
+# Задачи, идущие в этом процессе, и общее для них ограничение потоков NumPy
+_active_lock = threading.Lock()
+_active_governors: List["JobGovernor"] = []
+_thread_limiter = None
+_thread_limit: Optional[int] = None
+
+
+class BudgetExceededError(RuntimeError):
+    """Задача вышла за бюджет ресурсов"""
+
+    def __init__(self, status: str, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _process_children(pid: int) -> List[int]:
+    """Дочерние процессы (Linux, /proc)"""
+    children = []
+    try:
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children", "r") as children_file:
+                children += [int(child) for child in children_file.read().split()]
+    except OSError:
+        pass
+    return children
+
+
+def _process_rss(pid: int) -> int:
+    """Резидентная память процесса в байтах (0 если недоступна)"""
+    try:
+        with open(f"/proc/{pid}/statm", "r") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def memory_usage(pid: Optional[int] = None) -> int:
+    """
+    Память процесса вместе со всеми дочерними процессами (FFmpeg)
+
+    Args:
+        pid: процесс (по умолчанию текущий)
+
+    Returns:
+        int: резидентная память в байтах (0 если /proc недоступен)
+    """
+    total = 0
+    pending = [pid or os.getpid()]
+    while pending:
+        current = pending.pop()
+        total += _process_rss(current)
+        pending += _process_children(current)
+    return total
+
+
+def _shared_memory(tracked) -> int:
+    """
+    Память процесса без дочерних процессов, зарегистрированных задачами
+
+    Args:
+        tracked: множество pid, которые задачи считают своими
+
+    Returns:
+        int: память самого процесса и остальных дочерних процессов в байтах
+    """
+    pid = os.getpid()
+    total = _process_rss(pid)
+    for child in _process_children(pid):
+        if child not in tracked:
+            total += memory_usage(child)
+    return total
+
+
+def _tracked_pids() -> set:
+    """Процессы, зарегистрированные идущими задачами (под _active_lock)"""
+    return {pid for job in _active_governors for pid in job._pids}
+
+
+def _apply_thread_limit():
+    """Ставит самое строгое ограничение потоков из идущих задач (под _active_lock)"""
+    global _thread_limiter, _thread_limit
+    if threadpool_limits is None:
+        return
+
+    limits = [job.budget.threads for job in _active_governors if job.budget.threads]
+    wanted = min(limits) if limits else None
+    if wanted == _thread_limit:
+        return
+
+    # Ограничитель помнит исходные настройки: сначала снимаем старый
+    if _thread_limiter is not None:
+        _thread_limiter.unregister()
+        _thread_limiter = None
+    if wanted is not None:
+        _thread_limiter = threadpool_limits(limits=wanted)
+    _thread_limit = wanted
+
+
+def estimate_memory(
+    resolution,
+    slides_in_memory: int,
+    prefetch_frames: int = 0,
+    encoder_bytes_per_pixel: float = ENCODER_BYTES_PER_PIXEL,
+) -> int:
+    """
+    Оценка пиковой памяти рендеринга
+
+    Слайды, которые держит MoviePy (по одному кадру на слайд), кадры,
+    подготовленные заранее, рабочие кадры и память кодировщика.
+
+    Args:
+        resolution: разрешение видео (ширина, высота)
+        slides_in_memory: сколько слайдов одновременно в памяти
+        prefetch_frames: сколько кадров готовится заранее
+        encoder_bytes_per_pixel: память кодировщика на пиксель кадра
+
+    Returns:
+        int: память в байтах
+    """
+    width, height = resolution
+    frame = width * height * 3
+    working_set = encoder_bytes_per_pixel * width * height + WORKING_FRAMES * frame
+    return int(working_set + (slides_in_memory + prefetch_frames) * frame)
+
+
+class ResourceBudget:
+    """
+    Ограничения одной задачи (None - без ограничения)
+    """
+
+    def __init__(
+        self,
+        threads: Optional[int] = None,
+        memory: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ):
+        """
+        Args:
+            threads: число потоков процессора
+            memory: пиковая память задачи в байтах (сверх занятой до ее начала)
+            timeout: предельное время задачи в секундах
+        """
+        self.threads = threads
+        self.memory = memory
+        self.timeout = timeout
+
+    @classmethod
+    def from_config(cls, config: dict) -> "ResourceBudget":
+        return cls(
+            threads=config.get("job_threads"),
+            memory=config.get("job_memory_limit"),
+            timeout=config.get("job_timeout"),
+        )
+
+    @property
+    def unlimited(self) -> bool:
+        return self.threads is None and self.memory is None and self.timeout is None
+
+
+class JobGovernor:
+    """
+    Следит за соблюдением бюджета одной задачи
+    """
+
+    def __init__(self, budget: ResourceBudget):
+        """
+        Args:
+            budget: ограничения задачи
+        """
+        self.budget = budget
+        self.status = STATUS_OK
+        self.degradations: List[str] = []
+        self.started_at: Optional[float] = None
+        self.peak_memory = 0
+        # Решение fit_memory для текущей задачи: слайды из хранилища
+        self.use_slide_store = False
+        self._last_check = 0.0
+        self._baseline_memory = 0
+        # Процессы FFmpeg этой задачи
+        self._pids: List[int] = []
+
+    def start(self):
+        """Начинает отсчет времени и ограничивает потоки NumPy"""
+        self.started_at = time.monotonic()
+        self.status = STATUS_OK
+        self.degradations = []
+        self.peak_memory = 0
+        self.use_slide_store = False
+        self._pids = []
+
+        with _active_lock:
+            if self not in _active_governors:
+                _active_governors.append(self)
+            self._baseline_memory = _shared_memory(_tracked_pids())
+            _apply_thread_limit()
+
+    def stop(self):
+        """Снимает ограничение потоков NumPy, если это была последняя задача"""
+        with _active_lock:
+            if self in _active_governors:
+                _active_governors.remove(self)
+            _apply_thread_limit()
+        self._pids = []
+        # Упрощение относилось к закончившейся задаче
+        self.use_slide_store = False
+
+    def track(self, pid: int):
+        """
+        Засчитывает задаче процесс (например, FFmpeg) вместе с его потомками
+
+        Args:
+            pid: идентификатор процесса
+        """
+        with _active_lock:
+            self._pids.append(pid)
+
+    def memory_used(self) -> int:
+        """
+        Память задачи сверх занятой процессом до ее начала
+
+        Returns:
+            int: память своих процессов FFmpeg и доля общего роста в байтах
+        """
+        with _active_lock:
+            # Завершившийся процесс больше не потомок (его pid мог достаться другому)
+            children = set(_process_children(os.getpid()))
+            self._pids = [pid for pid in self._pids if pid in children]
+            own = sum(memory_usage(pid) for pid in self._pids)
+            shared = _shared_memory(_tracked_pids())
+            jobs = max(1, len(_active_governors))
+        return own + max(0, shared - self._baseline_memory) // jobs
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.stop()
+        return False
+
+    @property
+    def elapsed(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return time.monotonic() - self.started_at
+
+    def workers(self, requested: Optional[int] = None) -> int:
+        """
+        Число потоков пула с учетом бюджета
+
+        Args:
+            requested: сколько потоков хотелось бы (None - по числу ядер)
+        """
+        workers = requested or os.cpu_count() or 1
+        if self.budget.threads:
+            workers = min(workers, self.budget.threads)
+        return max(1, workers)
+
+    @property
+    def encoder_threads(self) -> Optional[int]:
+        """Потоки для кодировщика FFmpeg (None - FFmpeg выбирает сам)"""
+        return self.budget.threads
+
+    def degrade(self, description: str):
+        """Записывает упрощение задачи ради бюджета"""
+        self.status = STATUS_DEGRADED
+        self.degradations.append(description)
+        logging.warning(f"Бюджет задачи: {description}")
+        print(f"🪫 {description}")
+
+    def fit_memory(self, resolution, slides: int, prefetch_frames: int) -> dict:
+        """
+        Подбирает режим рендеринга под бюджет памяти (оценка - estimate_memory)
+
+        Решение о хранилище слайдов запоминается в use_slide_store до конца
+        задачи (stop): настройки VideoComposer при этом не меняются.
+
+        Args:
+            resolution: разрешение видео (ширина, высота)
+            slides: число слайдов
+            prefetch_frames: сколько кадров хотелось бы готовить заранее
+
+        Returns:
+            dict: use_slide_store (bool), prefetch_frames (int)
+
+        Raises:
+            BudgetExceededError: если задача не влезает даже в упрощенном виде
+        """
+        result = {"use_slide_store": False, "prefetch_frames": prefetch_frames}
+        limit = self.budget.memory
+        if limit is None:
+            return result
+
+        width, height = resolution
+        frame = width * height * 3
+
+        def estimate(slides_in_memory: int, prefetch: int) -> int:
+            return estimate_memory(resolution, slides_in_memory, prefetch)
+
+        if estimate(slides, prefetch_frames) <= limit:
+            return result
+
+        # 1. Слайды из memory-mapped хранилища: страницы вытесняемы, в памяти
+        #    фактически только слайды, которые сейчас на экране
+        result["use_slide_store"] = True
+        self.use_slide_store = True
+        if estimate(2, prefetch_frames) > limit:
+            # 2. Меньше кадров впрок
+            minimum = min(1, prefetch_frames)
+            available = (limit - estimate(2, 0)) // frame
+            if available < minimum:
+                self.status = STATUS_MEMORY
+                raise BudgetExceededError(
+                    STATUS_MEMORY,
+                    f"Задаче нужно не меньше {estimate(2, minimum) / (1024 * 1024):.0f} МБ "
+                    f"при бюджете {limit / (1024 * 1024):.0f} МБ",
+                )
+            result["prefetch_frames"] = int(available)
+
+        description = "слайды читаются из хранилища"
+        if prefetch_frames:
+            description += f", кадров впрок: {result['prefetch_frames']}"
+        self.degrade(f"{description} (бюджет памяти {limit / (1024 * 1024):.0f} МБ)")
+        return result
+
+    def check(self, force: bool = False):
+        """
+        Проверяет время и память (вызывается в цикле кадров)
+
+        Args:
+            force: проверить память, даже если с прошлой проверки прошло мало времени
+
+        Raises:
+            BudgetExceededError: если бюджет превышен
+        """
+        if self.started_at is None:
+            return
+
+        timeout = self.budget.timeout
+        if timeout is not None and self.elapsed > timeout:
+            self.status = STATUS_TIMEOUT
+            raise BudgetExceededError(
+                STATUS_TIMEOUT, f"Задача не уложилась в {timeout:g} с"
+            )
+
+        limit = self.budget.memory
+        now = time.monotonic()
+        if limit is None or (not force and now - self._last_check < CHECK_INTERVAL):
+            return
+        self._last_check = now
+
+        used = self.memory_used()
+        self.peak_memory = max(self.peak_memory, used)
+        if used > limit:
+            self.status = STATUS_MEMORY
+            raise BudgetExceededError(
+                STATUS_MEMORY,
+                f"Задача заняла {used / (1024 * 1024):.0f} МБ "
+                f"при бюджете {limit / (1024 * 1024):.0f} МБ",
+            )
+
+    def governed(self, clip):
+        """
+        Оборачивает клип так, чтобы каждый кадр проверял бюджет
+
+        Работает для любого способа записи (write_videofile, iter_frames),
+        поэтому задача прерывается и внутри кодирования MoviePy.
+        """
+        if self.budget.timeout is None and self.budget.memory is None:
+            return clip
+
+        def check_frame(get_frame, t):
+            self.check()
+            return get_frame(t)
+
+        return clip.transform(check_frame, keep_duration=True)
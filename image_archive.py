@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Изображения внутри zip- и tar-архивов без распаковки на диск
+
+Источником изображений может быть не только папка, но и архив. Каждое
+изображение архива адресуется строкой "<путь к архиву>::<имя в архиве>"
+и дальше проходит по конвейеру как обычный путь: попадает в план
+рендеринга, в индекс каталога, в хранилище слайдов. Байты изображения
+читаются из архива прямо в память и сразу декодируются, временные файлы
+не создаются.
+
+Архивы открываются один раз на поток (и на процесс - дескриптор
+нельзя делить с дочерними процессами после fork). В zip и несжатом
+tar любое изображение читается сразу, в сжатом tar (tar.gz и т.п.)
+- распаковкой потока, поэтому изображения выгоднее читать по порядку.
+
+Автор: [@EvilBabayka]
+Дата: 2025
+"""
+
+import io
+import os
+import bz2
+import gzip
+import lzma
+import calendar
+import tarfile
+import zipfile
+import threading
+from typing import BinaryIO, List, Optional, Tuple
+
+from PIL import Image
+
+# Поддерживаемые архивы (составные расширения - раньше простых)
+ARCHIVE_EXTENSIONS = [
+    ".tar.gz",
+    ".tar.bz2",
+    ".tar.xz",
+    ".zip",
+    ".tar",
+    ".tgz",
+    ".tbz2",
+    ".txz",
+]
+
+# Разделитель пути к архиву и имени изображения в нем
+MEMBER_SEPARATOR = "::"
+
+_local = threading.local()
+
+
+class ArchiveMember:
+    """
+    Изображение в архиве (по заголовку архива, без чтения содержимого)
+    """
+
+    def __init__(self, name: str, size: int, mtime_ns: int, crc: Optional[int] = None):
+        self.name = name
+        self.size = size
+        self.mtime_ns = mtime_ns
+        # Контрольная сумма из заголовка zip (в tar ее нет)
+        self.crc = crc
+
+    def __repr__(self) -> str:
+        return f"ArchiveMember({self.name!r}, size={self.size})"
+
+
+def is_archive(path) -> bool:
+    """Является ли путь файлом поддерживаемого архива"""
+    path = str(path)
+    return path.lower().endswith(tuple(ARCHIVE_EXTENSIONS)) and os.path.isfile(path)
+
+
+def random_access(archive: str) -> bool:
+    """
+    Можно ли читать изображения архива в любом порядке и из разных потоков
+
+    zip и несжатый tar - можно. Сжатый tar распаковывается как один поток:
+    каждый поток со своим дескриптором распаковывал бы архив заново.
+    """
+    if zipfile.is_zipfile(archive):
+        return True
+    with tarfile.open(archive) as tar_file:
+        compressed = (gzip.GzipFile, bz2.BZ2File, lzma.LZMAFile)
+        return not isinstance(tar_file.fileobj, compressed)
+
+
+def member_path(archive: str, name: str) -> str:
+    """Путь изображения в архиве: <архив>::<имя>"""
+    return f"{archive}{MEMBER_SEPARATOR}{name}"
+
+
+def split_member(path) -> Optional[Tuple[str, str]]:
+    """
+    Разбирает путь изображения в архиве
+
+    Args:
+        path: путь к файлу или к изображению в архиве
+
+    Returns:
+        tuple: (путь к архиву, имя в архиве) или None для обычного файла
+    """
+    archive, separator, name = str(path).partition(MEMBER_SEPARATOR)
+    if not separator or not name or not is_archive(archive):
+        return None
+    return archive, name
+
+
+def list_members(archive: str) -> List[ArchiveMember]:
+    """
+    Перечисляет файлы архива по его оглавлению (содержимое не читается)
+
+    Args:
+        archive: путь к архиву
+
+    Returns:
+        list: файлы архива в порядке оглавления (без папок)
+    """
+    if zipfile.is_zipfile(archive):
+        with zipfile.ZipFile(archive) as zip_file:
+            return [
+                ArchiveMember(
+                    info.filename,
+                    info.file_size,
+                    # Время в zip хранится с точностью до 2 секунд, без пояса
+                    _zip_timestamp(info.date_time) * 1_000_000_000,
+                    info.CRC,
+                )
+                for info in zip_file.infolist()
+                if not info.is_dir()
+            ]
+
+    with tarfile.open(archive) as tar_file:
+        return [
+            ArchiveMember(info.name, info.size, int(info.mtime) * 1_000_000_000)
+            for info in tar_file.getmembers()
+            if info.isfile()
+        ]
+
+
+def _zip_timestamp(date_time: tuple) -> int:
+    try:
+        return calendar.timegm(date_time + (0, 0, 0))
+    except (OverflowError, ValueError):
+        return 0
+
+
+def _open_archive(archive: str):
+    """Открытый архив текущего потока (переоткрывается, если файл изменился)"""
+    archives = getattr(_local, "archives", None)
+    if archives is None or getattr(_local, "pid", None) != os.getpid():
+        archives = _local.archives = {}
+        _local.pid = os.getpid()
+
+    stat = os.stat(archive)
+    stamp = (stat.st_size, stat.st_mtime_ns)
+    known = archives.get(archive)
+    if known is not None and known[0] == stamp:
+        return known[1]
+
+    if known is not None:
+        known[1].close()
+    if zipfile.is_zipfile(archive):
+        handle = zipfile.ZipFile(archive)
+    else:
+        handle = tarfile.open(archive)
+    archives[archive] = (stamp, handle)
+    return handle
+
+
+def open_source(path) -> BinaryIO:
+    """
+    Открывает файл или изображение в архиве для чтения байтов
+
+    Args:
+        path: путь к файлу или <архив>::<имя>
+
+    Returns:
+        BinaryIO: поток байтов (закрывает вызывающий код)
+
+    Raises:
+        FileNotFoundError: если изображения нет в архиве
+    """
+    member = split_member(path)
+    if member is None:
+        return open(path, "rb")
+
+    archive, name = member
+    handle = _open_archive(archive)
+    try:
+        if isinstance(handle, zipfile.ZipFile):
+            return handle.open(name)
+        stream = handle.extractfile(name)
+    except KeyError:
+        stream = None
+    if stream is None:
+        raise FileNotFoundError(f"Нет файла {name} в архиве {archive}")
+    return stream
+
+
+def read_source(path) -> bytes:
+    """Содержимое файла или изображения в архиве целиком"""
+    with open_source(path) as source:
+        return source.read()
+
+
+def source_size(path) -> int:
+    """Размер файла или изображения в архиве (по заголовку) в байтах"""
+    member = split_member(path)
+    if member is None:
+        return os.path.getsize(path)
+
+    archive, name = member
+    handle = _open_archive(archive)
+    try:
+        if isinstance(handle, zipfile.ZipFile):
+            return handle.getinfo(name).file_size
+        return handle.getmember(name).size
+    except KeyError:
+        raise FileNotFoundError(f"Нет файла {name} в архиве {archive}")
+
+
+def open_image(path) -> Image.Image:
+    """
+    Открывает изображение из файла или из архива
+
+    Изображение из архива читается в память (сжатые байты, без
+    распаковки на диск) и декодируется оттуда: Pillow нужен произвольный
+    доступ к данным, а поток распаковки читает назад только с начала.
+
+    Args:
+        path: путь к файлу или <архив>::<имя>
+
+    Returns:
+        Image.Image: открытое изображение (пиксели декодируются при load())
+    """
+    if split_member(path) is None:
+        return Image.open(path)
+    return Image.open(io.BytesIO(read_source(path)))
@@ -0,0 +1,473 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Каталог изображений с постоянным индексом
+
+Папка сканируется за один проход os.scandir, файлы сортируются
+"естественно" (img2.jpg раньше img10.jpg). Для каждого изображения
+в небольшом индексе на диске хранятся размер, время изменения, хеш
+содержимого и размеры кадра. При повторном сканировании хеш и размеры
+пересчитываются только для новых и измененных файлов, поэтому даже
+огромные папки сканируются быстро.
+
+Вместо папки можно передать zip- или tar-архив: изображения берутся
+из его оглавления с теми же расширениями и той же сортировкой, хеш
+считается по содержимому каждого изображения в архиве (см. image_archive).
+
+Режим наблюдения периодически пересканирует папку и сообщает, какие
+изображения добавлены, изменены или удалены. Подготовленные
+(вписанные в кадр) слайды хранятся в кеше по хешу содержимого, поэтому
+заново готовятся только изменившиеся изображения.
+
+Структура папки каталога:
+    temp/catalog/<id папки>.json             - индекс изображений папки
+    temp/catalog/slides/<хеш>_<Ш>x<В>.npy    - подготовленные слайды
+
+Автор: [@EvilBabayka]
+Дата: 2025
+"""
+
+import io
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import tempfile
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from ffmpeg_tools import probe_media
+from image_archive import (
+    ArchiveMember,
+    is_archive,
+    list_members,
+    member_path,
+    read_source,
+    split_member,
+)
+
+# Версия формата индекса
+CATALOG_VERSION = 1
+
+# Расширения по умолчанию (как SUPPORTED_IMAGE_FORMATS в config.py)
+DEFAULT_EXTENSIONS = [".jpg", ".jpeg", ".png", ".bmp", ".tiff", ".tif"]
+
+# Видеоклипы по умолчанию (как SUPPORTED_VIDEO_FORMATS в config.py):
+# размеры берутся из заголовков контейнера, а не через PIL
+VIDEO_EXTENSIONS = [".mp4", ".mov", ".mkv", ".webm", ".avi", ".m4v"]
+
+_DIGITS_RE = re.compile(r"(\d+)")
+
+
+def natural_sort_key(name: str):
+    """
+    Ключ "естественной" сортировки: числа в имени сравниваются как числа
+
+    Args:
+        name: имя файла
+
+    Returns:
+        tuple: ключ сортировки
+    """
+    return tuple(
+        (0, int(part), part) if part.isdigit() else (1, 0, part.lower())
+        for part in _DIGITS_RE.split(name)
+        if part
+    )
+
+
+def scan_images(folder: str, extensions=None) -> List[os.DirEntry]:
+    """
+    Находит изображения в папке за один проход по каталогу
+
+    Args:
+        folder: папка с изображениями
+        extensions: допустимые расширения (по умолчанию DEFAULT_EXTENSIONS)
+
+    Returns:
+        list: записи os.DirEntry в естественном порядке имен
+    """
+    extensions = {ext.lower() for ext in extensions or DEFAULT_EXTENSIONS}
+    with os.scandir(folder) as entries:
+        images = [
+            entry
+            for entry in entries
+            if os.path.splitext(entry.name)[1].lower() in extensions and entry.is_file()
+        ]
+    images.sort(key=lambda entry: natural_sort_key(entry.name))
+    return images
+
+
+def scan_archive(archive: str, extensions=None) -> List[ArchiveMember]:
+    """
+    Находит изображения в архиве по его оглавлению
+
+    Args:
+        archive: путь к zip- или tar-архиву
+        extensions: допустимые расширения (по умолчанию DEFAULT_EXTENSIONS)
+
+    Returns:
+        list: файлы архива (ArchiveMember) в естественном порядке имен
+    """
+    extensions = {ext.lower() for ext in extensions or DEFAULT_EXTENSIONS}
+    members = [
+        member
+        for member in list_members(archive)
+        if os.path.splitext(member.name)[1].lower() in extensions
+        # Служебные копии метаданных из архивов macOS - не изображения
+        and not member.name.startswith("__MACOSX/")
+    ]
+    members.sort(key=lambda member: natural_sort_key(member.name))
+    return members
+
+
+def file_hash(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Хеш содержимого файла (sha256)"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as source:
+        for chunk in iter(lambda: source.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class CatalogChanges:
+    """
+    Изменения в папке по сравнению с предыдущим сканированием
+    """
+
+    def __init__(self, added: List[str], changed: List[str], removed: List[str]):
+        self.added = added
+        self.changed = changed
+        self.removed = removed
+
+    @property
+    def updated(self) -> List[str]:
+        """Новые и измененные файлы (их слайды нужно подготовить заново)"""
+        return self.added + self.changed
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.changed or self.removed)
+
+    def __repr__(self) -> str:
+        return (
+            f"CatalogChanges(added={len(self.added)}, changed={len(self.changed)}, "
+            f"removed={len(self.removed)})"
+        )
+
+
+class ImageCatalog:
+    """
+    Изображения одной папки (или архива) с постоянным индексом
+    """
+
+    def __init__(
+        self,
+        folder: str,
+        extensions=None,
+        index_folder: Optional[str] = "temp/catalog",
+        video_extensions=None,
+    ):
+        """
+        Открывает каталог папки (индекс читается, если он уже есть)
+
+        Args:
+            folder: папка с изображениями или zip/tar-архив
+            extensions: допустимые расширения (по умолчанию DEFAULT_EXTENSIONS)
+            index_folder: папка для индексов (None - индекс только в памяти)
+            video_extensions: расширения видеоклипов среди extensions
+                (по умолчанию VIDEO_EXTENSIONS)
+        """
+        self.folder = os.path.abspath(folder)
+        self.archive = is_archive(self.folder)
+        self.extensions = list(extensions or DEFAULT_EXTENSIONS)
+        self.video_extensions = {
+            ext.lower() for ext in video_extensions or VIDEO_EXTENSIONS
+        }
+        if self.archive:
+            # Видеоклип нельзя прочитать из архива без распаковки
+            self.extensions = [
+                ext for ext in self.extensions if ext.lower() not in self.video_extensions
+            ]
+        self.index_path = None
+        if index_folder:
+            folder_id = hashlib.sha256(self.folder.encode("utf-8")).hexdigest()[:16]
+            self.index_path = os.path.join(index_folder, f"{folder_id}.json")
+
+        # Имя файла -> запись индекса, в естественном порядке имен
+        self.entries: Dict[str, dict] = self._load()
+
+    def _load(self) -> Dict[str, dict]:
+        if not self.index_path:
+            return {}
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as index_file:
+                index = json.load(index_file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+        if index.get("version") != CATALOG_VERSION or index.get("folder") != self.folder:
+            return {}
+        return index["entries"]
+
+    def save(self):
+        """Сохраняет индекс на диск (атомарно)"""
+        if not self.index_path:
+            return
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        temp_path = f"{self.index_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as index_file:
+            json.dump(
+                {"version": CATALOG_VERSION, "folder": self.folder, "entries": self.entries},
+                index_file,
+                ensure_ascii=False,
+            )
+        os.replace(temp_path, self.index_path)
+
+    def scan(self) -> CatalogChanges:
+        """
+        Пересканирует папку и обновляет индекс
+
+        Хеш и размеры кадра пересчитываются только для файлов, у которых
+        изменились размер или время изменения.
+
+        Returns:
+            CatalogChanges: что изменилось с прошлого сканирования
+        """
+        added, changed = [], []
+        entries = {}
+
+        for name, size, mtime_ns, crc in self._listing():
+            previous = self.entries.get(name)
+            if (
+                previous is not None
+                and previous["size"] == size
+                and previous["mtime_ns"] == mtime_ns
+                and previous.get("crc") == crc
+            ):
+                entries[name] = previous
+                continue
+
+            entries[name] = self._describe(self.path_for(name), size, mtime_ns)
+            if crc is not None:
+                entries[name]["crc"] = crc
+            if previous is None:
+                added.append(name)
+            elif previous["hash"] != entries[name]["hash"]:
+                changed.append(name)
+
+        removed = [name for name in self.entries if name not in entries]
+        changes = CatalogChanges(added, changed, removed)
+
+        index_changed = changes or list(entries.items()) != list(self.entries.items())
+        self.entries = entries
+        if index_changed or (self.index_path and not os.path.isfile(self.index_path)):
+            self.save()
+
+        if changes:
+            logging.info(f"Каталог {self.folder}: {changes}")
+        return changes
+
+    def _listing(self) -> Iterator[Tuple[str, int, int, Optional[int]]]:
+        """Изображения папки или архива: (имя, размер, время изменения, crc)"""
+        if not self.archive:
+            for dir_entry in scan_images(self.folder, self.extensions):
+                stat = dir_entry.stat()
+                yield dir_entry.name, stat.st_size, stat.st_mtime_ns, None
+            return
+
+        # Время в оглавлении архива грубое (секунды), поэтому в zip
+        # изменение содержимого дополнительно видно по crc
+        for member in scan_archive(self.folder, self.extensions):
+            yield member.name, member.size, member.mtime_ns, member.crc
+
+    def _describe(self, path: str, size: int, mtime_ns: int) -> dict:
+        """Запись индекса для одного файла (хеш и размеры по заголовку)"""
+        entry = {
+            "size": size,
+            "mtime_ns": mtime_ns,
+            "hash": None,
+            "width": None,
+            "height": None,
+        }
+        data = None
+        if self.archive:
+            # Изображение из архива читается один раз: и для хеша, и для заголовка
+            data = read_source(path)
+            entry["hash"] = hashlib.sha256(data).hexdigest()
+        else:
+            entry["hash"] = file_hash(path)
+        try:
+            if os.path.splitext(path)[1].lower() in self.video_extensions:
+                info = probe_media(path)
+                entry["width"], entry["height"] = info["width"], info["height"]
+                entry["duration"] = info["duration"]
+            else:
+                # Image.open читает только заголовок
+                with Image.open(io.BytesIO(data) if data is not None else path) as img:
+                    entry["width"], entry["height"] = img.size
+        except Exception as e:
+            entry["error"] = str(e)
+            logging.warning(f"Не удалось прочитать заголовок {path}: {e}")
+        return entry
+
+    def path_for(self, name: str) -> str:
+        """Путь к изображению каталога по имени из индекса"""
+        if self.archive:
+            return member_path(self.folder, name)
+        return os.path.join(self.folder, name)
+
+    @property
+    def files(self) -> List[Path]:
+        """Пути к читаемым изображениям в естественном порядке"""
+        return [
+            Path(self.path_for(name))
+            for name, entry in self.entries.items()
+            if not entry.get("error")
+        ]
+
+    @property
+    def broken(self) -> List[str]:
+        """Имена файлов, заголовок которых прочитать не удалось"""
+        return [name for name, entry in self.entries.items() if entry.get("error")]
+
+    def get(self, path) -> Optional[dict]:
+        """Запись индекса для файла этой папки (или None)"""
+        member = split_member(path)
+        if member is not None:
+            archive, name = member
+            if not self.archive or os.path.abspath(archive) != self.folder:
+                return None
+            return self.entries.get(name)
+
+        path = os.path.abspath(path)
+        if os.path.dirname(path) != self.folder:
+            return None
+        return self.entries.get(os.path.basename(path))
+
+    def watch(self, interval: float = 2.0) -> Iterator[CatalogChanges]:
+        """
+        Следит за папкой и выдает изменения по мере их появления
+
+        Первое значение - результат начального сканирования (если индекс
+        уже был, в нем только то, что изменилось с прошлого запуска).
+        Дальше значения выдаются только при изменениях. Остановка - Ctrl-C
+        или выход из цикла у вызывающего кода.
+
+        Args:
+            interval: пауза между сканированиями в секундах
+
+        Yields:
+            CatalogChanges: изменения в папке
+        """
+        yield self.scan()
+        while True:
+            time.sleep(interval)
+            changes = self.scan()
+            if changes:
+                yield changes
+
+
+class PreparedSlideCache:
+    """
+    Подготовленные слайды, сохраненные по хешу содержимого изображения
+
+    Один и тот же файл с тем же содержимым готовится для каждого
+    разрешения только один раз, даже если его переименовали
+    или перенесли в другую папку. Если задан предел размера, после записи
+    удаляются слайды, которые дольше всех не читались.
+    """
+
+    def __init__(self, folder: str, max_bytes: Optional[int] = None):
+        """
+        Args:
+            folder: папка кеша
+            max_bytes: предел размера кеша в байтах (None - без предела)
+        """
+        self.folder = folder
+        self.max_bytes = max_bytes
+        os.makedirs(folder, exist_ok=True)
+
+    def path_for(self, content_hash: str, resolution: Tuple[int, int]) -> str:
+        """Путь к файлу слайда в кеше"""
+        width, height = resolution
+        return os.path.join(self.folder, f"{content_hash}_{width}x{height}.npy")
+
+    def get(self, content_hash: str, resolution: Tuple[int, int]) -> Optional[np.ndarray]:
+        """
+        Возвращает слайд из кеша (отображение в память) или None
+
+        Args:
+            content_hash: хеш содержимого исходного изображения
+            resolution: разрешение слайда (ширина, высота)
+        """
+        path = self.path_for(content_hash, resolution)
+        try:
+            pixels = np.load(path, mmap_mode="r")
+        except (FileNotFoundError, ValueError):
+            return None
+        if self.max_bytes:
+            # Время изменения - время последнего чтения для вытеснения
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+        return pixels
+
+    def put(self, content_hash: str, resolution: Tuple[int, int], pixels: np.ndarray):
+        """
+        Сохраняет подготовленный слайд в кеш (атомарно)
+
+        Args:
+            content_hash: хеш содержимого исходного изображения
+            resolution: разрешение слайда (ширина, высота)
+            pixels: массив H x W x 3 uint8
+        """
+        path = self.path_for(content_hash, resolution)
+        # Уникальное имя: тот же слайд могут одновременно готовить
+        # несколько процессов
+        descriptor, temp_path = tempfile.mkstemp(dir=self.folder, suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "wb") as cache_file:
+                np.save(cache_file, np.ascontiguousarray(pixels, dtype=np.uint8))
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        if self.max_bytes:
+            self._evict(keep=path)
+
+    def _evict(self, keep: str):
+        """Удаляет давно не читавшиеся слайды, пока кеш больше предела"""
+        entries = []
+        total = 0
+        with os.scandir(self.folder) as scan:
+            for entry in scan:
+                if not entry.name.endswith(".npy"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                total += stat.st_size
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            # Только что записанный слайд сейчас понадобится
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                # Файл удалил другой процесс или он еще открыт (Windows)
+                continue
+            total -= size
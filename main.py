@@ -16,8 +16,10 @@ import logging
 # Импортируем наши модули (пока они не созданы, но будут)
 try:
     from video_composer import VideoComposer
-    from config import VIDEO_CONFIG
+    from config import VIDEO_CONFIG, get_output_targets
     from utils import setup_folders, validate_input_files, cleanup_temp_files
+    from preflight import run_preflight
+    from estimator import estimate_cost
 except ImportError as e:
     print(f"Ошибка импорта модулей: {e}")
     print("Убедитесь, что все файлы проекта находятся в одной папке")
@@ -53,10 +55,10 @@ def get_user_input():
     print("📁 Укажите файлы для создания видео:")
     print()
 
-    # Папка с изображениями
+    # Папка с изображениями (или zip/tar-архив с ними)
     while True:
         images_folder = input(
-            "Папка с изображениями (или Enter для input/images/): "
+            "Папка или архив с изображениями (или Enter для input/images/): "
         ).strip()
         if not images_folder:
             images_folder = "input/images/"
@@ -113,8 +115,14 @@ def get_user_input():
     }
 
 
-def main():
-    """Главная функция программы"""
+def main(presets=None, dry_run=False):
+    """
+    Главная функция программы
+
+    presets: список конфигураций для создания нескольких вариантов видео
+    за один проход (None - одно видео с настройками по умолчанию)
+    dry_run: только оценить время, память и размер, не создавая видео
+    """
 
     # Настройка логирования
     setup_logging()
@@ -137,8 +145,16 @@ def main():
             print("❌ Ошибка в файлах. Программа завершена.")
             return
 
+        if VIDEO_CONFIG.get("preflight_enabled", True) and not check_inputs(file_paths):
+            print("❌ Ошибка в файлах. Программа завершена.")
+            return
+
         print("✅ Все файлы найдены и готовы к обработке")
 
+        if dry_run:
+            estimate_variants(file_paths, presets)
+            return
+
         # Создание объекта видеоредактора
         print("\n🎬 Инициализация видеоредактора...")
         composer = VideoComposer(VIDEO_CONFIG)
@@ -147,6 +163,10 @@ def main():
         print("\n🔄 Создание видео... Это может занять несколько минут.")
         print("⏳ Пожалуйста, подождите...")
 
+        if presets:
+            create_variants(composer, file_paths, presets)
+            return
+
         success = composer.create_video(
             images_folder=file_paths["images_folder"],
             audio_file=file_paths["audio_file"],
@@ -166,6 +186,8 @@ def main():
 
     except KeyboardInterrupt:
         print("\n\n⚠️ Программа прервана пользователем")
+        if VIDEO_CONFIG.get("resumable_render"):
+            print("💾 Готовые сегменты сохранены, повторный запуск продолжит рендеринг")
         logging.info("Программа прервана пользователем")
 
     except Exception as e:
@@ -179,6 +201,75 @@ def main():
         print("✅ Программа завершена")
 
 
+def check_inputs(file_paths):
+    """
+    Быстро проверяет содержимое входных файлов до начала рендеринга
+
+    Returns:
+        bool: True если можно продолжать
+    """
+    report = run_preflight(
+        file_paths["images_folder"],
+        file_paths["audio_file"],
+        file_paths["subtitles_file"],
+        VIDEO_CONFIG,
+    )
+    report.print_summary()
+
+    report_file = VIDEO_CONFIG.get("preflight_report_file")
+    if report_file:
+        report.save(report_file)
+        logging.info(f"Отчет проверки сохранен: {report_file}")
+
+    if not report.valid_images and not report.valid_videos:
+        return False
+    if VIDEO_CONFIG.get("preflight_strict") and not report.ok:
+        return False
+    return True
+
+
+def create_variants(composer, file_paths, presets):
+    """Создает несколько вариантов видео за один проход и выводит итоги"""
+    targets = get_output_targets(file_paths["output_file"], presets)
+    results = composer.create_videos(
+        images_folder=file_paths["images_folder"],
+        audio_file=file_paths["audio_file"],
+        subtitles_file=file_paths["subtitles_file"],
+        targets=targets,
+    )
+
+    for target in targets:
+        if results.get(target["name"]):
+            size = os.path.getsize(target["output_file"]) / (1024 * 1024)
+            print(f"🎉 {target['name']}: {target['output_file']} ({size:.1f} МБ)")
+            logging.info(f"Видео успешно создано: {target['output_file']}")
+        else:
+            print(f"❌ {target['name']}: ошибка при создании видео")
+            logging.error(f"Ошибка при создании варианта {target['name']}")
+
+
+def estimate_variants(file_paths, presets):
+    """Оценивает стоимость рендеринга каждого варианта, не создавая видео"""
+    print("\n🧮 Оценка стоимости (видео не создается)...")
+    if presets:
+        targets = get_output_targets(file_paths["output_file"], presets)
+    else:
+        targets = [
+            {"name": "default", "config": VIDEO_CONFIG, "output_file": file_paths["output_file"]}
+        ]
+
+    for target in targets:
+        estimate = estimate_cost(
+            file_paths["images_folder"],
+            file_paths["audio_file"],
+            file_paths["subtitles_file"],
+            target["config"],
+            target["output_file"],
+            name=target["name"],
+        )
+        estimate.print_summary()
+
+
 def show_help():
     """Показывает справку по использованию программы"""
     help_text = """
@@ -187,11 +278,20 @@ def show_help():
     Подготовка файлов:
     1. Поместите изображения в папку input/images/ (форматы: jpg, png)
     2. Поместите аудиофайл в папку input/audio/ (форматы: mp3, wav)
-    3. (Опционально) Поместите субтитры в папку input/subtitles/ (формат: srt)
+    3. (Опционально) Поместите субтитры в папку input/subtitles/ (форматы: srt, vtt)
     
     Запуск программы:
     python main.py        - обычный запуск с интерактивным меню
     python main.py --help - показать эту справку
+    python main.py --presets default,high_quality,social_media
+                          - создать несколько вариантов за один проход
+    python main.py --dry-run [default,social_media]
+                          - оценить время, память и размер, не создавая видео
+    python estimator.py --calibrate
+                          - откалибровать оценку под эту машину
+    python render_daemon.py serve &
+    python render_daemon.py render --images input/images --audio input/audio/music.mp3
+                          - рендерить через фоновый сервис без задержки на запуск
     
     Результат:
     Готовое видео будет сохранено в папку output/
@@ -199,7 +299,7 @@ def show_help():
     Требования к файлам:
     - Изображения: любой размер, будут автоматически подогнаны
     - Аудио: любой формат, поддерживаемый FFmpeg
-    - Субтитры: формат SRT с UTF-8 кодировкой
+    - Субтитры: SRT или WebVTT в UTF-8 или cp1251 (определяется автоматически)
     """
     print(help_text)
 
@@ -208,5 +308,9 @@ if __name__ == "__main__":
     # Проверка аргументов командной строки
     if len(sys.argv) > 1 and sys.argv[1] in ["--help", "-h", "help"]:
         show_help()
+    elif len(sys.argv) > 2 and sys.argv[1] == "--presets":
+        main(presets=sys.argv[2].split(","))
+    elif len(sys.argv) > 1 and sys.argv[1] == "--dry-run":
+        main(presets=sys.argv[2].split(",") if len(sys.argv) > 2 else None, dry_run=True)
     else:
         main()
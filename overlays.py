@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Наложения поверх видео: водяной знак, логотип, плашка (lower-third)
+
+Каждое наложение декодируется и масштабируется один раз на разрешение
+и хранится с premultiplied alpha (цвет уже умножен на прозрачность),
+обрезанным до непрозрачной области. Смешивание с кадром затрагивает
+только этот прямоугольник:
+
+    кадр[прямоугольник] = цвет + кадр[прямоугольник] * (1 - alpha)
+
+Наложение, которое видно весь показ слайда без зума, впекается
+в подготовленный кадр слайда один раз (и попадает в кеш слайдов),
+поэтому на кадр видео оно ничего не стоит. Остальные (на слайдах
+с зумом, на видеоклипах, наложения с ограниченным временем показа)
+смешиваются покадрово.
+
+Автор: [@EvilBabayka]
+Дата: 2025
+"""
+
+import os
+import hashlib
+import logging
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+
+from render_plan import OverlaySpec
+
+# Именованные положения: доли свободного места по горизонтали и вертикали
+POSITIONS = {
+    "top-left": (0.0, 0.0),
+    "top": (0.5, 0.0),
+    "top-right": (1.0, 0.0),
+    "left": (0.0, 0.5),
+    "center": (0.5, 0.5),
+    "right": (1.0, 0.5),
+    "bottom-left": (0.0, 1.0),
+    "bottom": (0.5, 1.0),
+    "bottom-right": (1.0, 1.0),
+}
+
+# Готовые пиксели слоев процесса: (файл, масштаб, положение, разрешение) ->
+# (x, y, цвет, 1 - alpha, ключ) или None. Время показа в ключ не входит:
+# сегменты одного плана пользуются одними и теми же пикселями
+_LAYERS: Dict[tuple, Optional[tuple]] = {}
+
+
+class OverlayLayer:
+    """
+    Наложение, подготовленное под одно разрешение кадра
+    """
+
+    def __init__(
+        self,
+        spec: OverlaySpec,
+        x: int,
+        y: int,
+        color: np.ndarray,
+        transparency: np.ndarray,
+        key: str,
+    ):
+        """
+        Args:
+            spec: описание наложения из плана
+            x, y: левый верхний угол прямоугольника в кадре
+            color: цвет с premultiplied alpha (H x W x 3, float32)
+            transparency: 1 - alpha (H x W x 1, float32)
+            key: стабильный ключ пикселей слоя (для кеша впеченных слайдов)
+        """
+        self.spec = spec
+        self.x = x
+        self.y = y
+        self.color = color
+        self.transparency = transparency
+        self.key = key
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        """Размер прямоугольника (ширина, высота)"""
+        return self.color.shape[1], self.color.shape[0]
+
+    def blend_into(self, frame: np.ndarray):
+        """
+        Смешивает слой с кадром на месте (только свой прямоугольник)
+
+        Args:
+            frame: изменяемый кадр H x W x 3 uint8
+        """
+        width, height = self.size
+        region = frame[self.y : self.y + height, self.x : self.x + width]
+        blended = region * self.transparency
+        blended += self.color
+        np.add(blended, 0.5, out=blended)
+        region[...] = blended.astype(np.uint8)
+
+
+def _place(spec: OverlaySpec, size, resolution) -> Tuple[int, int]:
+    """Левый верхний угол наложения размера size в кадре"""
+    width, height = size
+    frame_width, frame_height = resolution
+    if isinstance(spec.position, str):
+        if spec.position not in POSITIONS:
+            raise ValueError(f"Неизвестное положение наложения: {spec.position}")
+        fx, fy = POSITIONS[spec.position]
+        margin = spec.margin
+        x = margin + fx * (frame_width - width - 2 * margin)
+        y = margin + fy * (frame_height - height - 2 * margin)
+        return int(round(x)), int(round(y))
+    x, y = spec.position
+    return int(x), int(y)
+
+
+def load_layer(spec: OverlaySpec, resolution: Tuple[int, int]) -> Optional[OverlayLayer]:
+    """
+    Декодирует и масштабирует наложение (один раз на процесс и разрешение)
+
+    Args:
+        spec: описание наложения из плана
+        resolution: разрешение кадра (ширина, высота)
+
+    Returns:
+        OverlayLayer: готовый слой или None, если наложение не попадает в кадр
+    """
+    stat = os.stat(spec.source)
+    cache_key = (
+        os.path.abspath(spec.source),
+        stat.st_size,
+        stat.st_mtime_ns,
+        spec.position,
+        spec.scale,
+        spec.opacity,
+        spec.margin,
+        tuple(resolution),
+    )
+    if cache_key not in _LAYERS:
+        _LAYERS[cache_key] = _prepare(spec, resolution, cache_key)
+    if _LAYERS[cache_key] is None:
+        return None
+    return OverlayLayer(spec, *_LAYERS[cache_key])
+
+
+def _prepare(spec: OverlaySpec, resolution, cache_key: tuple) -> Optional[tuple]:
+    """Декодирует, масштабирует и обрезает наложение до видимой части"""
+    with Image.open(spec.source) as img:
+        img = img.convert("RGBA")
+        if spec.scale:
+            width = max(1, int(round(resolution[0] * spec.scale)))
+            height = max(1, int(round(img.height * width / img.width)))
+            # Pillow масштабирует RGBA с premultiplied alpha: без ореолов по краям
+            img = img.resize((width, height), resample=Image.Resampling.LANCZOS)
+        x, y = _place(spec, img.size, resolution)
+        pixels = np.asarray(img, dtype=np.float32)
+
+    alpha = pixels[:, :, 3:4] * (float(spec.opacity) / 255.0)
+
+    # Оставляем только непрозрачную часть, попадающую в кадр
+    visible = alpha[:, :, 0] > 0
+    frame_width, frame_height = resolution
+    visible[:, : max(0, -x)] = False
+    visible[: max(0, -y), :] = False
+    visible[:, max(0, frame_width - x) :] = False
+    visible[max(0, frame_height - y) :, :] = False
+    rows = np.flatnonzero(visible.any(axis=1))
+    columns = np.flatnonzero(visible.any(axis=0))
+    if not len(rows) or not len(columns):
+        logging.warning(f"Наложение {spec.source} не видно в кадре {resolution}")
+        return None
+
+    top, bottom = rows[0], rows[-1] + 1
+    left, right = columns[0], columns[-1] + 1
+    alpha = alpha[top:bottom, left:right]
+    color = np.ascontiguousarray(pixels[top:bottom, left:right, :3] * alpha)
+    transparency = np.ascontiguousarray(1.0 - alpha)
+
+    digest = hashlib.sha256(repr(cache_key).encode("utf-8")).hexdigest()[:12]
+    logging.info(
+        f"Наложение {spec.source}: {right - left}x{bottom - top} "
+        f"в ({x + left}, {y + top})"
+    )
+    return x + left, y + top, color, transparency, digest
+
+
+def load_overlays(
+    specs: Sequence[OverlaySpec], resolution: Tuple[int, int]
+) -> List[OverlayLayer]:
+    """
+    Готовит все наложения плана (непрочитанные пропускаются с предупреждением)
+
+    Args:
+        specs: наложения из плана
+        resolution: разрешение кадра (ширина, высота)
+
+    Returns:
+        list: слои в порядке наложения
+    """
+    layers = []
+    for spec in specs:
+        try:
+            layer = load_layer(spec, resolution)
+        except Exception as e:
+            logging.warning(f"Наложение пропущено {spec.source}: {e}")
+            continue
+        if layer is not None:
+            layers.append(layer)
+    return layers
+
+
+def overlays_key(layers: Sequence[OverlayLayer]) -> str:
+    """Ключ набора слоев для кеша слайдов со впеченными наложениями"""
+    return hashlib.sha256(
+        "|".join(layer.key for layer in layers).encode("utf-8")
+    ).hexdigest()[:16]
+
+
+def burn_overlays(pixels: np.ndarray, layers: Sequence[OverlayLayer]) -> np.ndarray:
+    """
+    Впекает слои в подготовленный кадр слайда
+
+    Args:
+        pixels: кадр H x W x 3 uint8 (не изменяется)
+        layers: слои в порядке наложения
+
+    Returns:
+        np.ndarray: новый кадр с наложениями
+    """
+    frame = np.array(pixels, dtype=np.uint8)
+    for layer in layers:
+        layer.blend_into(frame)
+    return frame
+
+
+def apply_overlays(clip, layers: Sequence[OverlayLayer], offset: float = 0.0):
+    """
+    Накладывает слои на клип покадрово (смешивается только прямоугольник слоя)
+
+    Args:
+        clip: клип слайда
+        layers: слои в порядке наложения
+        offset: начало слайда на таймлайне (время наложений - от начала видео)
+
+    Returns:
+        клип с наложениями
+    """
+    if not layers:
+        return clip
+
+    def overlay_frame(get_frame, t):
+        frame = get_frame(t)
+        active = [layer for layer in layers if layer.spec.shown_at(offset + t)]
+        if not active:
+            return frame
+        # Кадр ImageClip общий для всех t, смешиваем в копии
+        return burn_overlays(frame, active)
+
+    return clip.transform(overlay_frame, keep_duration=True)
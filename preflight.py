@@ -0,0 +1,457 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Быстрая предварительная проверка входных файлов
+
+Перед рендерингом все входные файлы проверяются параллельно и без
+полного декодирования:
+    - изображения: только заголовок (размер, цветовой режим, ориентация EXIF)
+      и лимит MAX_IMAGE_SIZE; изображения из zip/tar-архива читаются
+      прямо из него;
+    - видеоклипы: заголовки контейнера через FFmpeg (кодек, размер,
+      длительность); клипы из архивов не читаются и не проверяются;
+    - аудио: заголовки контейнера через FFmpeg (длительность, кодек,
+      частота) и лимит MAX_AUDIO_DURATION; уже проверенный файл берется
+      из кеша аудио по хешу содержимого;
+    - субтитры: разбор SRT/WebVTT с ошибкой на первой битой реплике
+      (кодировка определяется автоматически).
+
+Результат - отчет, который можно сохранить в JSON и разобрать программно.
+
+Использование:
+    python preflight.py input/images input/audio/music.mp3 [субтитры.srt|.vtt] [--json отчет.json]
+
+Автор: [@EvilBabayka]
+Дата: 2025
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from PIL import UnidentifiedImageError
+
+from audio_cache import AudioAnalysisCache
+from ffmpeg_tools import probe_media
+from image_archive import (
+    is_archive,
+    member_path,
+    open_image,
+    random_access,
+    source_size,
+)
+from image_catalog import scan_archive, scan_images
+from subtitles import load_subtitles
+
+# Версия формата отчета
+REPORT_VERSION = 1
+
+# Тег EXIF с ориентацией снимка
+EXIF_ORIENTATION = 0x0112
+
+
+def probe_image(path: str, max_size: Optional[int] = None) -> dict:
+    """
+    Проверяет изображение по заголовку, не декодируя пиксели
+
+    Args:
+        path: путь к изображению (или <архив>::<имя>)
+        max_size: максимальный размер файла в байтах (None - без лимита)
+
+    Returns:
+        dict: результат проверки (ok, errors, warnings и параметры файла)
+    """
+    result = {"kind": "image", "path": path, "ok": True, "errors": [], "warnings": []}
+
+    try:
+        result["size"] = source_size(path)
+        if max_size is not None and result["size"] > max_size:
+            result["errors"].append(
+                f"Файл больше лимита: {result['size'] / (1024 * 1024):.1f} МБ "
+                f"> {max_size / (1024 * 1024):.1f} МБ"
+            )
+
+        # Читается только заголовок, пиксели декодируются при load()
+        with open_image(path) as img:
+            result["format"] = img.format
+            result["width"], result["height"] = img.size
+            result["mode"] = img.mode
+            result["orientation"] = img.getexif().get(EXIF_ORIENTATION, 1)
+
+        if result["orientation"] not in (1, None):
+            result["warnings"].append(
+                f"Ориентация EXIF {result['orientation']}: снимок хранится повернутым"
+            )
+        if result["width"] == 0 or result["height"] == 0:
+            result["errors"].append("Нулевой размер изображения")
+
+    except UnidentifiedImageError:
+        result["errors"].append("Файл не распознан как изображение")
+    except Exception as e:
+        result["errors"].append(f"Ошибка чтения: {e}")
+
+    result["ok"] = not result["errors"]
+    return result
+
+
+def probe_video(path: str) -> dict:
+    """
+    Проверяет видеоклип по заголовкам контейнера, не декодируя кадры
+
+    Args:
+        path: путь к видеоклипу
+
+    Returns:
+        dict: результат проверки (ok, errors, warnings и параметры файла)
+    """
+    result = {"kind": "video", "path": path, "ok": True, "errors": [], "warnings": []}
+
+    try:
+        result["size"] = os.path.getsize(path)
+        info = probe_media(path)
+        result.update(
+            {
+                "duration": info["duration"],
+                "codec": info["video_codec"],
+                "width": info["width"],
+                "height": info["height"],
+                "fps": info["fps"],
+            }
+        )
+
+        # Такой клип рендеринг пропустит (см. VideoComposer._probe_videos)
+        if not info["video_codec"]:
+            result["errors"].append("В файле нет видеодорожки")
+        elif not info["duration"]:
+            result["errors"].append("Длительность не указана в заголовках")
+
+    except Exception as e:
+        result["errors"].append(str(e))
+
+    result["ok"] = not result["errors"]
+    return result
+
+
+def probe_audio(
+    path: str,
+    max_duration: Optional[float] = None,
+    cache: Optional[AudioAnalysisCache] = None,
+) -> dict:
+    """
+    Проверяет аудиофайл по заголовкам контейнера, не декодируя звук
+
+    Args:
+        path: путь к аудиофайлу
+        max_duration: максимальная длительность в секундах (None - без лимита)
+        cache: кеш параметров аудио (None - кеш только в памяти)
+
+    Returns:
+        dict: результат проверки (ok, errors, warnings и параметры файла)
+    """
+    result = {"kind": "audio", "path": path, "ok": True, "errors": [], "warnings": []}
+
+    try:
+        result["size"] = os.path.getsize(path)
+        info = (cache or AudioAnalysisCache(None)).get(path)
+        result.update(
+            {
+                "duration": info["duration"],
+                "codec": info["codec"],
+                "sample_rate": info["sample_rate"],
+                "channels": info["channels"],
+                "bitrate": info["bitrate"],
+            }
+        )
+
+        if info["codec"] is None:
+            result["errors"].append("В файле нет аудиодорожки")
+        if info["duration"] is None:
+            result["warnings"].append("Длительность не указана в заголовках")
+        elif max_duration is not None and info["duration"] > max_duration:
+            result["errors"].append(
+                f"Аудио длиннее лимита: {info['duration']:.1f} с > {max_duration} с"
+            )
+
+    except Exception as e:
+        result["errors"].append(str(e))
+
+    result["ok"] = not result["errors"]
+    return result
+
+
+def probe_subtitles(path: str, formats=None) -> dict:
+    """
+    Проверяет, что файл субтитров (SRT или WebVTT) разбирается без ошибок
+
+    Args:
+        path: путь к файлу субтитров
+        formats: допустимые расширения (None - любые)
+
+    Returns:
+        dict: результат проверки (ok, errors, warnings, число реплик)
+    """
+    result = {"kind": "subtitles", "path": path, "ok": True, "errors": [], "warnings": []}
+
+    try:
+        extension = os.path.splitext(path)[1].lower()
+        if formats is not None and extension not in formats:
+            result["errors"].append(
+                f"Неподдерживаемый формат субтитров {extension} "
+                f"(поддерживаются: {', '.join(formats)})"
+            )
+        else:
+            table = load_subtitles(path, strict=True)
+            result["cues"] = len(table)
+            result["format"] = table.format
+            result["encoding"] = table.encoding
+            if not len(table):
+                result["warnings"].append("В файле нет ни одной реплики")
+            if table.first_unordered is not None:
+                result["warnings"].append(
+                    f"Реплика {table.first_unordered + 1} начинается раньше предыдущей"
+                )
+
+    except UnicodeDecodeError:
+        result["errors"].append("Не удалось определить кодировку файла")
+    except Exception as e:
+        result["errors"].append(f"Ошибка разбора: {e}")
+
+    result["ok"] = not result["errors"]
+    return result
+
+
+class PreflightReport:
+    """
+    Итог предварительной проверки
+    """
+
+    def __init__(self, items: List[dict], elapsed: float):
+        """
+        Args:
+            items: результаты проверки отдельных файлов
+            elapsed: время проверки в секундах
+        """
+        self.items = items
+        self.elapsed = elapsed
+
+    @property
+    def images(self) -> List[dict]:
+        return [item for item in self.items if item["kind"] == "image"]
+
+    @property
+    def videos(self) -> List[dict]:
+        return [item for item in self.items if item["kind"] == "video"]
+
+    @property
+    def audio(self) -> Optional[dict]:
+        return next((item for item in self.items if item["kind"] == "audio"), None)
+
+    @property
+    def subtitles(self) -> Optional[dict]:
+        return next((item for item in self.items if item["kind"] == "subtitles"), None)
+
+    @property
+    def errors(self) -> List[str]:
+        """Все ошибки в виде 'путь: описание'"""
+        errors = [
+            f"{item['path']}: {error}" for item in self.items for error in item["errors"]
+        ]
+        if not self.images and not self.videos:
+            errors.append("Не найдено ни одного изображения")
+        return errors
+
+    @property
+    def warnings(self) -> List[str]:
+        """Все предупреждения в виде 'путь: описание'"""
+        return [
+            f"{item['path']}: {warning}"
+            for item in self.items
+            for warning in item["warnings"]
+        ]
+
+    @property
+    def ok(self) -> bool:
+        """Нет ни одной ошибки"""
+        return not self.errors
+
+    @property
+    def valid_images(self) -> List[str]:
+        """Изображения, прошедшие проверку"""
+        return [item["path"] for item in self.images if item["ok"]]
+
+    @property
+    def valid_videos(self) -> List[str]:
+        """Видеоклипы, прошедшие проверку"""
+        return [item["path"] for item in self.videos if item["ok"]]
+
+    def to_dict(self) -> dict:
+        return {
+            "version": REPORT_VERSION,
+            "ok": self.ok,
+            "elapsed": round(self.elapsed, 4),
+            "summary": {
+                "images": len(self.images),
+                "valid_images": len(self.valid_images),
+                "videos": len(self.videos),
+                "valid_videos": len(self.valid_videos),
+                "errors": len(self.errors),
+                "warnings": len(self.warnings),
+            },
+            "errors": self.errors,
+            "warnings": self.warnings,
+            "items": self.items,
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), ensure_ascii=False, indent=2)
+
+    def save(self, path: str):
+        """Сохраняет отчет в JSON-файл"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as report_file:
+            report_file.write(self.to_json())
+
+    def print_summary(self):
+        """Выводит краткий итог проверки"""
+        audio = self.audio
+        print(
+            f"🔎 Проверено за {self.elapsed:.2f} с: изображений "
+            f"{len(self.valid_images)}/{len(self.images)}"
+            + (
+                f", видеоклипов {len(self.valid_videos)}/{len(self.videos)}"
+                if self.videos
+                else ""
+            )
+        )
+        if audio and audio.get("duration"):
+            print(
+                f"🎵 Аудио: {audio.get('codec')}, {audio['duration']:.1f} с, "
+                f"{audio.get('sample_rate')} Гц"
+            )
+        for warning in self.warnings:
+            print(f"⚠️ {warning}")
+        for error in self.errors:
+            print(f"❌ {error}")
+
+
+def run_preflight(
+    images_folder: str,
+    audio_file: Optional[str],
+    subtitles_file: Optional[str],
+    config: dict,
+    max_workers: Optional[int] = None,
+) -> PreflightReport:
+    """
+    Параллельно проверяет все входные файлы
+
+    Args:
+        images_folder: папка с изображениями или zip/tar-архив
+        audio_file: путь к аудиофайлу (или None)
+        subtitles_file: путь к субтитрам (или None)
+        config: конфигурация (лимиты и поддерживаемые форматы)
+        max_workers: число потоков (None - по числу процессоров)
+
+    Returns:
+        PreflightReport: отчет о проверке
+    """
+    started = time.perf_counter()
+    max_size = config.get("max_image_size")
+    max_duration = config.get("max_audio_duration")
+    extensions = config.get(
+        "supported_image_formats", [".jpg", ".jpeg", ".png", ".bmp", ".tiff", ".tif"]
+    )
+    video_formats = config.get(
+        "supported_video_formats", [".mp4", ".mov", ".mkv", ".webm", ".avi", ".m4v"]
+    )
+    subtitle_formats = config.get("supported_subtitle_formats", [".srt", ".vtt"])
+
+    if max_workers is None:
+        max_workers = min(32, (os.cpu_count() or 1) * 4)
+
+    # Чтение заголовков упирается в диск и в запуск FFmpeg, а не в GIL,
+    # поэтому пула потоков достаточно
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # Аудио - самая долгая проверка (запуск FFmpeg), начинаем с нее
+        futures = []
+        if audio_file:
+            cache = AudioAnalysisCache(config.get("audio_cache_folder", "temp/audio"))
+            futures.append(
+                executor.submit(probe_audio, audio_file, max_duration, cache)
+            )
+        if subtitles_file:
+            futures.append(
+                executor.submit(probe_subtitles, subtitles_file, subtitle_formats)
+            )
+
+        sequential = False
+        video_files = []
+        try:
+            if is_archive(images_folder):
+                image_files = [
+                    member_path(images_folder, member.name)
+                    for member in scan_archive(images_folder, extensions)
+                ]
+                # Сжатый tar читается одним потоком: в каждом потоке
+                # пула архив пришлось бы распаковывать заново
+                sequential = not random_access(images_folder)
+            else:
+                image_files = []
+                video_extensions = {ext.lower() for ext in video_formats}
+                # Один проход по папке: видеоклипы идут в список рядом с изображениями
+                for entry in scan_images(images_folder, extensions + video_formats):
+                    if os.path.splitext(entry.name)[1].lower() in video_extensions:
+                        video_files.append(entry.path)
+                    else:
+                        image_files.append(entry.path)
+        except Exception as e:
+            image_files = []
+            video_files = []
+            logging.error(f"Не удалось прочитать папку изображений: {e}")
+
+        futures += [executor.submit(probe_video, path) for path in video_files]
+        if sequential:
+            images = [probe_image(path, max_size) for path in image_files]
+        else:
+            futures += [executor.submit(probe_image, path, max_size) for path in image_files]
+            images = []
+        items = [future.result() for future in futures] + images
+
+    report = PreflightReport(items, time.perf_counter() - started)
+    logging.info(
+        f"Предварительная проверка: {len(report.images)} изображений, "
+        f"{len(report.videos)} видеоклипов, "
+        f"{len(report.errors)} ошибок, {len(report.warnings)} предупреждений "
+        f"за {report.elapsed:.3f} с"
+    )
+    return report
+
+
+def main():
+    """Проверка входных файлов из командной строки"""
+    parser = argparse.ArgumentParser(description="Предварительная проверка входных файлов")
+    parser.add_argument("images_folder", help="папка с изображениями или zip/tar-архив")
+    parser.add_argument("audio_file", nargs="?", help="аудиофайл")
+    parser.add_argument("subtitles_file", nargs="?", help="файл субтитров")
+    parser.add_argument("--json", dest="json_file", help="сохранить отчет в JSON-файл")
+    parser.add_argument("--config", default="default", help="имя конфигурации")
+    args = parser.parse_args()
+
+    from config import get_config
+
+    report = run_preflight(
+        args.images_folder, args.audio_file, args.subtitles_file, get_config(args.config)
+    )
+    if args.json_file:
+        report.save(args.json_file)
+    else:
+        print(report.to_json())
+    return 0 if report.ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
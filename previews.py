@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Постер, спрайты превью для перемотки и индекс миниатюр WebVTT
+
+Кадры берутся не из готового MP4, а строятся по плану рендеринга
+(FrameRenderer): подготовленный слайд, зум на нужный момент и наложения.
+Поэтому превью создаются в той же задаче, без повторного декодирования
+результата.
+
+Файлы рядом с видео (для output/result.mp4):
+    output/result_poster.jpg          - постер в полном разрешении
+    output/result_sprites_000.jpg     - листы миниатюр (столбцы x строки)
+    output/result_thumbnails.vtt      - индекс: интервал -> лист#xywh=x,y,w,h
+
+Автор: [@EvilBabayka]
+Дата: 2025
+"""
+
+import os
+import logging
+from typing import Dict, List, Optional
+
+from PIL import Image, features
+
+from frame_renderer import FrameRenderer
+
+# Форматы листов и постера: расширение -> формат Pillow
+IMAGE_FORMATS = {"jpg": "JPEG", "jpeg": "JPEG", "webp": "WEBP"}
+
+
+def _vtt_time(seconds: float) -> str:
+    """Время для WebVTT: ЧЧ:ММ:СС.ммм"""
+    milliseconds = int(round(seconds * 1000))
+    hours, milliseconds = divmod(milliseconds, 3600 * 1000)
+    minutes, milliseconds = divmod(milliseconds, 60 * 1000)
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}.{milliseconds:03d}"
+
+
+def preview_times(duration: float, interval: float) -> List[float]:
+    """
+    Моменты миниатюр: начало каждого интервала перемотки
+
+    Args:
+        duration: длительность видео в секундах
+        interval: шаг миниатюр в секундах
+
+    Returns:
+        list: время каждой миниатюры
+    """
+    if duration <= 0 or interval <= 0:
+        return []
+    count = int(duration // interval)
+    if duration - count * interval > 1e-6:
+        count += 1
+    return [number * interval for number in range(count)]
+
+
+def _save(img: Image.Image, path: str, image_format: str, quality: int):
+    """Сохраняет изображение атомарно (CMS не увидит недописанный файл)"""
+    temp_path = f"{path}.tmp"
+    img.save(temp_path, format=IMAGE_FORMATS[image_format], quality=quality)
+    os.replace(temp_path, path)
+
+
+def write_previews(
+    renderer: FrameRenderer,
+    output_file: str,
+    duration: float,
+    interval: float = 2.0,
+    thumb_width: int = 160,
+    columns: int = 10,
+    rows: int = 10,
+    image_format: str = "jpg",
+    quality: int = 80,
+    poster_time: Optional[float] = None,
+) -> Dict[str, object]:
+    """
+    Создает постер, листы миниатюр и индекс WebVTT для видео
+
+    Args:
+        renderer: рендерер кадров плана
+        output_file: путь к видео (рядом с ним пишутся превью)
+        duration: длительность видео в секундах
+        interval: шаг миниатюр в секундах
+        thumb_width: ширина миниатюры в пикселях
+        columns, rows: размер листа в миниатюрах
+        image_format: 'jpg' или 'webp'
+        quality: качество сжатия (1-100)
+        poster_time: момент постера (None - середина первого слайда)
+
+    Returns:
+        dict: poster, sheets (список путей), index - пути к файлам
+
+    Raises:
+        ValueError: если формат не поддерживается или в листе нет ни одной ячейки
+    """
+    if columns < 1 or rows < 1:
+        raise ValueError(f"Размер листа миниатюр должен быть не меньше 1x1: {columns}x{rows}")
+    image_format = image_format.lower().lstrip(".")
+    if image_format not in IMAGE_FORMATS:
+        raise ValueError(f"Неподдерживаемый формат превью: {image_format}")
+    if image_format == "webp" and not features.check("webp"):
+        raise ValueError("Pillow собран без поддержки WebP")
+
+    base, _ = os.path.splitext(output_file)
+    os.makedirs(os.path.dirname(base) or ".", exist_ok=True)
+
+    # Постер
+    if poster_time is None:
+        slides = renderer.plan.slides
+        poster_time = slides[0].start + slides[0].duration / 2 if slides else 0.0
+    poster_time = min(max(poster_time, 0.0), max(duration - 1e-3, 0.0))
+    poster_path = f"{base}_poster.{image_format}"
+    poster = Image.fromarray(renderer.frame_at(poster_time))
+    _save(poster, poster_path, image_format, quality)
+
+    # Листы миниатюр и индекс
+    times = preview_times(duration, interval)
+    per_sheet = columns * rows
+    sheets = []
+    cues = []
+    for first in range(0, len(times), per_sheet):
+        sheet_times = times[first : first + per_sheet]
+        thumbs = [renderer.thumbnail_at(t, thumb_width) for t in sheet_times]
+        thumb_w, thumb_h = thumbs[0].size
+        used_rows = (len(thumbs) + columns - 1) // columns
+        sheet_size = (thumb_w * min(columns, len(thumbs)), thumb_h * used_rows)
+        sheet = Image.new("RGB", sheet_size)
+
+        sheet_path = f"{base}_sprites_{len(sheets):03d}.{image_format}"
+        sheet_name = os.path.basename(sheet_path)
+        for number, (t, thumb) in enumerate(zip(sheet_times, thumbs)):
+            x = (number % columns) * thumb_w
+            y = (number // columns) * thumb_h
+            sheet.paste(thumb, (x, y))
+            end = min(t + interval, duration)
+            cues.append(
+                f"{_vtt_time(t)} --> {_vtt_time(end)}\n"
+                f"{sheet_name}#xywh={x},{y},{thumb_w},{thumb_h}\n"
+            )
+
+        _save(sheet, sheet_path, image_format, quality)
+        sheets.append(sheet_path)
+
+    index_path = f"{base}_thumbnails.vtt"
+    with open(f"{index_path}.tmp", "w", encoding="utf-8") as index_file:
+        index_file.write("WEBVTT\n\n" + "\n".join(cues))
+    os.replace(f"{index_path}.tmp", index_path)
+
+    logging.info(
+        f"Превью {output_file}: постер, {len(times)} миниатюр на {len(sheets)} листах"
+    )
+    return {"poster": poster_path, "sheets": sheets, "index": index_path}
@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Фоновый сервис рендеринга ("теплый" процесс) и тонкий клиент к нему
+
+Каждый запуск main.py платит за старт интерпретатора, импорт MoviePy,
+NumPy и imageio, поиск FFmpeg и загрузку шрифтов - для короткого ролика
+это дольше самого рендеринга. Сервис делает все это один раз и дальше
+принимает задачи через Unix-сокет. Между задачами в памяти остаются
+каталоги папок изображений, разобранные субтитры и слои наложений,
+а подготовленные слайды берутся из кеша слайдов.
+
+Протокол - строки JSON: клиент отправляет одну команду, сервис отвечает
+событиями, последнее событие содержит "final": true.
+    {"command": "ping"}
+    {"command": "status"}
+    {"command": "stop"}
+    {"command": "render", "images": ..., "audio": ..., "subtitles": ...,
+     "output": ..., "config": "default", "overrides": {...}}
+
+Клиент не импортирует MoviePy и стартует за десятки миллисекунд.
+
+Использование:
+    python render_daemon.py serve [--config default] &
+    python render_daemon.py render --images input/images --audio input/audio/music.mp3 \\
+        --output output/clip.mp4 [--config social_media]
+    python render_daemon.py status
+    python render_daemon.py stop
+
+Автор: [@EvilBabayka]
+Дата: 2025
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import socket
+import logging
+import argparse
+import tempfile
+import threading
+import socketserver
+import subprocess
+from typing import Callable, Iterator, List, Optional
+
+# Версия протокола (сервис отклоняет команды другой версии)
+PROTOCOL_VERSION = 1
+
+# Сокет по умолчанию: свой у каждого пользователя
+DEFAULT_SOCKET = os.path.join(
+    tempfile.gettempdir(), f"video_maker-{os.getuid()}.sock"
+)
+
+
+def socket_path(config: dict) -> str:
+    """Путь к сокету сервиса из конфигурации"""
+    return config.get("daemon_socket") or DEFAULT_SOCKET
+
+
+class DaemonError(RuntimeError):
+    """Сервис недоступен или отклонил команду"""
+
+
+class RenderDaemon:
+    """
+    Долгоживущий процесс рендеринга
+    """
+
+    def __init__(self, path: str, config_name: str = "default"):
+        """
+        Args:
+            path: путь к Unix-сокету
+            config_name: конфигурация, которая прогревается при запуске
+        """
+        self.path = path
+        self.config_name = config_name
+        self.started_at = time.time()
+        self.jobs_done = 0
+        self.jobs_failed = 0
+        self.waiting = 0
+        self.current: Optional[dict] = None
+        # Рендеринг по одной задаче: остальные ждут своей очереди
+        self._render_lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        # Каталоги папок изображений переживают задачи
+        self._catalogs = {}
+        self._server = None
+
+    def warm_up(self):
+        """Импортирует библиотеки, находит FFmpeg и загружает шрифт заранее"""
+        started = time.perf_counter()
+
+        # MoviePy, NumPy, imageio, Pillow
+        from moviepy import ImageClip, TextClip
+        from moviepy.config import FFMPEG_BINARY
+        import numpy as np
+        from config import get_config
+        from video_composer import VideoComposer
+
+        # Запуск FFmpeg: бинарник и его библиотеки попадают в кеш страниц
+        subprocess.run(
+            [FFMPEG_BINARY, "-hide_banner", "-version"],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            check=False,
+        )
+
+        config = get_config(self.config_name)
+        composer = VideoComposer(config)
+        font = composer._subtitle_font(config.get("subtitle_font"))
+        TextClip(font=font, text="Ag", font_size=config.get("subtitle_fontsize", 50))
+        ImageClip(np.zeros((16, 16, 3), dtype=np.uint8), duration=0.1).get_frame(0)
+
+        elapsed = time.perf_counter() - started
+        print(f"🔥 Сервис прогрет за {elapsed:.2f} с")
+        logging.info(f"Сервис рендеринга прогрет за {elapsed:.2f} с")
+
+    def serve_forever(self):
+        """Принимает команды, пока не придет stop, SIGTERM или Ctrl-C"""
+        self._remove_stale_socket()
+        self.warm_up()
+
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                def send(event: dict):
+                    try:
+                        self.wfile.write(
+                            (json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8")
+                        )
+                        self.wfile.flush()
+                    except OSError:
+                        # Клиент ушел - задача все равно доводится до конца
+                        pass
+
+                line = self.rfile.readline()
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    send({"event": "error", "final": True, "message": "Неверный JSON"})
+                    return
+                daemon.handle(request, send)
+
+        class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+            daemon_threads = True
+
+        self._server = Server(self.path, Handler)
+        os.chmod(self.path, 0o600)
+        signal.signal(signal.SIGTERM, lambda *_: self._stop())
+
+        print(f"🛰️ Сервис рендеринга слушает {self.path}")
+        logging.info(f"Сервис рендеринга запущен: {self.path}")
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._server.server_close()
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+            print("👋 Сервис рендеринга остановлен")
+            logging.info("Сервис рендеринга остановлен")
+
+    def _stop(self):
+        # shutdown() ждет конца цикла serve_forever, поэтому из другого потока
+        threading.Thread(target=self._server.shutdown, daemon=True).start()
+
+    def _remove_stale_socket(self):
+        """Удаляет сокет, оставшийся от упавшего сервиса (живой - не трогает)"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                probe.connect(self.path)
+        except OSError:
+            os.unlink(self.path)
+            return
+        raise DaemonError(f"Сервис уже запущен: {self.path}")
+
+    def handle(self, request: dict, send: Callable[[dict], None]):
+        """
+        Выполняет одну команду клиента
+
+        Args:
+            request: команда
+            send: отправка события клиенту
+        """
+        if request.get("version", PROTOCOL_VERSION) != PROTOCOL_VERSION:
+            send(
+                {
+                    "event": "error",
+                    "final": True,
+                    "message": f"Неподдерживаемая версия протокола: {request.get('version')}",
+                }
+            )
+            return
+
+        command = request.get("command")
+        if command == "ping":
+            send({"event": "pong", "final": True, "pid": os.getpid()})
+        elif command == "status":
+            send(dict(self.status(), event="status", final=True))
+        elif command == "stop":
+            send({"event": "stopping", "final": True})
+            self._stop()
+        elif command == "render":
+            self._render(request, send)
+        else:
+            send({"event": "error", "final": True, "message": f"Неизвестная команда: {command}"})
+
+    def status(self) -> dict:
+        """Состояние сервиса"""
+        with self._state_lock:
+            return {
+                "pid": os.getpid(),
+                "uptime": round(time.time() - self.started_at, 1),
+                "jobs_done": self.jobs_done,
+                "jobs_failed": self.jobs_failed,
+                "waiting": self.waiting,
+                "current": self.current,
+            }
+
+    def _render(self, request: dict, send: Callable[[dict], None]):
+        """Рендерит одно видео (задачи выполняются по очереди)"""
+        from config import get_config
+        from video_composer import VideoComposer
+
+        received = time.perf_counter()
+        output_file = request.get("output") or "output/result.mp4"
+        with self._state_lock:
+            self.waiting += 1
+        send({"event": "queued", "waiting": self.waiting})
+
+        with self._render_lock:
+            with self._state_lock:
+                self.waiting -= 1
+                self.current = {"output": output_file, "started_at": time.time()}
+
+            started = time.perf_counter()
+            send({"event": "started", "wait_ms": round((started - received) * 1000, 1)})
+            ok = False
+            error = ""
+            try:
+                config = dict(get_config(request.get("config") or self.config_name))
+                config.update(request.get("overrides") or {})
+                # Подготовленные слайды между задачами - из кеша слайдов
+                config["slide_cache"] = True
+
+                images_folder = os.path.abspath(request["images"])
+                composer = VideoComposer(config)
+                composer.catalog = self._catalogs.get(images_folder)
+                ok = composer.create_video(
+                    images_folder,
+                    request.get("audio"),
+                    request.get("subtitles"),
+                    output_file,
+                )
+                if composer.catalog is not None:
+                    self._catalogs[images_folder] = composer.catalog
+
+            except Exception as e:
+                error = str(e)
+                logging.error(f"Ошибка задачи сервиса: {e}", exc_info=True)
+
+            finally:
+                elapsed = time.perf_counter() - started
+                with self._state_lock:
+                    self.current = None
+                    if ok:
+                        self.jobs_done += 1
+                    else:
+                        self.jobs_failed += 1
+
+        send(
+            {
+                "event": "done" if ok else "failed",
+                "final": True,
+                "ok": ok,
+                "output": output_file,
+                "elapsed": round(elapsed, 3),
+                "message": error,
+            }
+        )
+
+
+class DaemonClient:
+    """
+    Тонкий клиент сервиса рендеринга (без MoviePy)
+    """
+
+    def __init__(self, path: str = DEFAULT_SOCKET, timeout: Optional[float] = None):
+        """
+        Args:
+            path: путь к Unix-сокету сервиса
+            timeout: предельное ожидание ответа в секундах (None - без ограничения)
+        """
+        self.path = path
+        self.timeout = timeout
+
+    def request(self, message: dict) -> Iterator[dict]:
+        """
+        Отправляет команду и выдает события ответа
+
+        Raises:
+            DaemonError: если сервис не запущен
+        """
+        message = dict(message, version=PROTOCOL_VERSION)
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.settimeout(self.timeout)
+        try:
+            try:
+                connection.connect(self.path)
+            except (FileNotFoundError, ConnectionRefusedError) as e:
+                raise DaemonError(f"Сервис рендеринга не запущен ({self.path}): {e}")
+
+            connection.sendall((json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8"))
+            with connection.makefile("r", encoding="utf-8") as responses:
+                for line in responses:
+                    event = json.loads(line)
+                    yield event
+                    if event.get("final"):
+                        return
+            raise DaemonError("Сервис закрыл соединение, не ответив")
+        finally:
+            connection.close()
+
+    def call(self, message: dict) -> dict:
+        """Отправляет команду и возвращает последнее событие"""
+        event = {}
+        for event in self.request(message):
+            pass
+        return event
+
+    def render(
+        self,
+        images_folder: str,
+        audio_file: Optional[str] = None,
+        subtitles_file: Optional[str] = None,
+        output_file: str = "output/result.mp4",
+        config_name: Optional[str] = None,
+        overrides: Optional[dict] = None,
+        on_event: Optional[Callable[[dict], None]] = None,
+    ) -> dict:
+        """
+        Рендерит видео в сервисе и ждет результата
+
+        Пути передаются абсолютными: у сервиса своя рабочая папка.
+
+        Returns:
+            dict: последнее событие (ok, output, elapsed, message)
+        """
+        message = {
+            "command": "render",
+            "images": os.path.abspath(images_folder),
+            "audio": os.path.abspath(audio_file) if audio_file else None,
+            "subtitles": os.path.abspath(subtitles_file) if subtitles_file else None,
+            "output": os.path.abspath(output_file),
+            "config": config_name,
+            "overrides": overrides or {},
+        }
+        event = {}
+        for event in self.request(message):
+            if on_event is not None:
+                on_event(event)
+        return event
+
+
+def _print_event(event: dict):
+    """Выводит событие рендеринга в терминал клиента"""
+    if event["event"] == "queued" and event.get("waiting", 0) > 1:
+        print(f"⏳ В очереди перед задачей: {event['waiting'] - 1}")
+    elif event["event"] == "started":
+        print(f"🚀 Рендеринг начат (ожидание {event['wait_ms']:.0f} мс)")
+    elif event["event"] == "done":
+        print(f"✅ Видео сохранено: {event['output']} ({event['elapsed']:.1f} с)")
+    elif event["event"] in ("failed", "error"):
+        print(f"❌ Ошибка: {event.get('message') or 'см. лог сервиса'}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Точка входа командной строки для сервиса и клиента"""
+    parser = argparse.ArgumentParser(description="Фоновый сервис рендеринга")
+    parser.add_argument("--socket", default=None, help="путь к Unix-сокету")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = subparsers.add_parser("serve", help="запустить сервис")
+    serve_parser.add_argument("--config", default="default", help="имя конфигурации")
+
+    render_parser = subparsers.add_parser("render", help="отрендерить видео в сервисе")
+    render_parser.add_argument(
+        "--images", required=True, help="папка с изображениями или zip/tar-архив"
+    )
+    render_parser.add_argument("--audio", help="аудиофайл")
+    render_parser.add_argument("--subtitles", help="файл субтитров")
+    render_parser.add_argument("--output", default="output/result.mp4")
+    render_parser.add_argument("--config", default=None, help="имя конфигурации")
+
+    subparsers.add_parser("status", help="состояние сервиса")
+    subparsers.add_parser("stop", help="остановить сервис")
+    subparsers.add_parser("ping", help="проверить, что сервис запущен")
+
+    args = parser.parse_args(argv)
+
+    # config.py - только константы, импорт не тянет MoviePy
+    from config import VIDEO_CONFIG
+
+    path = args.socket or socket_path(VIDEO_CONFIG)
+
+    if args.command == "serve":
+        logging.basicConfig(
+            level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+        )
+        RenderDaemon(path, args.config).serve_forever()
+        return 0
+
+    client = DaemonClient(path)
+    try:
+        if args.command == "render":
+            result = client.render(
+                args.images,
+                args.audio,
+                args.subtitles,
+                args.output,
+                config_name=args.config,
+                on_event=_print_event,
+            )
+            return 0 if result.get("ok") else 1
+
+        result = client.call({"command": args.command})
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        return 0
+
+    except DaemonError as e:
+        print(f"❌ {e}")
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
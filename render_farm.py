@@ -0,0 +1,674 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Распределенный рендеринг через общую папку (render farm)
+
+Координатор делит план рендеринга на сегменты и раскладывает их как
+задания в общую папку (локальный диск, NFS, SMB). Любое количество
+рабочих процессов на любых машинах захватывает задания атомарным
+созданием claim-файла, рендерит сегмент через VideoComposer и кладет
+результат обратно. Координатор перезапускает упавшие и зависшие
+задания и склеивает готовые сегменты в итоговое видео.
+
+Структура очереди:
+    queue/items/<item>.json     - задания (план сегмента + служебные поля)
+    queue/claims/<item>.claim   - захваты (mtime обновляется как heartbeat)
+    queue/done/<item>.json      - отметки о завершении
+    queue/failed/<item>.json    - отметки об ошибках
+    queue/jobs/<job>/           - план задачи, сегменты и итоговый статус
+
+Пути сегментов в заданиях и отметках хранятся относительно корня очереди:
+каждая машина может подключить общую папку под своим путем.
+
+Проверка на одной машине:
+    python render_farm.py worker --queue /tmp/farm &
+    python render_farm.py worker --queue /tmp/farm &
+    python render_farm.py render --queue /tmp/farm --images input/images \
+        --audio input/audio/track.mp3 --output output/result.mp4
+
+Автор: [@EvilBabayka]
+Дата: 2025
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import socket
+import logging
+import argparse
+import threading
+from pathlib import Path
+from typing import List, Optional
+
+from render_plan import RenderPlan
+from ffmpeg_tools import concat_segments
+
+# Сколько слайдов рендерится в одном задании по умолчанию
+DEFAULT_SLIDES_PER_SEGMENT = 10
+
+# Через сколько секунд без heartbeat захват считается зависшим
+DEFAULT_STALE_TIMEOUT = 120.0
+
+# Как часто рабочий процесс обновляет heartbeat
+HEARTBEAT_INTERVAL = 10.0
+
+# Сколько раз задание перезапускается после ошибки
+DEFAULT_MAX_ATTEMPTS = 3
+
+# Пауза между опросами очереди
+POLL_INTERVAL = 1.0
+
+
+def _write_json_atomic(path: Path, data: dict):
+    """Записывает JSON через временный файл и атомарное переименование"""
+    temp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(temp_path, "w", encoding="utf-8") as json_file:
+        json.dump(data, json_file, ensure_ascii=False)
+    os.replace(temp_path, path)
+
+
+def _read_json(path: Path) -> Optional[dict]:
+    """Читает JSON или возвращает None, если файла уже нет"""
+    try:
+        with open(path, "r", encoding="utf-8") as json_file:
+            return json.load(json_file)
+    except FileNotFoundError:
+        return None
+
+
+class WorkQueue:
+    """
+    Очередь заданий в общей папке
+    """
+
+    def __init__(self, root: str):
+        """
+        Args:
+            root: корневая папка очереди (общая для всех машин)
+        """
+        # Абсолютный путь: процесс не зависит от папки, из которой его запустили
+        self.root = Path(root).resolve()
+        self.items_dir = self.root / "items"
+        self.claims_dir = self.root / "claims"
+        self.done_dir = self.root / "done"
+        self.failed_dir = self.root / "failed"
+        self.jobs_dir = self.root / "jobs"
+
+        for folder in (
+            self.items_dir,
+            self.claims_dir,
+            self.done_dir,
+            self.failed_dir,
+            self.jobs_dir,
+        ):
+            folder.mkdir(parents=True, exist_ok=True)
+
+    def item_names(self, job_id: Optional[str] = None) -> List[str]:
+        """Возвращает имена заданий (все или одной задачи) в порядке очереди"""
+        names = sorted(path.stem for path in self.items_dir.glob("*.json"))
+        if job_id is not None:
+            names = [name for name in names if name.startswith(f"{job_id}-")]
+        return names
+
+    def path_for(self, relative_path: str) -> Path:
+        """Путь внутри очереди (относительно корня) для этого процесса"""
+        return self.root / relative_path
+
+    def relative_path(self, path) -> str:
+        """Путь внутри очереди относительно ее корня (для записи в задания)"""
+        return Path(path).relative_to(self.root).as_posix()
+
+    def claim_path(self, item: str) -> Path:
+        return self.claims_dir / f"{item}.claim"
+
+    def done_path(self, item: str) -> Path:
+        return self.done_dir / f"{item}.json"
+
+    def failed_path(self, item: str) -> Path:
+        return self.failed_dir / f"{item}.json"
+
+    def is_finished(self, item: str) -> bool:
+        """Задание выполнено или окончательно провалено"""
+        return self.done_path(item).exists() or self.failed_path(item).exists()
+
+    def try_claim(self, item: str, worker_id: str) -> bool:
+        """
+        Пытается атомарно захватить задание
+
+        O_CREAT | O_EXCL гарантирует, что claim-файл создаст только
+        один процесс, даже если несколько машин пытаются одновременно.
+
+        Args:
+            item: имя задания
+            worker_id: идентификатор рабочего процесса
+
+        Returns:
+            bool: True если задание захвачено этим процессом
+        """
+        if self.is_finished(item):
+            return False
+
+        try:
+            fd = os.open(
+                self.claim_path(item), os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644
+            )
+        except FileExistsError:
+            return False
+
+        with os.fdopen(fd, "w", encoding="utf-8") as claim_file:
+            json.dump({"worker": worker_id, "claimed_at": time.time()}, claim_file)
+
+        # Задание могло завершиться между проверкой и захватом
+        if self.is_finished(item):
+            self.release(item, worker_id)
+            return False
+
+        return True
+
+    def owner(self, item: str) -> Optional[str]:
+        """Рабочий процесс, захвативший задание (None - захвата нет)"""
+        try:
+            claim = _read_json(self.claim_path(item))
+        except ValueError:
+            # Захват только что создан, и его содержимое еще не записано
+            return None
+        return claim.get("worker") if claim else None
+
+    def heartbeat(self, item: str, worker_id: str) -> bool:
+        """
+        Обновляет время claim-файла, показывая, что работа идет
+
+        Args:
+            item: имя задания
+            worker_id: идентификатор рабочего процесса
+
+        Returns:
+            bool: False если захват снят или перешел к другому процессу
+        """
+        try:
+            with open(self.claim_path(item), "r", encoding="utf-8") as claim_file:
+                if json.load(claim_file).get("worker") != worker_id:
+                    return False
+                # Время ставится прочитанному файлу: захват, выданный другому
+                # процессу после проверки, не продлевается
+                if os.utime in os.supports_fd:
+                    os.utime(claim_file.fileno())
+                else:
+                    os.utime(self.claim_path(item))
+        except (FileNotFoundError, ValueError):
+            return False
+        return True
+
+    def release(self, item: str, worker_id: Optional[str] = None):
+        """
+        Снимает захват задания
+
+        Args:
+            item: имя задания
+            worker_id: снять только захват этого процесса
+                (None - любой захват, например устаревший)
+        """
+        if worker_id is not None and self.owner(item) != worker_id:
+            return
+        try:
+            self.claim_path(item).unlink()
+        except FileNotFoundError:
+            pass
+
+    def load_item(self, item: str) -> Optional[dict]:
+        return _read_json(self.items_dir / f"{item}.json")
+
+    def save_item(self, item: str, data: dict):
+        _write_json_atomic(self.items_dir / f"{item}.json", data)
+
+    def mark_done(self, item: str, info: dict, worker_id: Optional[str] = None):
+        _write_json_atomic(self.done_path(item), info)
+        self.release(item, worker_id)
+
+    def mark_failed(self, item: str, info: dict, worker_id: Optional[str] = None):
+        _write_json_atomic(self.failed_path(item), info)
+        self.release(item, worker_id)
+
+
+class RenderWorker:
+    """
+    Рабочий процесс: захватывает задания и рендерит сегменты
+    """
+
+    def __init__(self, queue: WorkQueue, config: dict, worker_id: Optional[str] = None):
+        """
+        Args:
+            queue: очередь заданий
+            config: настройки VideoComposer (разрешение и fps берутся из плана)
+            worker_id: идентификатор процесса (по умолчанию host:pid)
+        """
+        self.queue = queue
+        self.config = config
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+
+    def run(self, exit_when_idle: bool = False) -> int:
+        """
+        Обрабатывает задания, пока они есть
+
+        Args:
+            exit_when_idle: завершиться, когда очередь опустеет
+
+        Returns:
+            int: количество выполненных заданий
+        """
+        completed = 0
+        logging.info(f"Рабочий процесс {self.worker_id} запущен")
+
+        while True:
+            item = self._claim_next()
+            if item is None:
+                if exit_when_idle:
+                    break
+                time.sleep(POLL_INTERVAL)
+                continue
+
+            if self.process(item):
+                completed += 1
+
+        logging.info(f"Рабочий процесс {self.worker_id}: выполнено {completed}")
+        return completed
+
+    def _claim_next(self) -> Optional[str]:
+        """Захватывает первое свободное задание"""
+        for item in self.queue.item_names():
+            if self.queue.try_claim(item, self.worker_id):
+                return item
+        return None
+
+    def process(self, item: str) -> bool:
+        """
+        Рендерит одно захваченное задание
+
+        Args:
+            item: имя задания
+
+        Returns:
+            bool: True если сегмент успешно отрендерен
+        """
+        # Импортируем здесь, чтобы координатор не тянул MoviePy без нужды
+        from video_composer import VideoComposer
+
+        data = self.queue.load_item(item)
+        if data is None:
+            self.queue.release(item, self.worker_id)
+            return False
+
+        plan = RenderPlan.from_dict(data["plan"])
+        # Путь сегмента записан относительно корня очереди
+        output_file = str(self.queue.path_for(plan.output_file))
+        # У каждого процесса свой недописанный файл: задание с устаревшим
+        # захватом может рендерить и старый, и новый исполнитель
+        worker_tag = re.sub(r"[^\w.-]", "_", self.worker_id)
+        partial_file = f"{output_file}.{worker_tag}.part.mp4"
+
+        print(f"🛠️ [{self.worker_id}] Рендеринг {item}...")
+
+        stop_heartbeat = threading.Event()
+        heartbeat = threading.Thread(
+            target=self._heartbeat_loop, args=(item, stop_heartbeat), daemon=True
+        )
+        heartbeat.start()
+
+        try:
+            os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+            composer = VideoComposer(self.config)
+            if not composer.render_plan(plan.with_changes(output_file=partial_file)):
+                raise RuntimeError("Рендеринг сегмента не удался")
+
+            if self.queue.owner(item) != self.worker_id:
+                # Захват сняли как устаревший: задание уже у другого процесса
+                # (или вернется в очередь), этот результат не публикуем
+                logging.warning(f"Захват {item} потерян, сегмент отброшен")
+                os.remove(partial_file)
+                return False
+
+            # Результат появляется атомарно: либо целиком, либо никак
+            os.replace(partial_file, output_file)
+            self.queue.mark_done(
+                item,
+                {
+                    "worker": self.worker_id,
+                    "finished_at": time.time(),
+                    "output_file": plan.output_file,
+                },
+                self.worker_id,
+            )
+            return True
+
+        except Exception as e:
+            logging.error(f"Ошибка рендеринга {item}: {e}", exc_info=True)
+            try:
+                os.remove(partial_file)
+            except FileNotFoundError:
+                pass
+            if self.queue.owner(item) != self.worker_id:
+                logging.warning(f"Захват {item} потерян, ошибка не записана")
+                return False
+            self.queue.mark_failed(
+                item,
+                {
+                    "worker": self.worker_id,
+                    "failed_at": time.time(),
+                    "error": str(e),
+                },
+                self.worker_id,
+            )
+            return False
+
+        finally:
+            stop_heartbeat.set()
+            heartbeat.join()
+
+    def _heartbeat_loop(self, item: str, stop: threading.Event):
+        while not stop.wait(HEARTBEAT_INTERVAL):
+            if not self.queue.heartbeat(item, self.worker_id):
+                # Чужой захват не продлеваем, иначе он никогда не устареет
+                logging.warning(f"Захват {item} снят или передан другому процессу")
+                return
+
+
+class RenderCoordinator:
+    """
+    Координатор: делит задачу на задания, следит за ними и склеивает результат
+    """
+
+    def __init__(
+        self,
+        queue: WorkQueue,
+        stale_timeout: float = DEFAULT_STALE_TIMEOUT,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    ):
+        """
+        Args:
+            queue: очередь заданий
+            stale_timeout: время без heartbeat, после которого захват снимается
+            max_attempts: сколько раз пробовать одно задание
+        """
+        self.queue = queue
+        self.stale_timeout = stale_timeout
+        self.max_attempts = max_attempts
+
+    def submit(
+        self, plan: RenderPlan, slides_per_segment: int = DEFAULT_SLIDES_PER_SEGMENT
+    ) -> str:
+        """
+        Раскладывает план по заданиям
+
+        Args:
+            plan: полный план рендеринга
+            slides_per_segment: сколько слайдов в одном задании
+
+        Returns:
+            str: идентификатор задачи
+        """
+        job_id = plan.fingerprint()[:16]
+        job_dir = self.queue.jobs_dir / job_id
+        segments_dir = job_dir / "segments"
+        segments_dir.mkdir(parents=True, exist_ok=True)
+        plan.save(str(job_dir / "plan.json"))
+
+        ranges = plan.split(slides_per_segment)
+        for number, (first, last) in enumerate(ranges):
+            item = f"{job_id}-{number:05d}"
+            if (self.queue.items_dir / f"{item}.json").exists():
+                # Задача уже была поставлена ранее - не дублируем задания
+                continue
+
+            segment_file = segments_dir / f"seg_{number:05d}.mp4"
+            segment_plan = plan.segment(
+                first, last, self.queue.relative_path(segment_file)
+            )
+            self.queue.save_item(
+                item,
+                {
+                    "job_id": job_id,
+                    "number": number,
+                    "attempts": 0,
+                    "plan": segment_plan.to_dict(),
+                },
+            )
+
+        print(f"📤 Задача {job_id}: {len(ranges)} заданий в очереди {self.queue.root}")
+        logging.info(f"Задача {job_id} поставлена в очередь ({len(ranges)} заданий)")
+        return job_id
+
+    def poll(self, job_id: str) -> dict:
+        """
+        Проверяет состояние задачи, снимает зависшие захваты и перезапускает ошибки
+
+        Args:
+            job_id: идентификатор задачи
+
+        Returns:
+            dict: счетчики total, done, running, pending, failed
+        """
+        status = {"total": 0, "done": 0, "running": 0, "pending": 0, "failed": 0}
+        now = time.time()
+
+        for item in self.queue.item_names(job_id):
+            status["total"] += 1
+
+            if self.queue.done_path(item).exists():
+                status["done"] += 1
+                continue
+
+            if self.queue.failed_path(item).exists():
+                if self._retry(item, "ошибка рендеринга"):
+                    status["pending"] += 1
+                else:
+                    status["failed"] += 1
+                continue
+
+            claim = self.queue.claim_path(item)
+            try:
+                age = now - claim.stat().st_mtime
+            except FileNotFoundError:
+                status["pending"] += 1
+                continue
+
+            if age > self.stale_timeout:
+                if not self._attempts_left(item):
+                    # Задание раз за разом роняет рабочие процессы - больше не пробуем
+                    logging.error(
+                        f"Захват {item} устарел ({age:.0f} с), попытки исчерпаны"
+                    )
+                    self.queue.mark_failed(
+                        item,
+                        {
+                            "failed_at": now,
+                            "error": f"захват устарел ({age:.0f} с), попытки исчерпаны",
+                        },
+                    )
+                    status["failed"] += 1
+                    continue
+
+                # Рабочий процесс пропал: снимаем захват, задание вернется в очередь
+                logging.warning(f"Захват {item} устарел ({age:.0f} с), задание возвращено")
+                self.queue.release(item)
+                self._count_attempt(item)
+                status["pending"] += 1
+            else:
+                status["running"] += 1
+
+        return status
+
+    def _count_attempt(self, item: str) -> int:
+        data = self.queue.load_item(item)
+        data["attempts"] = data.get("attempts", 0) + 1
+        self.queue.save_item(item, data)
+        return data["attempts"]
+
+    def _attempts_left(self, item: str) -> bool:
+        """Можно ли запустить задание еще раз"""
+        data = self.queue.load_item(item)
+        return data.get("attempts", 0) + 1 < self.max_attempts
+
+    def _retry(self, item: str, reason: str) -> bool:
+        """Возвращает проваленное задание в очередь, если попытки не исчерпаны"""
+        if not self._attempts_left(item):
+            return False
+
+        attempts = self._count_attempt(item)
+        logging.warning(f"Повтор задания {item} ({reason}), попытка {attempts + 1}")
+        try:
+            self.queue.failed_path(item).unlink()
+        except FileNotFoundError:
+            pass
+        return True
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> dict:
+        """
+        Ждет, пока все задания задачи будут выполнены или провалены
+
+        Args:
+            job_id: идентификатор задачи
+            timeout: максимальное время ожидания в секундах
+
+        Returns:
+            dict: итоговые счетчики (см. poll)
+        """
+        started = time.time()
+        last_report = None
+
+        while True:
+            status = self.poll(job_id)
+            report = (status["done"], status["running"], status["failed"])
+            if report != last_report:
+                print(
+                    f"   Готово {status['done']}/{status['total']}, "
+                    f"в работе {status['running']}, ошибок {status['failed']}"
+                )
+                last_report = report
+
+            if status["done"] + status["failed"] >= status["total"]:
+                return status
+
+            if timeout is not None and time.time() - started > timeout:
+                raise TimeoutError(f"Задача {job_id} не завершилась за {timeout} с")
+
+            time.sleep(POLL_INTERVAL)
+
+    def stitch(self, job_id: str, output_file: Optional[str] = None) -> str:
+        """
+        Склеивает готовые сегменты и добавляет аудио
+
+        Args:
+            job_id: идентификатор задачи
+            output_file: итоговый файл (по умолчанию из плана)
+
+        Returns:
+            str: путь к итоговому видео
+        """
+        job_dir = self.queue.jobs_dir / job_id
+        plan = RenderPlan.load(str(job_dir / "plan.json"))
+        output_file = output_file or plan.output_file
+
+        segment_files = []
+        for item in self.queue.item_names(job_id):
+            done = _read_json(self.queue.done_path(item))
+            if done is None:
+                raise RuntimeError(f"Задание {item} не выполнено, склейка невозможна")
+            segment_files.append(str(self.queue.path_for(done["output_file"])))
+
+        audio = plan.audio_source
+        concat_segments(
+            segment_files,
+            output_file,
+            str(job_dir / "concat.txt"),
+            audio_file=audio.param("path") if audio else None,
+            duration=plan.final_duration,
+            audio_codec=plan.encoder.audio_codec,
+            audio_bitrate=plan.encoder.audio_bitrate,
+        )
+
+        _write_json_atomic(
+            job_dir / "status.json",
+            {"state": "done", "output_file": output_file, "finished_at": time.time()},
+        )
+        print(f"✅ Видео собрано из {len(segment_files)} сегментов: {output_file}")
+        return output_file
+
+    def render(
+        self,
+        plan: RenderPlan,
+        slides_per_segment: int = DEFAULT_SLIDES_PER_SEGMENT,
+        timeout: Optional[float] = None,
+    ) -> bool:
+        """
+        Полный цикл: поставить задачу, дождаться заданий и склеить видео
+
+        Returns:
+            bool: True если видео собрано
+        """
+        job_id = self.submit(plan, slides_per_segment)
+        status = self.wait(job_id, timeout)
+        if status["failed"]:
+            print(f"❌ Задача {job_id}: {status['failed']} заданий провалено")
+            logging.error(f"Задача {job_id} не выполнена: {status}")
+            return False
+
+        self.stitch(job_id)
+        return True
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Точка входа командной строки для координатора и рабочих процессов"""
+    from config import get_config
+
+    parser = argparse.ArgumentParser(description="Распределенный рендеринг видео")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    worker_parser = subparsers.add_parser("worker", help="запустить рабочий процесс")
+    worker_parser.add_argument("--queue", required=True, help="общая папка очереди")
+    worker_parser.add_argument("--config", default="default", help="имя конфигурации")
+    worker_parser.add_argument(
+        "--exit-when-idle", action="store_true", help="завершиться при пустой очереди"
+    )
+
+    render_parser = subparsers.add_parser("render", help="поставить задачу и собрать видео")
+    render_parser.add_argument("--queue", required=True, help="общая папка очереди")
+    render_parser.add_argument("--config", default="default", help="имя конфигурации")
+    render_parser.add_argument(
+        "--images", required=True, help="папка с изображениями или zip/tar-архив"
+    )
+    render_parser.add_argument("--audio", help="аудиофайл")
+    render_parser.add_argument("--subtitles", help="файл субтитров")
+    render_parser.add_argument("--output", default="output/result.mp4")
+    render_parser.add_argument(
+        "--segment-slides", type=int, default=DEFAULT_SLIDES_PER_SEGMENT
+    )
+    render_parser.add_argument("--stale-timeout", type=float, default=DEFAULT_STALE_TIMEOUT)
+    render_parser.add_argument("--timeout", type=float, default=None)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    config = get_config(args.config)
+    queue = WorkQueue(args.queue)
+
+    if args.command == "worker":
+        RenderWorker(queue, config).run(exit_when_idle=args.exit_when_idle)
+        return 0
+
+    from video_composer import VideoComposer
+
+    plan = VideoComposer(config).build_plan(
+        args.images, args.audio, args.subtitles, args.output
+    )
+    if not plan.slides:
+        print("❌ Нет изображений для рендеринга")
+        return 1
+
+    coordinator = RenderCoordinator(queue, stale_timeout=args.stale_timeout)
+    return 0 if coordinator.render(plan, args.segment_slides, args.timeout) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,601 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+План рендеринга видео
+
+План - это неизменяемое и компактное описание будущего видео:
+слайды с длительностями и ключевыми кадрами зума, субтитры,
+наложения (логотип, водяной знак), операции над аудио и профиль кодирования. Все решения (включая
+случайное направление зума) принимаются при компиляции плана,
+а сам рендеринг только исполняет его.
+
+План сериализуется в JSON, поэтому его можно просмотреть, сохранить
+в кэш, сравнить с другим планом или передать в другой процесс
+без повторного сканирования входных файлов.
+
+Автор: [@EvilBabayka]
+Дата: 2025
+"""
+
+import json
+import hashlib
+from typing import Any, Dict, List, Optional, Tuple
+
+# Версия формата плана (увеличивается при несовместимых изменениях)
+PLAN_VERSION = 4
+
+# Виды слайдов
+SLIDE_IMAGE = "image"
+SLIDE_VIDEO = "video"
+
+
+class _Frozen:
+    """Базовый класс для неизменяемых объектов плана со __slots__"""
+
+    __slots__ = ()
+
+    def __init__(self, **values):
+        for name in self.__slots__:
+            object.__setattr__(self, name, values[name])
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} неизменяем")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} неизменяем")
+
+    def __eq__(self, other):
+        if type(self) is not type(other):
+            return NotImplemented
+        return all(
+            getattr(self, name) == getattr(other, name) for name in self.__slots__
+        )
+
+    def __hash__(self):
+        return hash(tuple(getattr(self, name) for name in self.__slots__))
+
+    def __repr__(self):
+        fields = ", ".join(
+            f"{name}={getattr(self, name)!r}" for name in self.__slots__
+        )
+        return f"{type(self).__name__}({fields})"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Преобразует объект в словарь для JSON"""
+        return {name: _to_json_value(getattr(self, name)) for name in self.__slots__}
+
+
+def _to_json_value(value):
+    """Рекурсивно приводит значения плана к типам JSON"""
+    if isinstance(value, _Frozen):
+        return value.to_dict()
+    if isinstance(value, (tuple, list)):
+        return [_to_json_value(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _to_json_value(item) for key, item in value.items()}
+    return value
+
+
+def _freeze(value):
+    """Рекурсивно превращает списки JSON в кортежи"""
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    return value
+
+
+class SlidePlan(_Frozen):
+    """
+    Один слайд на таймлайне
+
+    kind - 'image' (изображение) или 'video' (видеоклип). Видеоклип с
+    stream_copy=True уже совпадает с выходом по кодеку, разрешению и
+    частоте кадров и попадает в итоговое видео без перекодирования.
+    """
+
+    __slots__ = (
+        "source",
+        "kind",
+        "start",
+        "duration",
+        "zoom_start",
+        "zoom_end",
+        "stream_copy",
+    )
+
+    @property
+    def is_video(self) -> bool:
+        return self.kind == SLIDE_VIDEO
+
+    @property
+    def end(self) -> float:
+        return self.start + self.duration
+
+    @property
+    def has_zoom(self) -> bool:
+        return self.zoom_start != 1.0 or self.zoom_end != 1.0
+
+    def scale_at(self, t: float) -> float:
+        """
+        Возвращает масштаб зума в момент t (относительно начала слайда)
+
+        Args:
+            t: время от начала слайда в секундах
+
+        Returns:
+            float: коэффициент увеличения (1.0 = без зума)
+        """
+        if self.duration <= 0:
+            return self.zoom_start
+        progress = min(max(t / self.duration, 0.0), 1.0)
+        return self.zoom_start + (self.zoom_end - self.zoom_start) * progress
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "SlidePlan":
+        return cls(**data)
+
+
+class SubtitleCue(_Frozen):
+    """Одна реплика субтитров (время в секундах)"""
+
+    __slots__ = ("start", "end", "text")
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "SubtitleCue":
+        return cls(**data)
+
+
+class AudioOp(_Frozen):
+    """
+    Операция над аудиодорожкой
+
+    Поддерживаемые операции:
+        source    - params: path, duration
+                    (и loudness, peak - если громкость измерялась)
+        cut_video - params: duration (обрезать видео до длины аудио)
+        extend_video - params: duration (держать последний кадр до конца аудио)
+    """
+
+    __slots__ = ("op", "params")
+
+    def param(self, name: str, default=None):
+        """Возвращает параметр операции по имени"""
+        return dict(self.params).get(name, default)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"op": self.op, "params": _to_json_value(dict(self.params))}
+
+    @classmethod
+    def create(cls, op: str, **params) -> "AudioOp":
+        return cls(op=op, params=_freeze(params))
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "AudioOp":
+        return cls.create(data["op"], **data["params"])
+
+
+class OverlaySpec(_Frozen):
+    """
+    Наложение поверх видео (водяной знак, логотип, плашка)
+
+    position - именованное положение ('top-right', 'bottom' и т.д.,
+    см. overlays.POSITIONS) или (x, y) в пикселях; scale - ширина
+    в долях ширины кадра (None - исходный размер). Время показа
+    отсчитывается от начала видео, end=None - до конца.
+    """
+
+    __slots__ = ("source", "position", "scale", "opacity", "margin", "start", "end")
+
+    def shown_at(self, t: float) -> bool:
+        """Видно ли наложение в момент t"""
+        return self.start <= t and (self.end is None or t < self.end)
+
+    def visible(self, start: float, end: float) -> bool:
+        """Видно ли наложение хотя бы часть интервала [start, end)"""
+        return self.start < end and (self.end is None or self.end > start)
+
+    def covers(self, start: float, end: float) -> bool:
+        """Видно ли наложение весь интервал [start, end)"""
+        return self.start <= start and (self.end is None or self.end >= end)
+
+    @classmethod
+    def from_config(cls, item: dict) -> "OverlaySpec":
+        return cls(
+            source=str(item["source"]),
+            position=_freeze(item.get("position", "bottom-right")),
+            scale=item.get("scale"),
+            opacity=float(item.get("opacity", 1.0)),
+            margin=int(item.get("margin", 20)),
+            start=float(item.get("start") or 0.0),
+            end=None if item.get("end") is None else float(item["end"]),
+        )
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "OverlaySpec":
+        data = dict(data)
+        data["position"] = _freeze(data["position"])
+        return cls(**data)
+
+
+def parse_bitrate(value) -> int:
+    """
+    Переводит битрейт в формате FFmpeg ('2000k', '4M', 128000) в бит/с
+
+    Args:
+        value: битрейт строкой или числом
+
+    Returns:
+        int: битрейт в битах в секунду
+    """
+    if isinstance(value, (int, float)):
+        return int(value)
+
+    text = str(value).strip().lower()
+    multipliers = {"k": 1000, "m": 1000 * 1000}
+    if text and text[-1] in multipliers:
+        return int(float(text[:-1]) * multipliers[text[-1]])
+    return int(float(text))
+
+
+class EncoderProfile(_Frozen):
+    """Параметры кодирования итогового файла"""
+
+    __slots__ = ("codec", "audio_codec", "bitrate", "audio_bitrate", "crf")
+
+    def estimated_bytes(self, duration: float, with_audio: bool = True) -> int:
+        """
+        Примерный размер закодированного фрагмента
+
+        Args:
+            duration: длительность в секундах
+            with_audio: учитывать ли аудиодорожку
+
+        Returns:
+            int: размер в байтах
+        """
+        bits_per_second = parse_bitrate(self.bitrate)
+        if with_audio:
+            bits_per_second += parse_bitrate(self.audio_bitrate)
+        return int(bits_per_second * duration / 8)
+
+    @classmethod
+    def from_config(cls, config: dict) -> "EncoderProfile":
+        return cls(
+            codec=config.get("video_codec", "libx264"),
+            audio_codec=config.get("audio_codec", "aac"),
+            bitrate=config.get("video_bitrate", "2000k"),
+            audio_bitrate=config.get("audio_bitrate", "128k"),
+            crf=config.get("video_crf", 23),
+        )
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "EncoderProfile":
+        return cls(**data)
+
+
+class SubtitleStyle(_Frozen):
+    """Оформление субтитров"""
+
+    __slots__ = ("fontsize", "color", "font", "position")
+
+    @classmethod
+    def from_config(cls, config: dict) -> "SubtitleStyle":
+        return cls(
+            fontsize=config.get("subtitle_fontsize", 50),
+            color=config.get("subtitle_color", "white"),
+            font=config.get("subtitle_font", "Arial"),
+            position=_freeze(list(config.get("subtitle_position", ("center", "bottom")))),
+        )
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "SubtitleStyle":
+        data = dict(data)
+        data["position"] = _freeze(data["position"])
+        return cls(**data)
+
+
+class RenderPlan(_Frozen):
+    """Полный скомпилированный план рендеринга одного видео"""
+
+    __slots__ = (
+        "version",
+        "resolution",
+        "fps",
+        "slides",
+        "cues",
+        "subtitle_style",
+        "overlays",
+        "audio",
+        "encoder",
+        "output_file",
+    )
+
+    @property
+    def duration(self) -> float:
+        """Длительность видеоряда (до применения операций аудио)"""
+        return self.slides[-1].end if self.slides else 0.0
+
+    @property
+    def final_duration(self) -> float:
+        """Длительность итогового видео с учетом подгонки под аудио"""
+        for op in self.audio:
+            if op.op == "cut_video":
+                return min(self.duration, op.param("duration"))
+            if op.op == "extend_video":
+                return max(self.duration, op.param("duration"))
+        return self.duration
+
+    @property
+    def audio_source(self) -> Optional[AudioOp]:
+        """Операция-источник аудио (или None, если аудио нет)"""
+        for op in self.audio:
+            if op.op == "source":
+                return op
+        return None
+
+    def with_changes(self, **changes) -> "RenderPlan":
+        """Возвращает копию плана с замененными полями"""
+        values = {name: getattr(self, name) for name in self.__slots__}
+        values.update(changes)
+        return RenderPlan(**values)
+
+    def split(self, slides_per_segment: int) -> List[Tuple[int, int]]:
+        """
+        Делит слайды плана на диапазоны для посегментного рендеринга
+
+        Args:
+            slides_per_segment: сколько слайдов в одном сегменте
+
+        Returns:
+            list: пары (first, last) - полуинтервалы номеров слайдов
+        """
+        step = max(1, int(slides_per_segment))
+        ranges = []
+        first = 0
+        for number, slide in enumerate(self.slides):
+            # Клип, копируемый без перекодирования, - всегда отдельный сегмент
+            if slide.stream_copy:
+                if first < number:
+                    ranges.append((first, number))
+                ranges.append((number, number + 1))
+                first = number + 1
+            elif number + 1 - first >= step:
+                ranges.append((first, number + 1))
+                first = number + 1
+        if first < len(self.slides):
+            ranges.append((first, len(self.slides)))
+        return ranges
+
+    def segment(self, first: int, last: int, output_file: str) -> "RenderPlan":
+        """
+        Вырезает слайды [first, last) в самостоятельный план без аудио
+
+        Если видео обрезается под аудио внутри сегмента, план сегмента
+        сохраняет эту обрезку; последний сегмент сохраняет удержание
+        последнего кадра до конца аудио.
+
+        Время слайдов, субтитров и наложений отсчитывается от начала сегмента.
+        Реплика, попадающая на границу сегментов, делится на две.
+
+        Args:
+            first: номер первого слайда
+            last: номер слайда после последнего
+            output_file: куда рендерить сегмент
+
+        Returns:
+            RenderPlan: план сегмента
+        """
+        slides = self.slides[first:last]
+        if not slides:
+            raise ValueError(f"Пустой сегмент: слайды {first}-{last}")
+
+        offset = slides[0].start
+        end = slides[-1].end
+
+        shifted_slides = tuple(
+            SlidePlan(
+                source=slide.source,
+                kind=slide.kind,
+                start=round(slide.start - offset, 6),
+                duration=slide.duration,
+                zoom_start=slide.zoom_start,
+                zoom_end=slide.zoom_end,
+                stream_copy=slide.stream_copy,
+            )
+            for slide in slides
+        )
+        shifted_cues = tuple(
+            SubtitleCue(
+                start=round(max(cue.start, offset) - offset, 6),
+                end=round(min(cue.end, end) - offset, 6),
+                text=cue.text,
+            )
+            for cue in self.cues
+            if cue.end > offset and cue.start < end
+        )
+        shifted_overlays = tuple(
+            OverlaySpec(
+                **dict(
+                    overlay.to_dict(),
+                    position=overlay.position,
+                    start=round(max(overlay.start, offset) - offset, 6),
+                    end=None
+                    if overlay.end is None
+                    else round(min(overlay.end, end) - offset, 6),
+                )
+            )
+            for overlay in self.overlays
+            if overlay.visible(offset, end)
+        )
+
+        # Аудио добавляется при склейке, но обрезка видео под аудио остается:
+        # иначе сегмент рендерится дальше конца видео, а склейка без
+        # перекодирования режет его только по ключевым кадрам
+        audio = ()
+        if offset < self.final_duration < end:
+            cut = round(self.final_duration - offset, 6)
+            audio = (AudioOp.create("cut_video", duration=cut),)
+        elif last >= len(self.slides) and self.final_duration > end:
+            extended = round(self.final_duration - offset, 6)
+            audio = (AudioOp.create("extend_video", duration=extended),)
+
+        return self.with_changes(
+            slides=shifted_slides,
+            cues=shifted_cues,
+            overlays=shifted_overlays,
+            audio=audio,
+            output_file=output_file,
+        )
+
+    def frame_spans(self) -> List[Tuple[int, int]]:
+        """
+        Делит кадры итогового видео на серии одинаковых кадров
+
+        Кадр слайда без зума меняется только на границах слайдов, реплик
+        и наложений; у слайдов с зумом и видеоклипов меняется каждый кадр.
+        Границу, которая из-за округления может попасть на соседний кадр,
+        отмечаем на обоих кадрах: лишняя серия из одного кадра безопасна,
+        пропущенная - нет.
+
+        Returns:
+            list: пары (номер первого кадра, число кадров) в порядке показа
+        """
+        # Столько же кадров выдает MoviePy в iter_frames
+        total = int(self.final_duration * self.fps)
+        changes = {0}
+
+        def mark(t: float):
+            frame = int(t * self.fps)
+            changes.update((frame, frame + 1))
+
+        for slide in self.slides:
+            mark(slide.start)
+            if slide.is_video or slide.has_zoom:
+                changes.update(
+                    range(int(slide.start * self.fps), int(slide.end * self.fps) + 1)
+                )
+        for cue in self.cues:
+            mark(cue.start)
+            mark(cue.end)
+        for overlay in self.overlays:
+            mark(overlay.start)
+            if overlay.end is not None:
+                mark(overlay.end)
+
+        points = sorted(frame for frame in changes if 0 <= frame < total)
+        return [
+            (frame, following - frame)
+            for frame, following in zip(points, points[1:] + [total])
+        ]
+
+    def to_json(self, indent: Optional[int] = None) -> str:
+        """Сериализует план в JSON"""
+        return json.dumps(self.to_dict(), ensure_ascii=False, indent=indent)
+
+    def fingerprint(self) -> str:
+        """Стабильный хэш плана (одинаковые планы дают одинаковый хэш)"""
+        canonical = json.dumps(self.to_dict(), ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def save(self, path: str):
+        """Сохраняет план в JSON-файл"""
+        with open(path, "w", encoding="utf-8") as plan_file:
+            plan_file.write(self.to_json(indent=2))
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "RenderPlan":
+        if data.get("version") != PLAN_VERSION:
+            raise ValueError(f"Неподдерживаемая версия плана: {data.get('version')}")
+
+        return cls(
+            version=data["version"],
+            resolution=tuple(data["resolution"]),
+            fps=data["fps"],
+            slides=tuple(SlidePlan.from_dict(item) for item in data["slides"]),
+            cues=tuple(SubtitleCue.from_dict(item) for item in data["cues"]),
+            subtitle_style=SubtitleStyle.from_dict(data["subtitle_style"]),
+            overlays=tuple(OverlaySpec.from_dict(item) for item in data["overlays"]),
+            audio=tuple(AudioOp.from_dict(item) for item in data["audio"]),
+            encoder=EncoderProfile.from_dict(data["encoder"]),
+            output_file=data["output_file"],
+        )
+
+    @classmethod
+    def from_json(cls, text: str) -> "RenderPlan":
+        """Восстанавливает план из JSON"""
+        return cls.from_dict(json.loads(text))
+
+    @classmethod
+    def load(cls, path: str) -> "RenderPlan":
+        """Загружает план из JSON-файла"""
+        with open(path, "r", encoding="utf-8") as plan_file:
+            return cls.from_json(plan_file.read())
+
+
+def build_slides(
+    sources, image_duration: float, zoom_directions: Tuple[Optional[bool], ...],
+    zoom_factor: float, videos: Optional[Dict[str, dict]] = None,
+) -> Tuple[SlidePlan, ...]:
+    """
+    Раскладывает слайды по таймлайну
+
+    Args:
+        sources: пути к изображениям и видеоклипам в порядке показа
+        image_duration: длительность показа одного слайда
+        zoom_directions: для каждого слайда True (зум внутрь),
+            False (зум наружу) или None (без зума)
+        zoom_factor: максимальный масштаб зума
+        videos: путь видеоклипа -> {"duration", "stream_copy"}
+            (видеоклипы показываются целиком и без зума)
+
+    Returns:
+        tuple: слайды плана
+    """
+    videos = videos or {}
+    slides = []
+    start = 0.0
+    for source, zoom_in in zip(sources, zoom_directions):
+        video = videos.get(str(source))
+        if video is not None:
+            slides.append(
+                SlidePlan(
+                    source=str(source),
+                    kind=SLIDE_VIDEO,
+                    start=round(start, 6),
+                    duration=video["duration"],
+                    zoom_start=1.0,
+                    zoom_end=1.0,
+                    stream_copy=bool(video.get("stream_copy")),
+                )
+            )
+            start += video["duration"]
+            continue
+
+        if zoom_in is None:
+            zoom_start, zoom_end = 1.0, 1.0
+        elif zoom_in:
+            # Зум внутрь (от большего к меньшему)
+            zoom_start, zoom_end = zoom_factor, 1.0
+        else:
+            # Зум наружу (от меньшего к большему)
+            zoom_start, zoom_end = 1.0, zoom_factor
+
+        slides.append(
+            SlidePlan(
+                source=str(source),
+                kind=SLIDE_IMAGE,
+                start=round(start, 6),
+                duration=image_duration,
+                zoom_start=zoom_start,
+                zoom_end=zoom_end,
+                stream_copy=False,
+            )
+        )
+        start += image_duration
+
+    return tuple(slides)
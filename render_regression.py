@@ -0,0 +1,931 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Покадровая проверка способов рендеринга по эталонному выводу
+
+Небольшие синтетические таймлайны (изображения разных пропорций, зум,
+субтитры, наложения, видеоклип) рендерятся каждым доступным способом.
+Кадры в фиксированные моменты (начало, середина и конец каждого слайда,
+середина каждой реплики, границы показа наложений) сравниваются
+с эталоном - конвейером MoviePy в VideoComposer - по PSNR и SSIM.
+Для каждого способа записывается скорость рендеринга всего таймлайна,
+поэтому ускорение принимается, только если картинка не изменилась.
+У готовых файлов проверяется и длительность: все способы должны
+подогнать видео под аудио одинаково (см. RenderPlan.final_duration).
+
+Способы рендеринга (BACKENDS):
+    moviepy      - эталон: граф клипов MoviePy (_compose_clip), без кодирования
+    slide_cache  - то же со слайдами из кеша подготовленных слайдов
+    slide_store  - то же со слайдами из общего хранилища (SlideStore)
+    direct       - прямой рендеринг кадров по плану (FrameRenderer)
+    encoded      - готовый файл render_plan (кадры после кодирования)
+    vfr          - файл с переменной частотой кадров (FrameSpanWriter)
+    progressive  - фрагментированный MP4 (прогрессивная запись)
+    resumable    - посегментный рендеринг с контрольными точками и склейкой
+
+Для способов с кодированием пороги ниже (потери кодека), а в скорость
+входит и кодирование.
+
+Эталонные кадры можно сохранить (--golden папка). При следующих запусках
+эталон MoviePy сравнивается и с ними: так видно изменение самого
+конвейера MoviePy, например после обновления библиотек.
+
+Использование:
+    python render_regression.py [--cases zoom,subtitles] [--backends direct,vfr]
+                                [--golden golden/] [--json отчет.json]
+
+Автор: [@EvilBabayka]
+Дата: 2025
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from ffmpeg_tools import decode_frames, probe_media, run_ffmpeg
+from frame_renderer import FrameRenderer
+from render_plan import RenderPlan
+from video_composer import VideoComposer
+
+# Версия формата отчета
+REPORT_VERSION = 1
+
+# Пороги для кадров без кодирования: допустимы только расхождения
+# округления и пересжатия слайда
+PSNR_MIN = 40.0
+SSIM_MIN = 0.98
+
+# Пороги для кадров после кодирования H.264: на резких цветных границах
+# (4:2:0) PSNR падает до 26 дБ, а кадр соседнего момента дает SSIM около 0.93
+ENCODED_PSNR_MIN = 25.0
+ENCODED_SSIM_MIN = 0.97
+
+# PSNR совпадающих кадров (бесконечность не записывается в JSON)
+PSNR_IDENTICAL = 100.0
+
+# Допустимое расхождение длительности готового файла с планом в секундах:
+# контейнер округляет конец до кадра аудио, фрагментированный MP4 - до кадра видео
+DURATION_TOLERANCE = 0.25
+
+# Имя готового файла в папке способа рендеринга
+RESULT_NAME = "result.mp4"
+
+# Настройки синтетических таймлайнов: маленький кадр и короткие слайды,
+# чтобы все способы проходили за секунды
+HARNESS_CONFIG = {
+    "resolution": (320, 180),
+    "fps": 12,
+    "image_duration": 1.0,
+    "random_zoom_direction": True,
+    "random_seed": 3,
+    "subtitle_fontsize": 16,
+    "resumable_render": False,
+    "progressive_output": None,
+    "vfr_output": False,
+    "slide_cache": False,
+    "use_slide_store": False,
+    "previews_enabled": False,
+    "audio_loudness_analysis": False,
+    "overlays": [],
+}
+
+# Размеры исходных изображений: альбомное, портретное, панорама
+DEFAULT_IMAGES = [(480, 360), (300, 420), (640, 240)]
+
+# Реплики субтитров: (начало, конец, текст)
+DEFAULT_CUES = [
+    (0.25, 1.4, "Первая реплика"),
+    (1.75, 2.6, "Вторая реплика\nв две строки"),
+]
+
+
+def psnr(reference: np.ndarray, frame: np.ndarray) -> float:
+    """
+    Пиковое отношение сигнал/шум между кадрами в дБ
+
+    Args:
+        reference: эталонный кадр H x W x 3 uint8
+        frame: проверяемый кадр того же размера
+
+    Returns:
+        float: PSNR (PSNR_IDENTICAL для совпадающих кадров)
+    """
+    error = np.mean((reference.astype(np.float64) - frame.astype(np.float64)) ** 2)
+    if error == 0:
+        return PSNR_IDENTICAL
+    return min(PSNR_IDENTICAL, float(10 * np.log10(255.0**2 / error)))
+
+
+def _box_mean(pixels: np.ndarray, size: int) -> np.ndarray:
+    """Среднее по окну size x size (только окна целиком внутри кадра)"""
+    sums = np.pad(pixels, ((1, 0), (1, 0))).cumsum(axis=0).cumsum(axis=1)
+    window = sums[size:, size:] - sums[:-size, size:] - sums[size:, :-size]
+    return (window + sums[:-size, :-size]) / (size * size)
+
+
+def ssim(reference: np.ndarray, frame: np.ndarray, window: int = 7) -> float:
+    """
+    Структурное сходство (SSIM) яркости кадров
+
+    Args:
+        reference: эталонный кадр H x W x 3 uint8
+        frame: проверяемый кадр того же размера
+        window: размер окна усреднения
+
+    Returns:
+        float: среднее SSIM по кадру (1.0 - кадры совпадают)
+    """
+    weights = np.array([0.299, 0.587, 0.114])
+    x = reference.astype(np.float64) @ weights
+    y = frame.astype(np.float64) @ weights
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+
+    mean_x, mean_y = _box_mean(x, window), _box_mean(y, window)
+    var_x = _box_mean(x * x, window) - mean_x**2
+    var_y = _box_mean(y * y, window) - mean_y**2
+    covariance = _box_mean(x * y, window) - mean_x * mean_y
+
+    similarity = ((2 * mean_x * mean_y + c1) * (2 * covariance + c2)) / (
+        (mean_x**2 + mean_y**2 + c1) * (var_x + var_y + c2)
+    )
+    return float(similarity.mean())
+
+
+def synthetic_image(size: Tuple[int, int], number: int) -> Image.Image:
+    """
+    Тестовое изображение: плавные градиенты, резкие края и тонкие линии
+
+    Градиенты показывают сдвиги цвета, края и линии - смещения
+    и разницу в ресемплинге при вписывании и зуме.
+    """
+    width, height = size
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    pixels = np.empty((height, width, 3), dtype=np.float32)
+    pixels[..., 0] = 255 * x / width
+    pixels[..., 1] = 255 * y / height
+    pixels[..., 2] = 128 + 100 * np.sin((x - y + 40 * number) / 25.0)
+    img = Image.fromarray(pixels.astype(np.uint8))
+
+    draw = ImageDraw.Draw(img)
+    draw.ellipse(
+        (width // 3, height // 3, width // 3 + width // 4, height // 3 + height // 5),
+        fill=(255, 255, 255),
+    )
+    draw.rectangle((10 + 20 * number, 10, 50 + 20 * number, 50), fill=(0, 0, 0))
+    for line in range(0, width, 16):
+        draw.line((line, height - 30, line + 8, height - 5), fill=(255, 255, 0), width=1)
+    return img
+
+
+def _srt_time(seconds: float) -> str:
+    milliseconds = int(round(seconds * 1000))
+    hours, milliseconds = divmod(milliseconds, 3600 * 1000)
+    minutes, milliseconds = divmod(milliseconds, 60 * 1000)
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d},{milliseconds:03d}"
+
+
+class RegressionCase:
+    """
+    Синтетический таймлайн для сравнения способов рендеринга
+    """
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        config: Optional[dict] = None,
+        images=DEFAULT_IMAGES,
+        cues=(),
+        overlay: bool = False,
+        video_clip: bool = False,
+        audio_duration: Optional[float] = None,
+    ):
+        """
+        Args:
+            name: короткое имя (для --cases и имен файлов)
+            description: что проверяет таймлайн
+            config: настройки поверх HARNESS_CONFIG
+            images: размеры исходных изображений
+            cues: реплики субтитров (начало, конец, текст)
+            overlay: добавить логотип с ограниченным временем показа
+            video_clip: добавить видеоклип другого размера вторым слайдом
+            audio_duration: длительность синтетического аудио (None - без аудио)
+        """
+        self.name = name
+        self.description = description
+        self.config = config or {}
+        self.images = list(images)
+        self.cues = list(cues)
+        self.overlay = overlay
+        self.video_clip = video_clip
+        self.audio_duration = audio_duration
+
+    def prepare(
+        self, folder: str, config: dict
+    ) -> Tuple[str, Optional[str], Optional[str], dict]:
+        """
+        Создает входные файлы таймлайна
+
+        Args:
+            folder: пустая рабочая папка таймлайна
+            config: базовая конфигурация
+
+        Returns:
+            tuple: (папка изображений, файл субтитров или None,
+                аудиофайл или None, конфигурация)
+        """
+        images_folder = os.path.join(folder, "images")
+        os.makedirs(images_folder, exist_ok=True)
+
+        names = [f"{number * 10:03d}.png" for number in range(len(self.images))]
+        for number, (name, size) in enumerate(zip(names, self.images)):
+            synthetic_image(size, number).save(os.path.join(images_folder, name))
+
+        if self.video_clip:
+            # Клип идет вторым (005 между 000 и 010) и не совпадает с кадром по размеру
+            run_ffmpeg(
+                [
+                    "-f", "lavfi",
+                    "-i", "testsrc2=size=400x300:rate=24:duration=1.5",
+                    "-pix_fmt", "yuv420p",
+                    "-c:v", "libx264",
+                    os.path.join(images_folder, "005_clip.mp4"),
+                ],
+                "Создание тестового клипа",
+            )
+
+        audio_file = None
+        if self.audio_duration is not None:
+            audio_file = os.path.join(folder, "audio.m4a")
+            run_ffmpeg(
+                [
+                    "-f", "lavfi",
+                    "-i", f"sine=frequency=440:duration={self.audio_duration}",
+                    "-c:a", "aac",
+                    audio_file,
+                ],
+                "Создание тестового аудио",
+            )
+
+        subtitles_file = None
+        if self.cues:
+            subtitles_file = os.path.join(folder, "subtitles.srt")
+            with open(subtitles_file, "w", encoding="utf-8") as srt_file:
+                for number, (start, end, text) in enumerate(self.cues, 1):
+                    srt_file.write(
+                        f"{number}\n{_srt_time(start)} --> {_srt_time(end)}\n{text}\n\n"
+                    )
+
+        case_config = dict(config, **HARNESS_CONFIG)
+        case_config.update(self.config)
+        case_config.update(
+            {
+                "jobs_folder": os.path.join(folder, "jobs"),
+                "image_catalog_folder": os.path.join(folder, "catalog"),
+                "audio_cache_folder": os.path.join(folder, "audio"),
+            }
+        )
+
+        if self.overlay:
+            logo_path = os.path.join(folder, "logo.png")
+            logo = Image.new("RGBA", (120, 60), (0, 0, 0, 0))
+            draw = ImageDraw.Draw(logo)
+            draw.rounded_rectangle((0, 0, 119, 59), radius=12, fill=(220, 40, 40, 160))
+            draw.ellipse((40, 10, 80, 50), fill=(255, 255, 255, 255))
+            logo.save(logo_path)
+            case_config["overlays"] = [
+                {
+                    "source": logo_path,
+                    "position": "top-right",
+                    "scale": 0.2,
+                    "opacity": 0.8,
+                    "margin": 8,
+                    "start": 0.5,
+                    "end": 2.25,
+                }
+            ]
+
+        return images_folder, subtitles_file, audio_file, case_config
+
+
+CASES = [
+    RegressionCase(
+        "still",
+        "слайды без зума, изображения разных пропорций",
+        {"zoom_enabled": False},
+    ),
+    RegressionCase(
+        "zoom",
+        "зум с приближением и отдалением",
+        {"zoom_enabled": True},
+    ),
+    RegressionCase(
+        "transitions",
+        "включенные плавные переходы: конвейер их пока не применяет, "
+        "смена слайдов должна остаться резкой во всех способах",
+        {"zoom_enabled": True, "smooth_transitions": True, "transition_duration": 0.5},
+    ),
+    RegressionCase(
+        "subtitles",
+        "субтитры (в том числе в две строки) поверх слайдов без зума",
+        {"zoom_enabled": False},
+        cues=DEFAULT_CUES,
+    ),
+    RegressionCase(
+        "overlays",
+        "зум, логотип с ограниченным временем показа и субтитры",
+        {"zoom_enabled": True},
+        cues=DEFAULT_CUES,
+        overlay=True,
+    ),
+    RegressionCase(
+        "video_clip",
+        "видеоклип другого размера среди изображений",
+        {"zoom_enabled": True},
+        video_clip=True,
+    ),
+    RegressionCase(
+        "long_audio",
+        "аудио длиннее видеоряда: последний кадр держится до конца аудио",
+        {"zoom_enabled": True},
+        audio_duration=5.0,
+    ),
+    RegressionCase(
+        "short_audio",
+        "аудио короче видеоряда: видео обрезается по концу аудио",
+        {"zoom_enabled": False},
+        audio_duration=2.5,
+    ),
+]
+
+
+def sample_frames(plan: RenderPlan) -> List[int]:
+    """
+    Номера кадров для сравнения
+
+    Первый, средний и последний кадр каждого слайда, середина каждой
+    реплики, первый кадр показа наложения и кадр сразу после него,
+    последний кадр видео.
+
+    Args:
+        plan: план рендеринга
+
+    Returns:
+        list: номера кадров по возрастанию
+    """
+    fps = plan.fps
+    total = int(plan.final_duration * fps)
+
+    def frame(t: float) -> int:
+        # Кадр n показывает момент n / fps: первый кадр не раньше t
+        return int(np.ceil(t * fps - 1e-6))
+
+    marks = set()
+    for slide in plan.slides:
+        first = frame(slide.start)
+        last = frame(min(slide.end, plan.final_duration)) - 1
+        marks.update((first, (first + last) // 2, last))
+    for cue in plan.cues:
+        marks.add(frame((cue.start + cue.end) / 2))
+    for overlay in plan.overlays:
+        for t in (overlay.start, overlay.end):
+            if t is not None:
+                marks.update((frame(t) - 1, frame(t)))
+    marks.add(total - 1)
+    return sorted(number for number in marks if 0 <= number < total)
+
+
+def _timeline_frames(plan: RenderPlan) -> int:
+    return int(plan.final_duration * plan.fps)
+
+
+def _render_clip(composer: VideoComposer, plan: RenderPlan, indices, folder: str):
+    """Граф клипов MoviePy, кадры берутся из памяти (без кодирования)"""
+    wanted = set(indices)
+    frames = {}
+    workspace = composer.open_workspace(f"regression_{plan.fingerprint()[:16]}")
+    composer.workspace = workspace
+    try:
+        clip = composer._compose_clip(plan, with_audio=False)
+        if clip is None:
+            raise RuntimeError("Нет слайдов для рендеринга")
+        try:
+            timeline = clip.subclipped(0, plan.final_duration)
+            for number, frame in enumerate(
+                timeline.iter_frames(fps=plan.fps, dtype="uint8")
+            ):
+                if number in wanted:
+                    frames[number] = np.array(frame)
+        finally:
+            clip.close()
+    finally:
+        composer.workspace = None
+        workspace.cleanup()
+    return frames
+
+
+def _render_direct(composer: VideoComposer, plan: RenderPlan, indices, folder: str):
+    """Прямой рендеринг каждого кадра таймлайна по плану"""
+    wanted = set(indices)
+    frames = {}
+    renderer = FrameRenderer(plan, subtitles=True)
+    for number in range(_timeline_frames(plan)):
+        frame = renderer.frame_at(number / plan.fps)
+        if number in wanted:
+            frames[number] = frame
+    return frames
+
+
+def _decoded_frames(output_file: str, plan: RenderPlan, indices):
+    decoded = decode_frames(output_file, plan.resolution, plan.fps)
+    return {number: decoded[number] for number in indices if number < len(decoded)}
+
+
+def _render_encoded(composer: VideoComposer, plan: RenderPlan, indices, folder: str):
+    """Рендеринг в файл (render_plan) и декодирование кадров результата"""
+    os.makedirs(folder, exist_ok=True)
+    output_file = os.path.join(folder, RESULT_NAME)
+    if not composer.render_plan(plan.with_changes(output_file=output_file)):
+        raise RuntimeError("Рендеринг в файл не удался")
+    return _decoded_frames(output_file, plan, indices)
+
+
+def _render_resumable(composer: VideoComposer, plan: RenderPlan, indices, folder: str):
+    """Посегментный рендеринг (render_plan_resumable) и декодирование результата"""
+    os.makedirs(folder, exist_ok=True)
+    output_file = os.path.join(folder, RESULT_NAME)
+    plan = plan.with_changes(output_file=output_file)
+    workspace = composer.open_workspace(f"regression_{plan.fingerprint()[:16]}")
+    if not composer.render_plan_resumable(plan, workspace):
+        raise RuntimeError("Посегментный рендеринг не удался")
+    return _decoded_frames(output_file, plan, indices)
+
+
+class Backend:
+    """
+    Способ рендеринга, который сравнивается с эталоном
+    """
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        render: Callable,
+        config: Optional[dict] = None,
+        lossy: bool = False,
+    ):
+        """
+        Args:
+            name: короткое имя (для --backends и отчета)
+            description: что именно рендерит способ
+            render: функция (composer, plan, номера кадров, папка) -> {номер: кадр};
+                рендерит весь таймлайн, чтобы замер скорости был честным
+            config: настройки VideoComposer поверх настроек таймлайна
+            lossy: кадры берутся после кодирования (пороги ENCODED_*)
+        """
+        self.name = name
+        self.description = description
+        self.render = render
+        self.config = config or {}
+        self.lossy = lossy
+
+    @property
+    def thresholds(self) -> Tuple[float, float]:
+        """Пороги (PSNR, SSIM) способа"""
+        if self.lossy:
+            return ENCODED_PSNR_MIN, ENCODED_SSIM_MIN
+        return PSNR_MIN, SSIM_MIN
+
+
+# Эталон - первый
+BACKENDS = [
+    Backend("moviepy", "граф клипов MoviePy (эталон)", _render_clip),
+    Backend(
+        "slide_cache",
+        "MoviePy со слайдами из кеша подготовленных слайдов",
+        _render_clip,
+        {"slide_cache": True},
+    ),
+    Backend(
+        "slide_store",
+        "MoviePy со слайдами из общего хранилища",
+        _render_clip,
+        {"use_slide_store": True},
+    ),
+    Backend("direct", "прямой рендеринг кадров (FrameRenderer)", _render_direct),
+    Backend("encoded", "файл render_plan после кодирования", _render_encoded, lossy=True),
+    Backend(
+        "vfr",
+        "файл с переменной частотой кадров после кодирования",
+        _render_encoded,
+        {"vfr_output": True, "vfr_min_static_share": 0.0},
+        lossy=True,
+    ),
+    Backend(
+        "progressive",
+        "фрагментированный MP4 после кодирования",
+        _render_encoded,
+        {"progressive_output": "fmp4"},
+        lossy=True,
+    ),
+    Backend(
+        "resumable",
+        "склейка сегментов по одному слайду после кодирования",
+        _render_resumable,
+        {"resumable_render": True, "segment_slides": 1},
+        lossy=True,
+    ),
+]
+
+
+class BackendResult:
+    """
+    Результат одного способа рендеринга на одном таймлайне
+    """
+
+    def __init__(self, case: str, backend: str, thresholds: Tuple[float, float]):
+        self.case = case
+        self.backend = backend
+        self.psnr_min, self.ssim_min = thresholds
+        self.seconds = 0.0
+        self.frame_count = 0
+        # Сравнение кадров: {frame, time, psnr, ssim, ok}
+        self.frames: List[dict] = []
+        self.error: Optional[str] = None
+        # Длительность готового файла и по плану (только у способов с файлом)
+        self.duration: Optional[float] = None
+        self.expected_duration: Optional[float] = None
+
+    @property
+    def fps(self) -> Optional[float]:
+        """Скорость рендеринга в кадрах в секунду"""
+        if not self.seconds or not self.frame_count:
+            return None
+        return self.frame_count / self.seconds
+
+    @property
+    def worst_psnr(self) -> Optional[float]:
+        return min((item["psnr"] for item in self.frames), default=None)
+
+    @property
+    def worst_ssim(self) -> Optional[float]:
+        return min((item["ssim"] for item in self.frames), default=None)
+
+    @property
+    def failed_frames(self) -> List[dict]:
+        return [item for item in self.frames if not item["ok"]]
+
+    @property
+    def duration_ok(self) -> bool:
+        if self.duration is None or self.expected_duration is None:
+            return True
+        return abs(self.duration - self.expected_duration) <= DURATION_TOLERANCE
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and not self.failed_frames and self.duration_ok
+
+    def compare(self, number: int, t: float, reference: np.ndarray, frame: Optional[np.ndarray]):
+        """Сравнивает кадр с эталоном и запоминает результат"""
+        if frame is None or frame.shape != reference.shape:
+            self.frames.append(
+                {"frame": number, "time": round(t, 4), "psnr": 0.0, "ssim": 0.0, "ok": False}
+            )
+            return
+
+        frame_psnr = psnr(reference, frame)
+        frame_ssim = ssim(reference, frame)
+        self.frames.append(
+            {
+                "frame": number,
+                "time": round(t, 4),
+                "psnr": round(frame_psnr, 2),
+                "ssim": round(frame_ssim, 4),
+                "ok": frame_psnr >= self.psnr_min and frame_ssim >= self.ssim_min,
+            }
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "case": self.case,
+            "backend": self.backend,
+            "ok": self.ok,
+            "error": self.error,
+            "seconds": round(self.seconds, 4),
+            "frames_rendered": self.frame_count,
+            "fps": round(self.fps, 2) if self.fps else None,
+            "thresholds": {"psnr": self.psnr_min, "ssim": self.ssim_min},
+            "duration": self.duration,
+            "expected_duration": self.expected_duration,
+            "worst_psnr": self.worst_psnr,
+            "worst_ssim": self.worst_ssim,
+            "frames": self.frames,
+        }
+
+
+class RegressionReport:
+    """
+    Итог сравнения способов рендеринга
+    """
+
+    def __init__(self, results: List[BackendResult], elapsed: float):
+        """
+        Args:
+            results: результаты по таймлайнам и способам
+            elapsed: время проверки в секундах
+        """
+        self.results = results
+        self.elapsed = elapsed
+
+    @property
+    def failures(self) -> List[BackendResult]:
+        return [result for result in self.results if not result.ok]
+
+    @property
+    def ok(self) -> bool:
+        return not self.failures
+
+    def to_dict(self) -> dict:
+        return {
+            "version": REPORT_VERSION,
+            "ok": self.ok,
+            "elapsed": round(self.elapsed, 4),
+            "failures": [f"{result.case}/{result.backend}" for result in self.failures],
+            "results": [result.to_dict() for result in self.results],
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), ensure_ascii=False, indent=2)
+
+    def save(self, path: str):
+        """Сохраняет отчет в JSON-файл"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as report_file:
+            report_file.write(self.to_json())
+
+    def print_summary(self):
+        """Выводит таблицу: таймлайн, способ, скорость, худшие PSNR и SSIM"""
+        print(f"\n📋 Сравнение способов рендеринга ({self.elapsed:.1f} с):")
+        print(f"   {'таймлайн':<12} {'способ':<12} {'кадр/с':>8} {'PSNR':>7} {'SSIM':>7}")
+        for result in self.results:
+            fps = f"{result.fps:.1f}" if result.fps else "-"
+            worst_psnr = f"{result.worst_psnr:.1f}" if result.worst_psnr is not None else "-"
+            worst_ssim = f"{result.worst_ssim:.4f}" if result.worst_ssim is not None else "-"
+            status = "✅" if result.ok else "❌"
+            print(
+                f"   {result.case:<12} {result.backend:<12} {fps:>8} "
+                f"{worst_psnr:>7} {worst_ssim:>7} {status}"
+            )
+            if result.error:
+                print(f"      ⚠️ {result.error}")
+            if not result.duration_ok:
+                print(
+                    f"      длительность {result.duration:.2f} с, "
+                    f"по плану {result.expected_duration:.2f} с"
+                )
+            for item in result.failed_frames:
+                print(
+                    f"      кадр {item['frame']} ({item['time']:.3f} с): "
+                    f"PSNR {item['psnr']}, SSIM {item['ssim']}"
+                )
+        print("✅ Расхождений нет" if self.ok else f"❌ Расхождений: {len(self.failures)}")
+
+
+def _save_comparison(
+    folder: str, result: BackendResult, reference: Dict[int, np.ndarray], frames
+):
+    """Сохраняет расходящиеся кадры: эталон | способ | усиленная разница"""
+    os.makedirs(folder, exist_ok=True)
+    for item in result.failed_frames:
+        number = item["frame"]
+        frame = frames.get(number)
+        if frame is None or frame.shape != reference[number].shape:
+            continue
+        difference = np.abs(reference[number].astype(np.int16) - frame.astype(np.int16))
+        amplified = np.clip(difference * 8, 0, 255).astype(np.uint8)
+        side_by_side = np.concatenate([reference[number], frame, amplified], axis=1)
+        Image.fromarray(side_by_side).save(
+            os.path.join(folder, f"{result.case}_{result.backend}_{number:05d}.png")
+        )
+
+
+def _golden_frames(
+    folder: str, case: str, reference: Dict[int, np.ndarray], update: bool
+) -> Optional[Dict[int, np.ndarray]]:
+    """
+    Эталонные кадры с диска (None - сохранены заново)
+
+    PNG без потерь: эталон сравнивается с ними по тем же порогам.
+    """
+    case_folder = os.path.join(folder, case)
+    paths = {
+        number: os.path.join(case_folder, f"{number:05d}.png") for number in reference
+    }
+    if not update and all(os.path.isfile(path) for path in paths.values()):
+        frames = {}
+        for number, path in paths.items():
+            with Image.open(path) as img:
+                frames[number] = np.asarray(img.convert("RGB"))
+        return frames
+
+    os.makedirs(case_folder, exist_ok=True)
+    for number, path in paths.items():
+        Image.fromarray(reference[number]).save(path)
+    print(f"💾 Эталонные кадры {case} сохранены: {case_folder}")
+    return None
+
+
+def run_regression(
+    config: dict,
+    cases: Optional[List[str]] = None,
+    backends: Optional[List[str]] = None,
+    golden_folder: Optional[str] = None,
+    update_golden: bool = False,
+    frames_folder: Optional[str] = None,
+    work_folder: Optional[str] = None,
+) -> RegressionReport:
+    """
+    Рендерит синтетические таймлайны всеми способами и сравнивает кадры
+
+    Args:
+        config: базовая конфигурация (кодек, шрифт субтитров и т.п.)
+        cases: имена таймлайнов (None - все CASES)
+        backends: имена способов (None - все BACKENDS; эталон есть всегда)
+        golden_folder: папка сохраненных эталонных кадров (None - без нее)
+        update_golden: перезаписать сохраненные эталонные кадры
+        frames_folder: куда сохранить расходящиеся кадры (None - не сохранять)
+        work_folder: рабочая папка (None - временная, удаляется)
+
+    Returns:
+        RegressionReport: результаты по таймлайнам и способам
+
+    Raises:
+        ValueError: если указан неизвестный таймлайн или способ
+    """
+    started = time.perf_counter()
+    known_cases = {case.name: case for case in CASES}
+    known_backends = {backend.name: backend for backend in BACKENDS}
+    for name in cases or []:
+        if name not in known_cases:
+            raise ValueError(f"Неизвестный таймлайн: {name}")
+    for name in backends or []:
+        if name not in known_backends:
+            raise ValueError(f"Неизвестный способ рендеринга: {name}")
+
+    selected_cases = [known_cases[name] for name in cases] if cases else CASES
+    reference_backend = BACKENDS[0]
+    selected_backends = [
+        backend
+        for backend in BACKENDS[1:]
+        if not backends or backend.name in backends
+    ]
+
+    temp_folder = None
+    if work_folder is None:
+        temp_folder = tempfile.TemporaryDirectory(prefix="regression_")
+        work_folder = temp_folder.name
+
+    results = []
+    try:
+        for case in selected_cases:
+            print(f"\n🧪 Таймлайн {case.name}: {case.description}")
+            case_folder = os.path.join(work_folder, case.name)
+            os.makedirs(case_folder, exist_ok=True)
+            images_folder, subtitles_file, audio_file, case_config = case.prepare(
+                case_folder, config
+            )
+
+            composer = VideoComposer(case_config)
+            plan = composer.build_plan(
+                images_folder,
+                audio_file,
+                subtitles_file,
+                os.path.join(case_folder, "result.mp4"),
+                seed=case_config["random_seed"],
+            )
+            indices = sample_frames(plan)
+
+            # Эталон
+            reference_result = BackendResult(
+                case.name, reference_backend.name, reference_backend.thresholds
+            )
+            begin = time.perf_counter()
+            reference = reference_backend.render(composer, plan, indices, case_folder)
+            reference_result.seconds = time.perf_counter() - begin
+            reference_result.frame_count = _timeline_frames(plan)
+            results.append(reference_result)
+
+            missing = [number for number in indices if number not in reference]
+            if missing:
+                reference_result.error = f"Эталон не выдал кадры {missing}"
+                continue
+
+            if golden_folder:
+                golden = _golden_frames(golden_folder, case.name, reference, update_golden)
+                if golden is not None:
+                    golden_result = BackendResult(case.name, "golden", (PSNR_MIN, SSIM_MIN))
+                    for number in indices:
+                        golden_result.compare(
+                            number, number / plan.fps, golden[number], reference[number]
+                        )
+                    results.append(golden_result)
+
+            for backend in selected_backends:
+                print(f"▶️ {case.name}/{backend.name}: {backend.description}")
+                result = BackendResult(case.name, backend.name, backend.thresholds)
+                frames = {}
+                try:
+                    backend_composer = VideoComposer(dict(case_config, **backend.config))
+                    # Каталог нужен кешу слайдов (хеш содержимого по пути)
+                    backend_composer._find_images(images_folder)
+                    backend_folder = os.path.join(case_folder, backend.name)
+                    begin = time.perf_counter()
+                    frames = backend.render(backend_composer, plan, indices, backend_folder)
+                    result.seconds = time.perf_counter() - begin
+                    result.frame_count = _timeline_frames(plan)
+
+                    output_file = os.path.join(backend_folder, RESULT_NAME)
+                    if os.path.isfile(output_file):
+                        result.duration = probe_media(output_file)["duration"]
+                        result.expected_duration = round(plan.final_duration, 3)
+                except Exception as e:
+                    logging.error(f"Способ {backend.name} на {case.name}: {e}", exc_info=True)
+                    result.error = str(e)
+                else:
+                    for number in indices:
+                        result.compare(
+                            number, number / plan.fps, reference[number], frames.get(number)
+                        )
+                    if frames_folder and result.failed_frames:
+                        _save_comparison(frames_folder, result, reference, frames)
+                results.append(result)
+    finally:
+        if temp_folder is not None:
+            temp_folder.cleanup()
+
+    report = RegressionReport(results, time.perf_counter() - started)
+    logging.info(
+        f"Сравнение способов рендеринга: {len(results)} результатов, "
+        f"{len(report.failures)} расхождений за {report.elapsed:.1f} с"
+    )
+    return report
+
+
+def main():
+    """Сравнение способов рендеринга из командной строки"""
+    parser = argparse.ArgumentParser(
+        description="Покадровое сравнение способов рендеринга с эталоном MoviePy"
+    )
+    parser.add_argument("--config", default="default", help="имя конфигурации")
+    parser.add_argument(
+        "--cases", help=f"таймлайны через запятую ({', '.join(c.name for c in CASES)})"
+    )
+    parser.add_argument(
+        "--backends",
+        help=f"способы через запятую ({', '.join(b.name for b in BACKENDS[1:])})",
+    )
+    parser.add_argument("--golden", help="папка сохраненных эталонных кадров")
+    parser.add_argument(
+        "--update-golden", action="store_true", help="перезаписать эталонные кадры"
+    )
+    parser.add_argument("--save-frames", help="папка для расходящихся кадров")
+    parser.add_argument("--work", help="рабочая папка (по умолчанию временная)")
+    parser.add_argument("--json", dest="json_file", help="сохранить отчет в JSON-файл")
+    args = parser.parse_args()
+
+    from config import get_config
+
+    def names(value: Optional[str]) -> Optional[List[str]]:
+        return [name.strip() for name in value.split(",") if name.strip()] if value else None
+
+    try:
+        report = run_regression(
+            get_config(args.config),
+            cases=names(args.cases),
+            backends=names(args.backends),
+            golden_folder=args.golden,
+            update_golden=args.update_golden,
+            frames_folder=args.save_frames,
+            work_folder=args.work,
+        )
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 2
+
+    report.print_summary()
+    if args.json_file:
+        report.save(args.json_file)
+    return 0 if report.ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
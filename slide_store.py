@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Хранилище подготовленных слайдов в memory-mapped файле
+
+Подготовленные (вписанные в кадр) слайды записываются один раз в общий
+бинарный файл uint8 с индексом смещений. Любое количество процессов
+может отобразить этот файл только для чтения и получать кадры без
+копирования и без повторного декодирования исходных изображений.
+
+Формат на диске (один набор файлов на задачу):
+    slides.bin        - подряд идущие пиксели слайдов (H x W x 3, uint8)
+                        и метка записи в конце файла
+    slides.bin.index  - JSON-индекс: метка записи, имя, смещение, форма
+                        и ключ исходного файла каждого слайда
+
+Хранилище пишется во временный файл и заменяет старое атомарно, поэтому
+процесс, который уже отобразил старое хранилище в память, продолжает
+читать его целым. Индекс и данные проверяются по метке: если между их
+заменами хранилище открыл другой процесс, он получит ошибку, а не
+чужие пиксели.
+
+Автор: [@EvilBabayka]
+Дата: 2025
+"""
+
+import os
+import json
+import logging
+import tempfile
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Версия формата индекса (на случай будущих изменений)
+INDEX_VERSION = 2
+
+# Размер метки записи в конце файла данных в байтах
+TOKEN_SIZE = 16
+
+
+def index_path_for(data_path: str) -> str:
+    """Возвращает путь к индексу для файла данных хранилища"""
+    return f"{data_path}.index"
+
+
+class SlideStore:
+    """
+    Набор подготовленных слайдов, отображенный в память только для чтения
+    """
+
+    def __init__(self, data_path: str, entries: List[dict]):
+        """
+        Открывает хранилище (используйте SlideStore.open или SlideStore.build)
+
+        Args:
+            data_path: путь к файлу с пикселями
+            entries: записи индекса (name, offset, shape и key)
+        """
+        self.data_path = data_path
+        self.entries = entries
+        self._names = {entry["name"]: i for i, entry in enumerate(entries)}
+
+        # Пустой файл нельзя отобразить в память
+        if os.path.getsize(data_path) > 0:
+            self._mmap = np.memmap(data_path, dtype=np.uint8, mode="r")
+        else:
+            self._mmap = None
+
+    @property
+    def token(self) -> Optional[str]:
+        """Метка записи из конца отображенного файла данных"""
+        if self._mmap is None or len(self._mmap) < TOKEN_SIZE:
+            return None
+        return bytes(self._mmap[-TOKEN_SIZE:]).hex()
+
+    @classmethod
+    def build(
+        cls, data_path: str, slides: Iterable[Tuple[str, np.ndarray]]
+    ) -> "SlideStore":
+        """
+        Записывает слайды в хранилище и открывает его для чтения
+
+        Args:
+            data_path: путь к файлу с пикселями
+            slides: пары (имя, массив H x W x 3 uint8) или тройки
+                (имя, массив, ключ исходного файла)
+
+        Returns:
+            SlideStore: открытое хранилище
+        """
+        with SlideStoreWriter(data_path) as writer:
+            for name, pixels, *key in slides:
+                writer.add(name, pixels, *key)
+        return writer.finish()
+
+    @classmethod
+    def open(cls, data_path: str) -> "SlideStore":
+        """
+        Открывает ранее записанное хранилище только для чтения
+
+        Args:
+            data_path: путь к файлу с пикселями
+
+        Returns:
+            SlideStore: открытое хранилище
+
+        Raises:
+            ValueError: если индекс другой версии или от другой записи данных
+        """
+        with open(index_path_for(data_path), "r", encoding="utf-8") as index_file:
+            index = json.load(index_file)
+
+        if index.get("version") != INDEX_VERSION:
+            raise ValueError(f"Неподдерживаемая версия индекса слайдов: {data_path}")
+
+        store = cls(data_path, index["entries"])
+        if store.token != index.get("token"):
+            store.close()
+            raise ValueError(f"Индекс слайдов не соответствует данным: {data_path}")
+        return store
+
+    @staticmethod
+    def exists(data_path: str) -> bool:
+        """Проверяет, записано ли хранилище полностью"""
+        return os.path.isfile(data_path) and os.path.isfile(index_path_for(data_path))
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __getitem__(self, index: int) -> np.ndarray:
+        return self.get(index)
+
+    @property
+    def names(self) -> List[str]:
+        """Имена слайдов в порядке записи"""
+        return [entry["name"] for entry in self.entries]
+
+    def matches(self, keys: Dict[str, Optional[str]], shape: Tuple[int, ...]) -> bool:
+        """
+        Проверяет, что в хранилище есть все нужные слайды в актуальном виде
+
+        Args:
+            keys: имя слайда -> ключ исходного файла
+            shape: форма подготовленного слайда (высота, ширина, 3)
+
+        Returns:
+            bool: True если хранилище можно использовать без пересборки
+        """
+        for name, key in keys.items():
+            index = self._names.get(name)
+            if index is None:
+                return False
+            entry = self.entries[index]
+            if entry.get("key") != key or tuple(entry["shape"]) != tuple(shape):
+                return False
+        return True
+
+    def get(self, index: int) -> np.ndarray:
+        """
+        Возвращает слайд по номеру без копирования данных
+
+        Args:
+            index: номер слайда
+
+        Returns:
+            np.ndarray: представление (view) только для чтения
+        """
+        entry = self.entries[index]
+        shape = tuple(entry["shape"])
+        size = int(np.prod(shape))
+        offset = entry["offset"]
+        return self._mmap[offset : offset + size].reshape(shape)
+
+    def find(self, name: str) -> Optional[np.ndarray]:
+        """Возвращает слайд по имени или None, если его нет"""
+        index = self._names.get(name)
+        if index is None:
+            return None
+        return self.get(index)
+
+    def close(self):
+        """
+        Освобождает отображение файла
+
+        У np.memmap нет явного close: отображение снимается, когда
+        пропадает последняя ссылка (включая уже выданные слайды).
+        """
+        self._mmap = None
+
+
+class SlideStoreWriter:
+    """
+    Последовательная запись слайдов в хранилище
+
+    Позволяет заполнять несколько хранилищ одновременно (например, одно
+    изображение декодируется один раз и вписывается в несколько разрешений).
+    Данные пишутся во временный файл рядом с хранилищем и заменяют старые
+    атомарно, затем так же атомарно сохраняется индекс, поэтому
+    недописанное хранилище никогда не будет открыто другим процессом.
+    """
+
+    def __init__(self, data_path: str):
+        """
+        Args:
+            data_path: путь к файлу с пикселями
+        """
+        self.data_path = data_path
+        self.entries: List[dict] = []
+        self.offset = 0
+        self.token = os.urandom(TOKEN_SIZE).hex()
+        self._store: Optional[SlideStore] = None
+
+        folder = os.path.dirname(data_path) or "."
+        os.makedirs(folder, exist_ok=True)
+        # Старый файл не обрезается на месте: его может читать через
+        # отображение в память другой процесс (это закончилось бы SIGBUS)
+        descriptor, self._temp_path = tempfile.mkstemp(
+            dir=folder, prefix=f".{os.path.basename(data_path)}.", suffix=".tmp"
+        )
+        self._data_file = os.fdopen(descriptor, "wb")
+
+    def add(self, name: str, pixels: np.ndarray, key: Optional[str] = None):
+        """
+        Добавляет слайд в конец хранилища
+
+        Args:
+            name: имя слайда (обычно путь к исходному изображению)
+            pixels: массив H x W x 3 uint8
+            key: ключ версии исходного файла (для проверки перед повторным
+                использованием хранилища)
+        """
+        pixels = np.ascontiguousarray(pixels, dtype=np.uint8)
+        self._data_file.write(memoryview(pixels))
+        self.entries.append(
+            {"name": name, "offset": self.offset, "shape": list(pixels.shape), "key": key}
+        )
+        self.offset += pixels.nbytes
+
+    def finish(self) -> SlideStore:
+        """
+        Закрывает файл данных, записывает индекс и открывает хранилище
+
+        Returns:
+            SlideStore: открытое хранилище
+        """
+        if self._store is not None:
+            return self._store
+
+        self._data_file.write(bytes.fromhex(self.token))
+        self._data_file.close()
+
+        # Свой файл отображается до замены: если параллельно хранилище
+        # пересобрал другой процесс, наши смещения не укажут в его данные
+        store = SlideStore(self._temp_path, self.entries)
+        os.replace(self._temp_path, self.data_path)
+        store.data_path = self.data_path
+
+        index_path = index_path_for(self.data_path)
+        descriptor, temp_index = tempfile.mkstemp(
+            dir=os.path.dirname(index_path) or ".",
+            prefix=f".{os.path.basename(index_path)}.",
+            suffix=".tmp",
+        )
+        with os.fdopen(descriptor, "w", encoding="utf-8") as index_file:
+            json.dump(
+                {"version": INDEX_VERSION, "token": self.token, "entries": self.entries},
+                index_file,
+                ensure_ascii=False,
+            )
+        os.replace(temp_index, index_path)
+
+        logging.info(
+            f"Хранилище слайдов записано: {self.data_path} "
+            f"({len(self.entries)} слайдов, {self.offset / (1024 * 1024):.1f} МБ)"
+        )
+        self._store = store
+        return self._store
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        # При ошибке старое хранилище остается на месте, временный файл удаляется
+        if exc_type is not None:
+            self._data_file.close()
+            try:
+                os.remove(self._temp_path)
+            except FileNotFoundError:
+                pass
+        return False
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Потоковая загрузка субтитров SRT и WebVTT
+
+Файл читается построчно за один проход, без разбора в объекты на каждую
+реплику. Кодировка определяется автоматически: BOM (UTF-8, UTF-16),
+затем UTF-8 и, если файл в ней не читается, cp1251 (так сохраняет
+субтитры Word в русской Windows).
+
+Реплики хранятся в компактной таблице на массивах:
+    starts, ends - время начала и конца в миллисекундах (array 'q')
+    offsets      - границы текста реплик в одной общей строке (array 'q')
+
+Так даже файл в десятки тысяч реплик занимает немного памяти, а поиск
+реплики по времени - двоичный поиск по массиву начал.
+
+Автор: [@EvilBabayka]
+Дата: 2025
+"""
+
+import os
+import re
+import html
+import codecs
+import logging
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Iterator, Optional, Tuple
+
+from render_plan import SubtitleCue
+
+# Сколько байт читать для определения кодировки
+DETECT_BYTES = 64 * 1024
+
+# Кодировка, если файл не читается как UTF-8
+FALLBACK_ENCODING = "cp1251"
+
+# Время: [часы:]минуты:секунды,миллисекунды (в WebVTT - точка, часы необязательны)
+_TIME = r"(?:(\d+):)?(\d{1,2}):(\d{1,2})[,.](\d{1,3})"
+_TIMING_RE = re.compile(rf"^\s*{_TIME}\s*-->\s*{_TIME}")
+_TAG_RE = re.compile(r"<[^>]*>")
+
+# Блоки WebVTT, которые не являются репликами
+_VTT_BLOCKS = ("NOTE", "STYLE", "REGION")
+
+# Сколько разобранных файлов держать в памяти процесса (load_subtitles_cached)
+CACHED_TABLES = 16
+
+# Разобранные файлы: (путь, размер, время изменения) -> таблица реплик
+_TABLES: "OrderedDict[tuple, CueTable]" = OrderedDict()
+
+
+class SubtitleError(ValueError):
+    """Ошибка разбора файла субтитров"""
+
+    def __init__(self, path: str, line: int, message: str):
+        super().__init__(f"{path}, строка {line}: {message}")
+        self.path = path
+        self.line = line
+
+
+def detect_encoding(path: str) -> str:
+    """
+    Определяет кодировку файла субтитров по началу файла
+
+    Args:
+        path: путь к файлу
+
+    Returns:
+        str: имя кодировки для open()
+    """
+    with open(path, "rb") as source:
+        head = source.read(DETECT_BYTES)
+
+    if head.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+
+    try:
+        # Последний символ мог разрезаться границей блока - это не ошибка
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return FALLBACK_ENCODING
+
+
+def _milliseconds(hours, minutes, seconds, fraction) -> int:
+    return (
+        (int(hours or 0) * 3600 + int(minutes) * 60 + int(seconds)) * 1000
+        + int(fraction.ljust(3, "0"))
+    )
+
+
+class CueTable:
+    """
+    Реплики субтитров в компактных массивах
+    """
+
+    def __init__(self, encoding: Optional[str] = None, subtitle_format: str = "srt"):
+        """
+        Args:
+            encoding: кодировка, в которой был прочитан файл
+            subtitle_format: 'srt' или 'vtt'
+        """
+        self.encoding = encoding
+        self.format = subtitle_format
+        self.starts = array("q")
+        self.ends = array("q")
+        self.offsets = array("q", [0])
+        self.text = ""
+        # Номер первой реплики, которая начинается раньше предыдущей (None - порядок верный)
+        self.first_unordered: Optional[int] = None
+        self._parts = []
+        self._length = 0
+
+    def append(self, start_ms: int, end_ms: int, text: str):
+        """Добавляет реплику (время в миллисекундах)"""
+        if self.first_unordered is None and self.starts and start_ms < self.starts[-1]:
+            self.first_unordered = len(self.starts)
+        self.starts.append(start_ms)
+        self.ends.append(end_ms)
+        self._parts.append(text)
+        self._length += len(text)
+        self.offsets.append(self._length)
+
+    def finish(self) -> "CueTable":
+        """
+        Завершает заполнение: склеивает текст и упорядочивает реплики по началу
+
+        Returns:
+            CueTable: эта же таблица
+        """
+        if self._parts:
+            self.text += "".join(self._parts)
+            self._parts = []
+
+        if self.first_unordered is not None:
+            order = sorted(range(len(self)), key=self.starts.__getitem__)
+            texts = [self.cue_text(number) for number in order]
+            self.starts = array("q", (self.starts[number] for number in order))
+            self.ends = array("q", (self.ends[number] for number in order))
+            self.offsets = array("q", [0])
+            self._length = 0
+            for text in texts:
+                self._length += len(text)
+                self.offsets.append(self._length)
+            self.text = "".join(texts)
+        return self
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def cue_text(self, number: int) -> str:
+        """Текст реплики по номеру"""
+        if self._parts:
+            self.finish()
+        return self.text[self.offsets[number] : self.offsets[number + 1]]
+
+    def __iter__(self) -> Iterator[Tuple[int, int, str]]:
+        """Реплики в виде (начало мс, конец мс, текст)"""
+        for number in range(len(self)):
+            yield self.starts[number], self.ends[number], self.cue_text(number)
+
+    def active(self, time_ms: int) -> Optional[int]:
+        """
+        Номер реплики, которая видна в момент time_ms (или None)
+
+        Args:
+            time_ms: время от начала видео в миллисекундах
+        """
+        number = bisect_right(self.starts, time_ms) - 1
+        if number >= 0 and time_ms < self.ends[number]:
+            return number
+        return None
+
+    def to_cues(self) -> Tuple[SubtitleCue, ...]:
+        """Реплики для плана рендеринга (время в секундах)"""
+        return tuple(
+            SubtitleCue(start=start / 1000.0, end=end / 1000.0, text=text)
+            for start, end, text in self
+        )
+
+
+def _clean_text(lines, is_vtt: bool) -> str:
+    """Текст реплики без тегов разметки (<i>, <c.класс>, <00:01.000>)"""
+    text = _TAG_RE.sub("", "\n".join(lines))
+    if is_vtt:
+        text = html.unescape(text)
+    return text.strip()
+
+
+def load_subtitles(
+    path: str, encoding: Optional[str] = None, strict: bool = False
+) -> CueTable:
+    """
+    Загружает субтитры SRT или WebVTT за один проход
+
+    Args:
+        path: путь к файлу субтитров
+        encoding: кодировка (None - определить автоматически)
+        strict: ошибка на первой битой реплике (иначе она пропускается)
+
+    Returns:
+        CueTable: таблица реплик
+
+    Raises:
+        SubtitleError: в строгом режиме - при первой битой реплике
+    """
+    detected = encoding or detect_encoding(path)
+    try:
+        return _parse(path, detected, strict)
+    except UnicodeDecodeError:
+        # Начало файла - в UTF-8 (например, только латиница), а дальше нет
+        if encoding or detected != "utf-8":
+            raise
+        logging.info(f"Субтитры {path} не в UTF-8, читаем как {FALLBACK_ENCODING}")
+        return _parse(path, FALLBACK_ENCODING, strict)
+
+
+def load_subtitles_cached(path: str) -> CueTable:
+    """
+    Загружает субтитры, повторно используя уже разобранный файл
+
+    Файл разбирается заново, только если изменились его размер или время
+    изменения. Полезно в долгоживущем процессе (см. render_daemon.py).
+
+    Args:
+        path: путь к файлу субтитров
+
+    Returns:
+        CueTable: таблица реплик (не изменять)
+    """
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    table = _TABLES.get(key)
+    if table is not None:
+        _TABLES.move_to_end(key)
+        return table
+
+    table = load_subtitles(path)
+    _TABLES[key] = table
+    while len(_TABLES) > CACHED_TABLES:
+        _TABLES.popitem(last=False)
+    return table
+
+
+def _parse(path: str, encoding: str, strict: bool) -> CueTable:
+    """Разбирает файл построчно (конечный автомат: вне реплики / текст / пропуск)"""
+    table = None
+    timing = None
+    text_lines = []
+    skipping = False
+    skipped = 0
+
+    def fail(line_number: int, message: str):
+        nonlocal skipped
+        if strict:
+            raise SubtitleError(path, line_number, message)
+        skipped += 1
+        logging.warning(f"Субтитры {path}, строка {line_number}: {message}")
+
+    def flush():
+        if timing is not None:
+            start_ms, end_ms = timing
+            table.append(start_ms, end_ms, _clean_text(text_lines, table.format == "vtt"))
+
+    with open(path, "r", encoding=encoding, newline=None) as source:
+        for line_number, line in enumerate(source, start=1):
+            line = line.rstrip("\r\n")
+
+            if table is None:
+                # Первая строка решает формат
+                is_vtt = line.lstrip("\ufeff").startswith("WEBVTT")
+                table = CueTable(encoding, "vtt" if is_vtt else "srt")
+                if is_vtt:
+                    skipping = True
+                    continue
+
+            if not line.strip():
+                flush()
+                timing, text_lines, skipping = None, [], False
+                continue
+
+            if skipping:
+                continue
+
+            if "-->" in line:
+                match = _TIMING_RE.match(line)
+                if match is None:
+                    fail(line_number, f"неверное время реплики: {line.strip()}")
+                    timing, text_lines, skipping = None, [], True
+                    continue
+
+                # Реплики без пустой строки между ними: номер следующей
+                # реплики уже попал в текст предыдущей
+                if timing is not None:
+                    if text_lines and text_lines[-1].strip().isdigit():
+                        text_lines.pop()
+                    flush()
+
+                groups = match.groups()
+                start_ms = _milliseconds(*groups[:4])
+                end_ms = _milliseconds(*groups[4:])
+                if end_ms < start_ms:
+                    fail(line_number, "реплика заканчивается раньше, чем начинается")
+                    timing, text_lines, skipping = None, [], True
+                    continue
+                timing, text_lines = (start_ms, end_ms), []
+                continue
+
+            if timing is not None:
+                text_lines.append(line)
+            elif table.format == "vtt" and line.split(" ", 1)[0] in _VTT_BLOCKS:
+                skipping = True
+            # Иначе - номер реплики SRT или идентификатор реплики WebVTT
+
+        if table is not None:
+            flush()
+
+    table = table or CueTable(encoding)
+    if skipped:
+        logging.warning(f"Субтитры {path}: пропущено битых реплик: {skipped}")
+    return table.finish()
@@ -1,6 +1,8 @@
 import os
 import shutil
 
+from image_archive import is_archive
+
 def setup_folders():
     """Создаёт необходимые папки для работы программы"""
     folders = [
@@ -20,8 +22,9 @@ def validate_input_files(file_paths):
     file_paths: dict с ключами images_folder, audio_file, subtitles_file, output_file
     """
     ok = True
-    if not os.path.isdir(file_paths["images_folder"]):
-        print(f"❌ Папка с изображениями не найдена: {file_paths['images_folder']}")
+    images_folder = file_paths["images_folder"]
+    if not (os.path.isdir(images_folder) or is_archive(images_folder)):
+        print(f"❌ Папка или архив с изображениями не найдены: {images_folder}")
         ok = False
     if not os.path.isfile(file_paths["audio_file"]):
         print(f"❌ Аудиофайл не найден: {file_paths['audio_file']}")
@@ -32,11 +35,20 @@ def validate_input_files(file_paths):
             # Не критично, продолжаем без субтитров
     return ok
 
-def cleanup_temp_files():
-    """Удаляет все временные файлы из папки temp/"""
+def cleanup_temp_files(keep=("jobs", "catalog", "calibration", "audio")):
+    """
+    Удаляет временные файлы из папки temp/
+    keep: имена, которые не трогаем (в temp/jobs лежат контрольные точки
+    незавершенных задач - их удаляет сам VideoComposer после сборки видео,
+    в temp/catalog - индекс изображений и кеш подготовленных слайдов,
+    в temp/calibration - калибровка оценщика стоимости,
+    в temp/audio - параметры и громкость аудиофайлов)
+    """
     temp_folder = "temp"
     if os.path.isdir(temp_folder):
         for filename in os.listdir(temp_folder):
+            if filename in keep:
+                continue
             file_path = os.path.join(temp_folder, filename)
             try:
                 if os.path.isfile(file_path) or os.path.islink(file_path):
@@ -11,7 +11,7 @@
 import os
 import logging
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 import random
 
 # Импорт библиотек для работы с видео (MoviePy 2.2.1)
@@ -19,18 +19,55 @@ try:
     from moviepy import (
         VideoFileClip,
         ImageClip,
-        TextClip,
         AudioFileClip,
         CompositeVideoClip,
     )
     from moviepy import concatenate_videoclips, concatenate_audioclips
     from PIL import Image
-    import pysrt
+    import numpy as np
 except ImportError as e:
     print(f"Ошибка импорта библиотек: {e}")
-    print("Установите библиотеки: pip install moviepy pillow pysrt")
+    print("Установите библиотеки: pip install moviepy pillow")
     raise
 
+from slide_store import SlideStore, SlideStoreWriter
+from checkpoint import JobCheckpoint, job_id_for
+from audio_cache import AudioAnalysisCache
+from image_archive import open_image, source_size, split_member
+from image_catalog import ImageCatalog, PreparedSlideCache
+from governor import BudgetExceededError, JobGovernor, ResourceBudget
+from overlays import apply_overlays, burn_overlays, load_overlays, overlays_key
+from frame_renderer import (
+    FrameRenderer,
+    letterbox,
+    subtitle_clip,
+    subtitle_font,
+    zoom_frame,
+)
+from previews import write_previews
+from subtitles import load_subtitles_cached
+from workspace import DEFAULT_RAM_FOLDER, JobWorkspace, WorkspaceFullError
+from ffmpeg_tools import (
+    FramePipe,
+    FrameSpanWriter,
+    concat_segments,
+    copy_video_stream,
+    probe_media,
+    progressive_args,
+    remux_to_mp4,
+)
+from render_plan import (
+    PLAN_VERSION,
+    AudioOp,
+    EncoderProfile,
+    OverlaySpec,
+    RenderPlan,
+    SlidePlan,
+    SubtitleCue,
+    SubtitleStyle,
+    build_slides,
+)
+
 
 class VideoComposer:
     """
@@ -49,6 +86,62 @@ class VideoComposer:
         self.resolution = config.get("resolution", (1024, 768))
         self.image_duration = config.get("image_duration", 4.0)
         self.zoom_enabled = config.get("zoom_enabled", True)
+        self.zoom_factor = config.get("zoom_factor", 1.2)
+        self.random_zoom_direction = config.get("random_zoom_direction", True)
+        self.random_seed = config.get("random_seed")
+
+        # Наложения поверх видео (водяной знак, логотип, плашка)
+        self.overlays = config.get("overlays") or []
+
+        # Общее memory-mapped хранилище подготовленных слайдов
+        self.use_slide_store = config.get("use_slide_store", False)
+        self.slide_store_path = config.get("slide_store_path")
+
+        # Возобновляемый рендеринг по сегментам с контрольными точками
+        self.resumable_render = config.get("resumable_render", False)
+        self.segment_slides = config.get("segment_slides", 10)
+
+        # Рабочие папки задач (у каждой задачи своя временная папка)
+        self.jobs_folder = config.get("jobs_folder", "temp/jobs")
+        self.scratch_in_ram = config.get("scratch_in_ram", False)
+        self.ram_scratch_folder = config.get("ram_scratch_folder", DEFAULT_RAM_FOLDER)
+        self.scratch_size_limit = config.get("scratch_size_limit")
+        self.workspace: Optional[JobWorkspace] = None
+
+        # Каталог изображений с постоянным индексом и кеш подготовленных слайдов
+        self.image_formats = config.get(
+            "supported_image_formats", [".jpg", ".jpeg", ".png", ".bmp", ".tiff", ".tif"]
+        )
+        self.catalog_folder = config.get("image_catalog_folder", "temp/catalog")
+        self.slide_cache = config.get("slide_cache", False)
+        self.slide_cache_max_size = config.get("slide_cache_max_size")
+        self.catalog: Optional[ImageCatalog] = None
+
+        # Кеш параметров и громкости аудио по хешу содержимого
+        self.audio_cache_folder = config.get("audio_cache_folder", "temp/audio")
+        self.audio_loudness_analysis = config.get("audio_loudness_analysis", False)
+
+        # Видеоклипы на таймлайне вместе с изображениями
+        self.video_formats = config.get(
+            "supported_video_formats", [".mp4", ".mov", ".mkv", ".webm", ".avi", ".m4v"]
+        )
+        self.stream_copy_clips = config.get("stream_copy_clips", True)
+
+        # Бюджет ресурсов задачи (потоки, память, время)
+        self.governor = JobGovernor(ResourceBudget.from_config(config))
+
+        # Прогрессивный вывод (фрагментированный MP4 или HLS) во время рендеринга
+        self.progressive_output = config.get("progressive_output")
+        self.progressive_segment_duration = config.get(
+            "progressive_segment_duration", 2.0
+        )
+
+        # Переменная частота кадров: повторяющиеся кадры кодируются один раз
+        self.vfr_output = config.get("vfr_output", False)
+        self.vfr_min_static_share = config.get("vfr_min_static_share", 0.5)
+
+        # Постер и превью для перемотки (строятся по плану)
+        self.previews_enabled = config.get("previews_enabled", False)
 
         # Настройки для субтитров
         self.subtitle_fontsize = config.get("subtitle_fontsize", 50)
@@ -68,7 +161,7 @@ class VideoComposer:
         Главная функция создания видео
 
         Args:
-            images_folder: путь к папке с изображениями
+            images_folder: путь к папке с изображениями или к zip/tar-архиву
             audio_file: путь к аудиофайлу
             subtitles_file: путь к файлу субтитров (опционально)
             output_file: путь для сохранения готового видео
@@ -76,220 +169,1482 @@ class VideoComposer:
         Returns:
             bool: True если видео создано успешно, False если ошибка
         """
+        workspace = None
+        success = False
         try:
             logging.info("Начало создания видео")
+            self.governor.start()
+
+            job_id, seed = self.job_identity(
+                images_folder, audio_file, subtitles_file, output_file
+            )
 
-            # 1. Загружаем и обрабатываем изображения
-            print("📷 Обработка изображений...")
-            image_clips = self._process_images(images_folder)
-            if not image_clips:
+            # 1. Составляем план: находим файлы и принимаем все решения заранее
+            print("🗺️ Составление плана рендеринга...")
+            plan = self.build_plan(
+                images_folder, audio_file, subtitles_file, output_file, seed=seed
+            )
+            if not plan.slides:
                 logging.error("Не найдено изображений для обработки")
                 return False
 
-            # 2. Создаем видеопоследовательность из изображений
-            print("🎞️ Создание видеопоследовательности...")
-            video_clip = concatenate_videoclips(image_clips, method="compose")
+            # Подгоняем задачу под бюджет памяти до начала рендеринга
+            self.apply_budget(plan)
+
+            # 2. Исполняем план в собственной рабочей папке задачи
+            workspace = self.open_workspace(job_id)
+            self.workspace = workspace
+            if self.progressive_output:
+                # Прогрессивный вывод пишет один непрерывный поток,
+                # поэтому посегментные контрольные точки здесь не используются
+                success = self.render_plan(plan)
+            elif self.resumable_render or any(s.stream_copy for s in plan.slides):
+                # Клипы без перекодирования вставляются при склейке сегментов
+                success = self.render_plan_resumable(plan, workspace)
+            else:
+                success = self.render_plan(plan)
+
+            if success and self.previews_enabled:
+                self.write_previews(plan)
+            return success
+
+        except BudgetExceededError as e:
+            logging.error(f"Задача прервана ({e.status}): {e}")
+            print(f"⛔ Задача прервана, превышен бюджет ({e.status}): {e}")
+            return False
+
+        except Exception as e:
+            logging.error(f"Ошибка при создании видео: {e}", exc_info=True)
+            print(f"❌ Ошибка: {e}")
+            return False
+
+        finally:
+            # Данные задачи удаляются после успешной сборки, а при ошибке -
+            # если ее путь рендеринга не оставил контрольных точек
+            # (прогрессивный вывод, VFR и т.п. продолжить нельзя)
+            self.governor.stop()
+            self.workspace = None
+            if workspace is not None and (
+                success
+                or not self.resumable_render
+                or not JobCheckpoint.exists(str(workspace.path))
+            ):
+                workspace.cleanup()
+
+    def apply_budget(self, plan: RenderPlan, prefetch_frames: int = 0) -> int:
+        """
+        Подгоняет режим рендеринга под бюджет памяти задачи
+
+        Упрощения действуют только до конца задачи (см. JobGovernor.fit_memory),
+        настройки объекта не меняются: следующая задача начинает с них заново.
+
+        Args:
+            plan: план рендеринга
+            prefetch_frames: сколько кадров хотелось бы готовить заранее
+
+        Returns:
+            int: сколько кадров готовить заранее с учетом бюджета
+
+        Raises:
+            BudgetExceededError: если задача не влезает в бюджет
+        """
+        fit = self.governor.fit_memory(plan.resolution, len(plan.slides), prefetch_frames)
+        return fit["prefetch_frames"]
+
+    @property
+    def slide_store_enabled(self) -> bool:
+        """Слайды читаются из хранилища: по настройке или ради бюджета задачи"""
+        return self.use_slide_store or self.governor.use_slide_store
+
+    def job_identity(
+        self,
+        images_folder: str,
+        audio_file: Optional[str],
+        subtitles_file: Optional[str],
+        output_file: str,
+    ) -> Tuple[str, Optional[int]]:
+        """
+        Вычисляет идентификатор задачи и зерно для плана
+
+        Идентификатор одинаков для одинаковых входных данных,
+        поэтому повторный запуск находит свои контрольные точки.
+
+        Returns:
+            tuple: (идентификатор задачи, зерно или None)
+        """
+        job_id = job_id_for(
+            *[
+                os.path.abspath(path) if path else None
+                for path in (images_folder, audio_file, subtitles_file, output_file)
+            ],
+            self.config,
+        )
+
+        # Без явного зерна берем его из задачи: повторный запуск
+        # должен получить тот же план, иначе сегменты не совпадут
+        seed = self.random_seed
+        if seed is None and self.resumable_render:
+            seed = int(job_id[:8], 16)
+
+        return job_id, seed
+
+    def open_workspace(self, job_id: str) -> JobWorkspace:
+        """
+        Создает рабочую папку задачи по настройкам
+
+        Args:
+            job_id: идентификатор задачи
+
+        Returns:
+            JobWorkspace: рабочая папка задачи
+        """
+        return JobWorkspace(
+            job_id,
+            root=self.jobs_folder,
+            use_ram=self.scratch_in_ram,
+            ram_root=self.ram_scratch_folder,
+            size_limit=self.scratch_size_limit,
+        )
+
+    def build_plan(
+        self,
+        images_folder: str,
+        audio_file: Optional[str],
+        subtitles_file: Optional[str] = None,
+        output_file: str = "output/result.mp4",
+        seed: Optional[int] = None,
+    ) -> RenderPlan:
+        """
+        Компилирует настройки и входные файлы в план рендеринга
+
+        Args:
+            images_folder: путь к папке с изображениями или к zip/tar-архиву
+            audio_file: путь к аудиофайлу (или None)
+            subtitles_file: путь к файлу субтитров (опционально)
+            output_file: путь для сохранения готового видео
+            seed: зерно для выбора направления зума (по умолчанию из config)
+
+        Returns:
+            RenderPlan: неизменяемый план рендеринга
+        """
+        image_files = self._find_images(images_folder)
+
+        cues = ()
+        if subtitles_file and os.path.exists(subtitles_file):
+            cues = self._load_subtitle_cues(subtitles_file)
+
+        audio_info = self._probe_audio(audio_file) if audio_file else None
+        audio_duration = audio_info["duration"] if audio_info else None
+        image_files, videos = self._probe_videos(image_files)
+
+        return self.compile_plan(
+            image_files,
+            cues,
+            audio_file,
+            audio_duration,
+            output_file,
+            seed,
+            videos,
+            audio_info,
+        )
+
+    def compile_plan(
+        self,
+        image_files: List[Path],
+        cues: Tuple[SubtitleCue, ...],
+        audio_file: Optional[str],
+        audio_duration: Optional[float],
+        output_file: str,
+        seed: Optional[int] = None,
+        videos: Optional[Dict[str, dict]] = None,
+        audio_info: Optional[dict] = None,
+    ) -> RenderPlan:
+        """
+        Собирает план из уже найденных и разобранных входных данных
+
+        Не обращается к файлам, поэтому один и тот же разбор входных
+        данных можно скомпилировать под несколько разных настроек.
+
+        Args:
+            image_files: изображения в порядке показа
+            cues: реплики субтитров
+            audio_file: путь к аудиофайлу (или None)
+            audio_duration: длительность аудио (None - аудио нет или не читается)
+            output_file: путь для сохранения готового видео
+            seed: зерно для выбора направления зума (по умолчанию из config)
+            videos: параметры видеоклипов среди image_files (см. _probe_videos)
+            audio_info: параметры и громкость аудио (см. _probe_audio)
 
-            # 3. Загружаем и добавляем аудио
+        Returns:
+            RenderPlan: неизменяемый план рендеринга
+        """
+        videos = videos or {}
+        encoder = EncoderProfile.from_config(self.config)
+
+        # Направление зума выбирается здесь, а не во время рендеринга
+        rng = random.Random(self.random_seed if seed is None else seed)
+        zoom_directions = []
+        for image_file in image_files:
+            if str(image_file) in videos or not self.zoom_enabled:
+                zoom_directions.append(None)
+            elif self.random_zoom_direction:
+                zoom_directions.append(rng.choice([True, False]))
+            else:
+                zoom_directions.append(True)
+
+        clips = {
+            path: {
+                "duration": info["duration"],
+                "stream_copy": self._can_stream_copy(info, encoder),
+            }
+            for path, info in videos.items()
+        }
+        slides = build_slides(
+            image_files, self.image_duration, zoom_directions, self.zoom_factor, clips
+        )
+
+        overlays = tuple(OverlaySpec.from_config(item) for item in self.overlays)
+
+        # Поверх копируемого клипа нельзя наложить субтитры и наложения -
+        # его придется декодировать
+        slides = tuple(
+            SlidePlan(**dict(slide.to_dict(), stream_copy=False))
+            if slide.stream_copy
+            and (
+                any(cue.end > slide.start and cue.start < slide.end for cue in cues)
+                or any(overlay.visible(slide.start, slide.end) for overlay in overlays)
+            )
+            else slide
+            for slide in slides
+        )
+
+        audio_ops = self._plan_audio(
+            audio_file, audio_duration, slides[-1].end if slides else 0.0, audio_info
+        )
+
+        # Последний кадр клипа держится до конца аудио - копированием
+        # потока такой клип не получить
+        if any(op.op == "extend_video" for op in audio_ops) and slides[-1].stream_copy:
+            slides = slides[:-1] + (SlidePlan(**dict(slides[-1].to_dict(), stream_copy=False)),)
+
+        return RenderPlan(
+            version=PLAN_VERSION,
+            resolution=tuple(self.resolution),
+            fps=self.fps,
+            slides=slides,
+            cues=cues,
+            subtitle_style=SubtitleStyle.from_config(self.config),
+            overlays=overlays,
+            audio=audio_ops,
+            encoder=encoder,
+            output_file=output_file,
+        )
+
+    def _probe_videos(
+        self, image_files: List[Path]
+    ) -> Tuple[List[Path], Dict[str, dict]]:
+        """
+        Читает параметры видеоклипов среди входных файлов (без декодирования)
+
+        Клип, который не удалось прочитать, убирается из списка: иначе
+        он попал бы в план как изображение.
+
+        Args:
+            image_files: изображения и видеоклипы в порядке показа
+
+        Returns:
+            tuple: (файлы без нечитаемых клипов, путь -> параметры из probe_media)
+        """
+        video_formats = {ext.lower() for ext in self.video_formats}
+        files = []
+        videos = {}
+        skipped = 0
+        for path in image_files:
+            if path.suffix.lower() not in video_formats:
+                files.append(path)
+                continue
+            try:
+                info = probe_media(str(path))
+                if not info["video_codec"] or not info["duration"]:
+                    raise RuntimeError("нет видеодорожки или длительности")
+                videos[str(path)] = info
+                files.append(path)
+            except Exception as e:
+                skipped += 1
+                logging.warning(f"Видеоклип пропущен {path}: {e}")
+
+        if skipped:
+            print(f"⚠️ Пропущено нечитаемых видеоклипов: {skipped}")
+        return files, videos
+
+    def _can_stream_copy(self, info: dict, encoder: EncoderProfile) -> bool:
+        """
+        Совпадает ли клип с выходом настолько, чтобы вставить его без перекодирования
+
+        Args:
+            info: параметры клипа из probe_media
+            encoder: профиль кодирования выхода
+
+        Returns:
+            bool: True если клип можно копировать как есть
+        """
+        if not self.stream_copy_clips:
+            return False
+
+        # Имена кодировщиков FFmpeg и кодеков в заголовках различаются
+        codec_names = {"libx264": "h264", "libx265": "hevc", "libvpx-vp9": "vp9"}
+        return (
+            info["video_codec"] == codec_names.get(encoder.codec, encoder.codec)
+            and (info["width"], info["height"]) == tuple(self.resolution)
+            and info["fps"] is not None
+            and abs(info["fps"] - self.fps) < 0.01
+            and info["pix_fmt"] == "yuv420p"
+        )
+
+    def render_plan(self, plan: RenderPlan) -> bool:
+        """
+        Рендерит видео по готовому плану
+
+        Если рабочая папка задачи еще не открыта (план пришел из другого
+        процесса), создается временная папка, которая удаляется после рендеринга.
+
+        Args:
+            plan: план рендеринга (например, из build_plan или RenderPlan.load)
+
+        Returns:
+            bool: True если видео создано успешно
+        """
+        if self.workspace is not None:
+            return self._render(plan)
+
+        self.workspace = self.open_workspace(plan.fingerprint()[:16])
+        try:
+            return self._render(plan)
+        finally:
+            self.workspace.cleanup()
+            self.workspace = None
+
+    def _render(self, plan: RenderPlan) -> bool:
+        """Рендерит план в уже открытой рабочей папке"""
+        if (
+            len(plan.slides) == 1
+            and plan.slides[0].stream_copy
+            and plan.audio_source is None
+            and not plan.cues
+        ):
+            # Сегмент из одного совпадающего клипа: копируем без декодирования
+            slide = plan.slides[0]
+            print(f"📼 Клип без перекодирования: {Path(slide.source).name}")
+            copy_video_stream(slide.source, plan.output_file, plan.final_duration)
+            return True
+
+        if self.progressive_output:
+            return self._render_progressive(plan)
+
+        if self.vfr_output:
+            spans = self._vfr_spans(plan)
+            if spans is not None:
+                return self._render_vfr(plan, spans)
+
+        video_clip = self._compose_clip(plan)
+        if video_clip is None:
+            return False
+
+        # 5. Сохраняем итоговое видео
+        print("💾 Сохранение видео...")
+        self._save_video(
+            self.governor.governed(video_clip), plan.output_file, plan.encoder, plan.fps
+        )
+
+        logging.info(f"Видео успешно создано: {plan.output_file}")
+        return True
+
+    def _render_progressive(self, plan: RenderPlan) -> bool:
+        """
+        Рендерит план с прогрессивной записью результата
+
+        Режим 'fmp4' пишет фрагментированный MP4 прямо в итоговый файл:
+        его можно смотреть, пока он дописывается, и он остается обычным
+        самостоятельным MP4. Режим 'hls' пишет сегменты и плейлист,
+        который обновляется после каждого сегмента, а по окончании
+        собирает из них итоговый MP4 без перекодирования.
+
+        Args:
+            plan: план рендеринга
+
+        Returns:
+            bool: True если видео создано успешно
+        """
+        mode = self.progressive_output
+        video_clip = self._compose_clip(plan, with_audio=False)
+        if video_clip is None:
+            return False
+
+        if mode == "hls":
+            base, _ = os.path.splitext(plan.output_file)
+            hls_dir = f"{base}_hls"
+            os.makedirs(hls_dir, exist_ok=True)
+            target_file = os.path.join(hls_dir, "playlist.m3u8")
+        else:
+            hls_dir = ""
+            target_file = plan.output_file
+
+        extra_args = progressive_args(mode, self.progressive_segment_duration, hls_dir)
+        duration = plan.final_duration
+        audio = plan.audio_source
+
+        print(f"📡 Прогрессивная запись ({mode}): {target_file}")
+        logging.info(f"Прогрессивная запись ({mode}): {target_file}")
+        try:
+            with FramePipe(
+                plan.resolution,
+                plan.fps,
+                [(target_file, plan.encoder, extra_args)],
+                audio_file=audio.param("path") if audio else None,
+                duration=duration,
+                threads=self.governor.encoder_threads,
+            ) as pipe:
+                self.governor.track(pipe.process.pid)
+                frames = video_clip.subclipped(0, duration).iter_frames(
+                    fps=plan.fps, dtype="uint8"
+                )
+                for frame in frames:
+                    self.governor.check()
+                    pipe.write(frame)
+        finally:
+            video_clip.close()
+
+        if mode == "hls":
+            print("🔗 Сборка итогового MP4 из сегментов HLS...")
+            remux_to_mp4(target_file, plan.output_file)
+
+        print(f"✅ Видео сохранено: {plan.output_file}")
+        logging.info(f"Видео успешно создано: {plan.output_file}")
+        return True
+
+    def _vfr_spans(self, plan: RenderPlan) -> Optional[List[Tuple[int, int]]]:
+        """
+        Серии одинаковых кадров плана для VFR (None - VFR не окупится)
+
+        Args:
+            plan: план рендеринга
+
+        Returns:
+            list: пары (номер первого кадра, число кадров) или None
+        """
+        spans = plan.frame_spans()
+        total = sum(count for _, count in spans)
+        if not total:
+            return None
+
+        static_share = 1.0 - len(spans) / total
+        if static_share < self.vfr_min_static_share:
+            print(
+                f"🎞️ Повторяющихся кадров {static_share:.0%} - видео пишется "
+                "с постоянной частотой кадров"
+            )
+            logging.info(f"VFR не используется: повторяющихся кадров {static_share:.0%}")
+            return None
+
+        # Последний кадр - отдельно: по его метке времени контейнер узнает,
+        # где заканчивается видео
+        first, count = spans[-1]
+        if count > 1:
+            spans[-1:] = [(first, count - 1), (first + count - 1, 1)]
+        return spans
+
+    def _render_vfr(self, plan: RenderPlan, spans: List[Tuple[int, int]]) -> bool:
+        """
+        Рендерит план с переменной частотой кадров
+
+        Из каждой серии одинаковых кадров рендерится и кодируется только
+        первый кадр, остальные заменяет его длительность.
+
+        Args:
+            plan: план рендеринга
+            spans: серии одинаковых кадров (см. RenderPlan.frame_spans)
+
+        Returns:
+            bool: True если видео создано успешно
+        """
+        video_clip = self._compose_clip(plan, with_audio=False)
+        if video_clip is None:
+            return False
+
+        width, height = plan.resolution
+        total = sum(count for _, count in spans)
+        self.workspace.reserve(len(spans) * width * height * 3, "кадры VFR")
+        audio = plan.audio_source
+
+        print(f"💾 Сохранение видео (VFR): {len(spans)} кадров вместо {total}...")
+        logging.info(f"VFR: {len(spans)} уникальных кадров из {total}")
+        try:
+            with FrameSpanWriter(
+                self.workspace.subdir("vfr"),
+                plan.resolution,
+                plan.fps,
+                plan.output_file,
+                plan.encoder,
+                audio_file=audio.param("path") if audio else None,
+                duration=plan.final_duration,
+                threads=self.governor.encoder_threads,
+            ) as writer:
+                for first, count in spans:
+                    self.governor.check()
+                    frame = video_clip.get_frame(first / plan.fps)
+                    writer.write(np.asarray(frame, dtype=np.uint8), count)
+        finally:
+            video_clip.close()
+
+        print(f"✅ Видео сохранено: {plan.output_file}")
+        logging.info(f"Видео успешно создано: {plan.output_file}")
+        return True
+
+    def _compose_clip(
+        self,
+        plan: RenderPlan,
+        store: Optional[SlideStore] = None,
+        with_audio: bool = True,
+    ):
+        """
+        Собирает из плана итоговый клип MoviePy (без записи в файл)
+
+        Args:
+            plan: план рендеринга
+            store: готовые слайды нужного разрешения (опционально)
+            with_audio: добавлять ли аудиодорожку
+
+        Returns:
+            итоговый видеоклип или None, если слайдов нет
+        """
+        # 1. Загружаем и обрабатываем изображения
+        print("📷 Обработка изображений...")
+        image_clips = self._create_slide_clips(plan, store)
+        if not image_clips:
+            logging.error("Не найдено изображений для обработки")
+            return None
+
+        # 2. Создаем видеопоследовательность из изображений
+        print("🎞️ Создание видеопоследовательности...")
+        # Все слайды уже ровно размером с кадр: "compose" добавил бы каждому
+        # слайду маску float64 размером с кадр и композитинг на каждом кадре
+        video_clip = concatenate_videoclips(image_clips, method="chain")
+
+        # Длительность - по плану, с аудиодорожкой или без: все способы
+        # записи должны дать видео одной длины
+        video_clip = self._fit_duration(video_clip, plan)
+
+        # 3. Загружаем и добавляем аудио
+        if plan.audio and with_audio:
             print("🎵 Добавление аудиодорожки...")
-            video_clip = self._add_audio(video_clip, audio_file)
+            video_clip = self._add_audio(video_clip, plan)
+
+        # 4. Добавляем субтитры (если есть)
+        if plan.cues:
+            print("📝 Добавление субтитров...")
+            video_clip = self._add_subtitles(video_clip, plan)
+
+        return video_clip
+
+    def _fit_duration(self, video_clip, plan: RenderPlan):
+        """
+        Подгоняет длительность видеоряда под план (см. RenderPlan.final_duration)
+
+        Args:
+            video_clip: склеенный видеоряд
+            plan: план рендеринга
+
+        Returns:
+            видеоклип длительностью plan.final_duration
+        """
+        final_duration = plan.final_duration
+        if final_duration < video_clip.duration:
+            print(f"🎞️ Видео обрезано до {final_duration:.1f} секунд")
+            return video_clip.subclipped(0, final_duration)
+
+        if final_duration > video_clip.duration:
+            # Склейка "chain" не отдает кадры после своего конца, поэтому
+            # время после него сводится к последнему моменту видеоряда
+            last_moment = video_clip.duration - 1e-6
+            print(f"🎞️ Последний кадр держится до {final_duration:.1f} секунд")
+            return video_clip.time_transform(
+                lambda t: np.minimum(t, last_moment), apply_to=[]
+            ).with_duration(final_duration)
+
+        return video_clip
+
+    def render_plan_resumable(self, plan: RenderPlan, workspace: JobWorkspace) -> bool:
+        """
+        Рендерит план по сегментам с контрольными точками
+
+        Готовые сегменты и манифест хранятся в рабочей папке задачи.
+        Повторный вызов с тем же планом пропускает готовые сегменты.
+        Рабочая папка удаляется только после успешной финальной сборки.
+
+        Args:
+            plan: план рендеринга
+            workspace: рабочая папка задачи
+
+        Returns:
+            bool: True если видео создано успешно
+        """
+        self.workspace = workspace
+        checkpoint = JobCheckpoint(str(workspace.path), plan)
+        ranges = plan.split(self.segment_slides)
+
+        if checkpoint.completed:
+            print(
+                f"♻️ Продолжаем рендеринг: готово {checkpoint.completed}/{len(ranges)} сегментов"
+            )
+            logging.info(f"Возобновление задачи из {workspace.path}")
+
+        # Хранилище слайдов готовится сразу для всего плана: сегменты
+        # открывают его, а не пересобирают каждый под свои слайды
+        if self.slide_store_enabled and checkpoint.completed < len(ranges):
+            self._open_slide_store(plan).close()
+
+        for number, (first, last) in enumerate(ranges):
+            if checkpoint.is_done(number):
+                continue
+
+            print(f"🧩 Сегмент {number + 1}/{len(ranges)}...")
+            segment_file = checkpoint.segment_path(number)
+            partial_file = f"{segment_file}.part.mp4"
+            segment_plan = plan.segment(first, last, partial_file)
+
+            # Проверяем место заранее, чтобы не заполнить диск посреди сегмента
+            workspace.reserve(
+                segment_plan.encoder.estimated_bytes(segment_plan.final_duration, False),
+                f"сегмент {number + 1}",
+            )
+
+            if not self.render_plan(segment_plan):
+                return False
+
+            # Сегмент попадает в манифест только целиком
+            os.replace(partial_file, segment_file)
+            checkpoint.mark_done(number)
+
+        print("🔗 Сборка итогового видео...")
+        audio = plan.audio_source
+        partial_output = f"{plan.output_file}.part.mp4"
+        concat_segments(
+            [checkpoint.segment_path(number) for number in range(len(ranges))],
+            partial_output,
+            workspace.file("concat.txt"),
+            audio_file=audio.param("path") if audio else None,
+            duration=plan.final_duration,
+            audio_codec=plan.encoder.audio_codec,
+            audio_bitrate=plan.encoder.audio_bitrate,
+        )
+        os.replace(partial_output, plan.output_file)
+
+        # Только теперь временные данные задачи больше не нужны
+        workspace.cleanup()
+
+        print(f"✅ Видео сохранено: {plan.output_file}")
+        logging.info(f"Видео успешно создано: {plan.output_file}")
+        return True
+
+    def create_videos(
+        self,
+        images_folder: str,
+        audio_file: str,
+        subtitles_file: Optional[str],
+        targets: List[dict],
+    ) -> Dict[str, bool]:
+        """
+        Создает несколько вариантов видео за один проход
+
+        Все, что не зависит от разрешения, делается один раз: поиск
+        изображений, их декодирование, разбор субтитров и чтение аудио.
+        Каждое изображение декодируется один раз и сразу вписывается во
+        все нужные разрешения. Варианты с одинаковым видеорядом (отличаются
+        только кодированием) рендерятся один раз и кодируются одним
+        процессом FFmpeg сразу в несколько файлов.
+
+        Args:
+            images_folder: путь к папке с изображениями
+            audio_file: путь к аудиофайлу
+            subtitles_file: путь к файлу субтитров (опционально)
+            targets: варианты - словари с ключами name, config, output_file
+                (см. config.get_output_targets)
+
+        Returns:
+            dict: имя варианта -> True если видео создано успешно
+        """
+        results = {target["name"]: False for target in targets}
+        workspace = None
+        try:
+            logging.info(f"Начало создания {len(targets)} вариантов видео")
+            self.governor.start()
+
+            # 1. Общая для всех вариантов подготовка входных данных
+            print("🗺️ Составление планов рендеринга...")
+            image_files = self._find_images(images_folder)
+            if not image_files:
+                return results
 
-            # 4. Добавляем субтитры (если есть)
+            cues = ()
             if subtitles_file and os.path.exists(subtitles_file):
-                print("📝 Добавление субтитров...")
-                video_clip = self._add_subtitles(video_clip, subtitles_file)
+                cues = self._load_subtitle_cues(subtitles_file)
+
+            audio_info = self._probe_audio(audio_file) if audio_file else None
+            audio_duration = audio_info["duration"] if audio_info else None
+
+            image_files, videos = self._probe_videos(image_files)
+            if not image_files:
+                return results
+
+            # Одно зерно для всех вариантов, чтобы зум совпадал
+            seed = self.random_seed
+            if seed is None:
+                seed = random.randrange(2**32)
+
+            plans = {}
+            for target in targets:
+                composer = VideoComposer(target["config"])
+                plans[target["name"]] = composer.compile_plan(
+                    image_files,
+                    cues,
+                    audio_file,
+                    audio_duration,
+                    target["output_file"],
+                    seed,
+                    videos,
+                    audio_info,
+                )
 
-            # 5. Сохраняем итоговое видео
-            print("💾 Сохранение видео...")
-            self._save_video(video_clip, output_file)
+            workspace = self.open_workspace(
+                job_id_for(
+                    os.path.abspath(images_folder),
+                    [target["output_file"] for target in targets],
+                )
+            )
+            self.workspace = workspace
 
-            logging.info(f"Видео успешно создано: {output_file}")
-            return True
+            # 2. Декодируем каждое изображение один раз для всех разрешений
+            print("📷 Подготовка слайдов для всех разрешений...")
+            stores = self._build_shared_slide_stores(
+                [path for path in image_files if str(path) not in videos],
+                {plan.resolution for plan in plans.values()},
+            )
+
+            # 3. Варианты с одинаковым видеорядом рендерим вместе
+            groups: Dict[str, List[str]] = {}
+            for name, plan in plans.items():
+                frames_key = plan.with_changes(encoder=None, output_file="").fingerprint()
+                groups.setdefault(frames_key, []).append(name)
+
+            for names in groups.values():
+                group_plans = [plans[name] for name in names]
+                print(f"🎬 Рендеринг: {', '.join(names)}")
+                try:
+                    store = stores[group_plans[0].resolution]
+                    self._render_fanout(group_plans, store)
+                    for name in names:
+                        results[name] = True
+                        if self.previews_enabled:
+                            self.write_previews(plans[name], store)
+                except BudgetExceededError:
+                    raise
+                except Exception as e:
+                    logging.error(f"Ошибка рендеринга {names}: {e}", exc_info=True)
+                    print(f"❌ Ошибка: {e}")
+
+            return results
+
+        except BudgetExceededError as e:
+            logging.error(f"Задача прервана ({e.status}): {e}")
+            print(f"⛔ Задача прервана, превышен бюджет ({e.status}): {e}")
+            return results
 
         except Exception as e:
             logging.error(f"Ошибка при создании видео: {e}", exc_info=True)
             print(f"❌ Ошибка: {e}")
-            return False
+            return results
 
-    def _process_images(self, images_folder: str) -> List:
+        finally:
+            self.governor.stop()
+            self.workspace = None
+            if workspace is not None:
+                workspace.cleanup()
+
+    def _build_shared_slide_stores(
+        self, image_files: List[Path], resolutions
+    ) -> Dict[Tuple[int, int], SlideStore]:
         """
-        Обрабатывает все изображения в папке и создает видеоклипы
+        Декодирует каждое изображение один раз и вписывает во все разрешения
 
         Args:
-            images_folder: путь к папке с изображениями
+            image_files: изображения в порядке показа
+            resolutions: набор разрешений (ширина, высота)
 
         Returns:
-            List: список видеоклипов из изображений
+            dict: разрешение -> хранилище слайдов
         """
-        # Поддерживаемые форматы изображений
-        image_extensions = [".jpg", ".jpeg", ".png", ".bmp", ".tiff"]
+        resolutions = sorted(set(resolutions))
+        self.workspace.reserve(
+            sum(len(image_files) * width * height * 3 for width, height in resolutions),
+            "хранилища слайдов",
+        )
+
+        writers = {
+            resolution: SlideStoreWriter(
+                self.workspace.file(f"slides_{resolution[0]}x{resolution[1]}.bin")
+            )
+            for resolution in resolutions
+        }
+
+        for image_file in image_files:
+            self.governor.check()
+            try:
+                key = self._slide_key(image_file)
+                with open_image(image_file) as img:
+                    img = img.convert("RGB")
+                    for resolution, writer in writers.items():
+                        pixels = np.asarray(letterbox(img, resolution))
+                        writer.add(str(image_file), pixels, key)
+            except Exception as e:
+                logging.warning(f"Ошибка подготовки слайда {image_file}: {e}")
 
-        # Находим все изображения в папке
-        image_files = []
-        folder_path = Path(images_folder)
+        return {resolution: writer.finish() for resolution, writer in writers.items()}
 
-        for ext in image_extensions:
-            image_files.extend(folder_path.glob(f"*{ext}"))
-            image_files.extend(folder_path.glob(f"*{ext.upper()}"))
+    def _render_fanout(self, plans: List[RenderPlan], store: SlideStore):
+        """
+        Рендерит общий видеоряд один раз и кодирует его в несколько файлов
+
+        Args:
+            plans: планы с одинаковым видеорядом (отличаются кодированием)
+            store: готовые слайды нужного разрешения
+        """
+        plan = plans[0]
+        video_clip = self._compose_clip(plan, store=store, with_audio=False)
+        if video_clip is None:
+            raise RuntimeError("Нет слайдов для рендеринга")
 
-        # Сортируем файлы по имени
-        image_files.sort()
+        duration = plan.final_duration
+        audio = plan.audio_source
+        outputs = [(f"{item.output_file}.part.mp4", item.encoder) for item in plans]
+
+        print(f"💾 Кодирование в {len(outputs)} файл(ов)...")
+        try:
+            with FramePipe(
+                plan.resolution,
+                plan.fps,
+                outputs,
+                audio_file=audio.param("path") if audio else None,
+                duration=duration,
+                threads=self.governor.encoder_threads,
+            ) as pipe:
+                self.governor.track(pipe.process.pid)
+                frames = video_clip.subclipped(0, duration).iter_frames(
+                    fps=plan.fps, dtype="uint8"
+                )
+                for frame in frames:
+                    self.governor.check()
+                    pipe.write(frame)
+        finally:
+            video_clip.close()
+
+        for item in plans:
+            os.replace(f"{item.output_file}.part.mp4", item.output_file)
+            print(f"✅ Видео сохранено: {item.output_file}")
+            logging.info(f"Видео успешно создано: {item.output_file}")
+
+    def write_previews(
+        self, plan: RenderPlan, store: Optional[SlideStore] = None
+    ) -> Optional[dict]:
+        """
+        Создает постер, листы миниатюр и индекс WebVTT рядом с видео
+
+        Кадры строятся по плану из подготовленных слайдов (хранилище,
+        кеш слайдов или заново вписанное изображение) с зумом на нужный
+        момент. Ошибка превью не считается ошибкой видео.
+
+        Args:
+            plan: план отрендеренного видео
+            store: готовые слайды разрешения плана (опционально)
+
+        Returns:
+            dict: пути к файлам превью (см. previews.write_previews) или None
+        """
+        resolution = tuple(plan.resolution)
+
+        def canvas(slide: SlidePlan) -> np.ndarray:
+            pixels = store.find(slide.source) if store is not None else None
+            if pixels is None and self.slide_cache:
+                pixels = self._cached_slide(slide.source, resolution)
+            if pixels is None:
+                with open_image(slide.source) as img:
+                    pixels = np.asarray(letterbox(img, resolution), dtype=np.uint8)
+            return pixels
+
+        try:
+            print("🖼️ Создание постера и превью...")
+            previews = write_previews(
+                FrameRenderer(plan, canvas),
+                plan.output_file,
+                plan.final_duration,
+                interval=self.config.get("preview_interval", 2.0),
+                thumb_width=self.config.get("preview_thumb_width", 160),
+                columns=self.config.get("preview_sheet_columns", 10),
+                rows=self.config.get("preview_sheet_rows", 10),
+                image_format=self.config.get("preview_format", "jpg"),
+                quality=self.config.get("preview_quality", 80),
+                poster_time=self.config.get("preview_poster_time"),
+            )
+            print(f"🖼️ Превью сохранены: {previews['index']}")
+            return previews
+
+        except (WorkspaceFullError, BudgetExceededError):
+            raise
+
+        except Exception as e:
+            logging.warning(f"Ошибка создания превью {plan.output_file}: {e}")
+            print(f"⚠️ Превью не созданы: {e}")
+            return None
+
+    def _find_images(self, images_folder: str) -> List[Path]:
+        """
+        Находит все изображения в папке (или в zip/tar-архиве)
+
+        Args:
+            images_folder: путь к папке с изображениями или к архиву
+
+        Returns:
+            List[Path]: отсортированный список изображений
+        """
+        # Каталог той же папки переиспользуем (например, в режиме наблюдения)
+        catalog = self.catalog
+        if catalog is None or catalog.folder != os.path.abspath(images_folder):
+            catalog = ImageCatalog(
+                images_folder,
+                self.image_formats + self.video_formats,
+                index_folder=self.catalog_folder,
+                video_extensions=self.video_formats,
+            )
+            self.catalog = catalog
+
+        # Один проход по папке, естественная сортировка имен (img2 раньше img10)
+        catalog.scan()
+        image_files = catalog.files
+
+        # Нечитаемый файл в план не попадает: иначе его слайд выпал бы
+        # из видеоряда уже при рендеринге и сдвинул все следующие
+        if catalog.broken:
+            print(f"⚠️ Пропущено нечитаемых файлов: {len(catalog.broken)}")
+            logging.warning(f"Нечитаемые файлы пропущены: {', '.join(catalog.broken)}")
 
         if not image_files:
             print(f"❌ Изображения не найдены в папке: {images_folder}")
-            return []
+        else:
+            print(f"📷 Найдено изображений: {len(image_files)}")
+
+        return image_files
+
+    def _create_slide_clips(
+        self, plan: RenderPlan, store: Optional[SlideStore] = None
+    ) -> List:
+        """
+        Создает видеоклипы для всех слайдов плана
+
+        Args:
+            plan: план рендеринга
+            store: готовые слайды нужного разрешения (опционально)
 
-        print(f"📷 Найдено изображений: {len(image_files)}")
+        Returns:
+            List: список видеоклипов из изображений
+        """
+        if store is None and self.slide_store_enabled:
+            # Готовим все слайды один раз и читаем их из общего хранилища
+            store = self._open_slide_store(plan)
+
+        # Разрешение и частота - из плана, а не из настроек: план мог быть
+        # составлен в другом процессе или для другого варианта
+        resolution = tuple(plan.resolution)
+        fps = plan.fps
+
+        # Наложения декодируются один раз на процесс и разрешение
+        layers = load_overlays(plan.overlays, resolution)
 
         clips = []
-        for i, image_file in enumerate(image_files):
-            print(f"   Обработка {i+1}/{len(image_files)}: {image_file.name}")
+        total = len(plan.slides)
+        for i, slide in enumerate(plan.slides):
+            print(f"   Обработка {i+1}/{total}: {Path(slide.source).name}")
+            self.governor.check()
+
+            # Наложения, видимые весь показ слайда без зума, впекаются
+            # в его кадр; остальные смешиваются покадрово
+            visible = [
+                layer for layer in layers if layer.spec.visible(slide.start, slide.end)
+            ]
+            burned = []
+            if not slide.is_video and not slide.has_zoom:
+                burned = [
+                    layer for layer in visible if layer.spec.covers(slide.start, slide.end)
+                ]
 
             try:
-                # Создаем клип из изображения
-                clip = self._create_image_clip(str(image_file))
-                if clip:
-                    clips.append(clip)
+                if slide.is_video:
+                    clip = self._create_video_clip(slide, resolution, fps)
+                else:
+                    # Создаем клип из изображения
+                    pixels = store.find(slide.source) if store is not None else None
+                    clip = self._create_image_clip(slide, resolution, fps, pixels, burned)
+
+            except (WorkspaceFullError, BudgetExceededError):
+                # Нехватка места или бюджета - не ошибка отдельного слайда,
+                # прерываем задачу
+                raise
 
             except Exception as e:
-                logging.warning(f"Ошибка обработки {image_file}: {e}")
-                continue
+                logging.warning(f"Ошибка обработки {slide.source}: {e}")
+                clip = None
+
+            if clip is None:
+                # Слайд остается на своем месте в плане: без него сдвинулись бы
+                # все следующие слайды, субтитры и длительность видео
+                print(f"⚠️ Слайд не прочитан, вместо него черный кадр: {Path(slide.source).name}")
+                clip = self._placeholder_clip(slide, resolution, fps, burned)
+
+            dynamic = [layer for layer in visible if layer not in burned]
+            clips.append(apply_overlays(clip, dynamic, slide.start))
 
         return clips
 
-    def _create_image_clip(self, image_path: str):
+    def _placeholder_clip(
+        self, slide: SlidePlan, resolution: Tuple[int, int], fps: float, burned=()
+    ):
+        """
+        Черный кадр на место слайда, который не удалось прочитать
+
+        Args:
+            slide: слайд плана рендеринга
+            resolution: разрешение кадра (ширина, высота)
+            fps: частота кадров
+            burned: слои наложений, которые впекаются в кадр слайда
+
+        Returns:
+            ImageClip: клип длительностью слайда
+        """
+        width, height = resolution
+        pixels = np.zeros((height, width, 3), dtype=np.uint8)
+        if burned:
+            pixels = burn_overlays(pixels, burned)
+        return ImageClip(pixels, duration=slide.duration).with_fps(fps)
+
+    def _create_image_clip(
+        self,
+        slide: SlidePlan,
+        resolution: Tuple[int, int],
+        fps: float,
+        pixels: Optional[np.ndarray] = None,
+        burned=(),
+    ):
         """
         Создает видеоклип из одного изображения с возможным эффектом зума
 
         Args:
-            image_path: путь к изображению
+            slide: слайд плана рендеринга
+            resolution: разрешение кадра (ширина, высота)
+            fps: частота кадров
+            pixels: уже подготовленный кадр (например, из SlideStore)
+            burned: слои наложений, которые впекаются в кадр слайда
 
         Returns:
             ImageClip: готовый видеоклип
         """
         try:
             # Загружаем изображение и подгоняем под нужный размер
-            resized_image = self._resize_image(image_path)
+            if pixels is not None and burned:
+                pixels = burn_overlays(pixels, burned)
+            elif pixels is None and self.slide_cache:
+                pixels = self._cached_slide(slide.source, resolution, burned)
+
+            if pixels is None and burned:
+                image = np.asarray(
+                    self._letterbox_image(slide.source, resolution), dtype=np.uint8
+                )
+                pixels = burn_overlays(image, burned)
+
+            if pixels is not None:
+                resized_image = pixels
+            else:
+                resized_image = self._resize_image(slide.source, resolution)
 
             # Создаем базовый клип с указанием длительности
-            clip = ImageClip(resized_image, duration=self.image_duration)
+            clip = ImageClip(resized_image, duration=slide.duration)
 
             # Устанавливаем FPS через with_fps (новый API MoviePy 2.2.1)
-            clip = clip.with_fps(self.fps)
+            clip = clip.with_fps(fps)
 
-            # Добавляем эффект зума (если включен)
-            if self.zoom_enabled:
-                clip = self._add_zoom_effect(clip)
+            # Добавляем эффект зума (если он есть в плане)
+            if slide.has_zoom:
+                clip = self._add_zoom_effect(clip, slide)
 
             return clip
 
+        except (WorkspaceFullError, BudgetExceededError):
+            raise
+
         except Exception as e:
-            logging.error(f"Ошибка создания клипа из {image_path}: {e}")
+            logging.error(f"Ошибка создания клипа из {slide.source}: {e}")
             return None
 
-    def _resize_image(self, image_path: str) -> str:
+    def _create_video_clip(
+        self, slide: SlidePlan, resolution: Tuple[int, int], fps: float
+    ):
         """
-        Изменяет размер изображения под заданное разрешение с сохранением пропорций
+        Создает клип из видеофайла
+
+        Кадры читаются из FFmpeg по одному во время рендеринга, поэтому
+        длинный клип не загружается в память целиком. Кадры другого
+        размера вписываются в разрешение видео с черными полями.
+
+        Args:
+            slide: слайд плана с видеоклипом
+            resolution: разрешение кадра (ширина, высота)
+            fps: частота кадров
+
+        Returns:
+            VideoFileClip: клип нужного размера и длительности
+        """
+        clip = VideoFileClip(slide.source, audio=False)
+        if tuple(clip.size) != tuple(resolution):
+            clip = clip.image_transform(
+                lambda frame: np.asarray(letterbox(Image.fromarray(frame), resolution))
+            )
+        return clip.with_duration(slide.duration).with_fps(fps)
+
+    def _slide_cache(self) -> Optional[PreparedSlideCache]:
+        """Кеш подготовленных слайдов в папке каталога (None - кеш выключен)"""
+        if not self.catalog_folder:
+            return None
+        return PreparedSlideCache(
+            os.path.join(self.catalog_folder, "slides"), self.slide_cache_max_size
+        )
+
+    def _cached_slide(
+        self, image_path: str, resolution: Tuple[int, int], burned=()
+    ) -> Optional[np.ndarray]:
+        """
+        Возвращает подготовленный слайд из кеша, готовя его при промахе
+
+        Слайды хранятся по хешу содержимого из каталога, поэтому
+        заново готовятся только новые и измененные изображения.
+        Слайд со впеченными наложениями хранится отдельно от исходного.
 
         Args:
             image_path: путь к исходному изображению
+            resolution: разрешение слайда (ширина, высота)
+            burned: слои наложений, которые впекаются в кадр слайда
 
         Returns:
-            str: путь к обработанному изображению
+            np.ndarray: кадр нужного разрешения или None, если изображения нет в каталоге
         """
-        try:
-            # Открываем изображение
-            with Image.open(image_path) as img:
-                # Конвертируем в RGB если необходимо
-                if img.mode != "RGB":
-                    img = img.convert("RGB")
+        if Path(image_path).suffix.lower() in self.video_formats:
+            return None
+
+        entry = self.catalog.get(image_path) if self.catalog is not None else None
+        cache = self._slide_cache()
+        if entry is None or cache is None:
+            return None
+
+        pixels = cache.get(entry["hash"], resolution)
+        if pixels is None:
+            pixels = np.asarray(self._letterbox_image(image_path, resolution), dtype=np.uint8)
+            cache.put(entry["hash"], resolution, pixels)
+
+        if burned:
+            burned_hash = f"{entry['hash']}_{overlays_key(burned)}"
+            burned_pixels = cache.get(burned_hash, resolution)
+            if burned_pixels is None:
+                burned_pixels = burn_overlays(pixels, burned)
+                cache.put(burned_hash, resolution, burned_pixels)
+            pixels = burned_pixels
+        return pixels
+
+    def watch(
+        self,
+        images_folder: str,
+        audio_file: str,
+        subtitles_file: Optional[str] = None,
+        output_file: str = "output/result.mp4",
+        interval: float = 2.0,
+    ):
+        """
+        Следит за папкой изображений и пересобирает видео при изменениях
 
-                # Получаем размеры
-                original_width, original_height = img.size
-                target_width, target_height = self.resolution
+        Слайды новых и измененных изображений готовятся сразу при их
+        появлении, остальные берутся из кеша. Остановка - Ctrl-C.
 
-                # Вычисляем пропорции
-                width_ratio = target_width / original_width
-                height_ratio = target_height / original_height
+        Args:
+            images_folder: путь к папке с изображениями
+            audio_file: путь к аудиофайлу
+            subtitles_file: путь к файлу субтитров (опционально)
+            output_file: путь для сохранения готового видео
+            interval: пауза между проверками папки в секундах
+        """
+        self.slide_cache = True
+        # Каждое изменение - новое видео, незавершенные сегменты не нужны
+        self.resumable_render = False
+        self.catalog = ImageCatalog(
+            images_folder,
+            self.image_formats + self.video_formats,
+            index_folder=self.catalog_folder,
+            video_extensions=self.video_formats,
+        )
 
-                # Используем меньший коэффициент, чтобы изображение поместилось целиком
-                scale_ratio = min(width_ratio, height_ratio)
+        print(f"👀 Наблюдение за папкой: {images_folder} (Ctrl-C для выхода)")
+        for changes in self.catalog.watch(interval):
+            print(
+                f"🔁 Изменения: добавлено {len(changes.added)}, "
+                f"изменено {len(changes.changed)}, удалено {len(changes.removed)}"
+            )
 
-                # Новые размеры
-                new_width = int(original_width * scale_ratio)
-                new_height = int(original_height * scale_ratio)
+            for name in changes.updated:
+                try:
+                    self._cached_slide(self.catalog.path_for(name), tuple(self.resolution))
+                except Exception as e:
+                    logging.warning(f"Ошибка подготовки слайда {name}: {e}")
 
-                # Изменяем размер (ИСПРАВЛЕНО: resize вместо resized)
-                resized_img = img.resize(
-                    (new_width, new_height), resample=Image.Resampling.LANCZOS
-                )
+            if not self.catalog.entries:
+                print("⏳ Ждем изображения...")
+                continue
 
-                # Создаем фон нужного размера
-                background = Image.new("RGB", (target_width, target_height), (0, 0, 0))
+            self.create_video(images_folder, audio_file, subtitles_file, output_file)
 
-                # Размещаем изображение по центру
-                paste_x = (target_width - new_width) // 2
-                paste_y = (target_height - new_height) // 2
-                background.paste(resized_img, (paste_x, paste_y))
+    def _letterbox_image(
+        self, image_path: str, resolution: Tuple[int, int]
+    ) -> Image.Image:
+        """
+        Вписывает изображение в заданное разрешение с сохранением пропорций
 
-                # Сохраняем во временную папку
-                temp_path = f"temp/resized_{Path(image_path).name}"
-                os.makedirs("temp", exist_ok=True)
-                background.save(temp_path, quality=95)
+        Args:
+            image_path: путь к исходному изображению
+            resolution: разрешение кадра (ширина, высота)
+
+        Returns:
+            Image.Image: RGB-кадр нужного размера с черными полями
+        """
+        # Открываем изображение
+        with open_image(image_path) as img:
+            return letterbox(img, resolution)
+
+    def _resize_image(self, image_path: str, resolution: Tuple[int, int]) -> str:
+        """
+        Изменяет размер изображения под заданное разрешение с сохранением пропорций
 
-                return temp_path
+        Args:
+            image_path: путь к исходному изображению
+            resolution: разрешение кадра (ширина, высота)
+
+        Returns:
+            str: путь к обработанному изображению
+        """
+        try:
+            background = self._letterbox_image(image_path, resolution)
+
+            # Сохраняем в рабочую папку задачи (в архиве одинаковые имена
+            # могут лежать в разных папках, поэтому путь в архиве - целиком)
+            member = split_member(image_path)
+            name = member[1].replace("/", "_") if member else Path(image_path).name
+            width, height = background.size
+            self.workspace.reserve(width * height * 3, name)
+            temp_path = self.workspace.file(f"resized_{name}")
+            background.save(temp_path, quality=95)
+
+            return temp_path
+
+        except WorkspaceFullError:
+            raise
 
         except Exception as e:
             logging.error(f"Ошибка изменения размера изображения {image_path}: {e}")
             # Возвращаем оригинальный путь в случае ошибки
             return image_path
 
-    def _add_zoom_effect(self, clip):
+    def _open_slide_store(self, plan: RenderPlan) -> SlideStore:
         """
-        Добавляет эффект зума (Ken Burns effect) к видеоклипу
+        Открывает хранилище слайдов плана, пересобирая его только при изменениях
+
+        Готовое хранилище (например, по пути slide_store_path, общему для
+        рабочих процессов фермы) используется повторно, если в нем есть все
+        слайды плана нужного размера, а исходные файлы с тех пор не менялись.
 
         Args:
-            clip: исходный видеоклип
+            plan: план рендеринга
 
         Returns:
-            видеоклип с эффектом зума
+            SlideStore: открытое хранилище слайдов
         """
+        width, height = plan.resolution
+        store_path = self.slide_store_path or self.workspace.file("slides.bin")
+        images = [Path(slide.source) for slide in plan.slides if not slide.is_video]
+
+        if SlideStore.exists(store_path):
+            try:
+                store = SlideStore.open(store_path)
+                keys = {str(image): self._slide_key(image) for image in images}
+                if store.matches(keys, (height, width, 3)):
+                    print(f"♻️ Хранилище слайдов уже готово: {store_path}")
+                    return store
+                store.close()
+            except (OSError, ValueError) as e:
+                logging.info(f"Хранилище слайдов будет пересобрано: {e}")
+
+        self.workspace.reserve(len(images) * width * height * 3, "хранилище слайдов")
+        return self.build_slide_store(images, store_path, (width, height))
+
+    @staticmethod
+    def _slide_key(image_path) -> Optional[str]:
+        """Ключ версии исходного изображения: размер и время изменения файла"""
+        member = split_member(image_path)
         try:
-            # Параметры зума
-            zoom_factor = 1.2  # насколько увеличиваем (1.2 = на 20%)
+            if member is not None:
+                archive, name = member
+                stat = os.stat(archive)
+                return f"{name}:{source_size(image_path)}:{stat.st_mtime_ns}"
+            stat = os.stat(image_path)
+            return f"{stat.st_size}:{stat.st_mtime_ns}"
+        except OSError:
+            return None
 
-            # Случайно выбираем направление зума
-            zoom_in = random.choice([True, False])
+    def build_slide_store(
+        self,
+        image_files: List[Path],
+        store_path: str,
+        resolution: Optional[Tuple[int, int]] = None,
+    ) -> SlideStore:
+        """
+        Подготавливает слайды один раз и записывает их в общее хранилище
 
-            if zoom_in:
-                # Зум внутрь (от большего к меньшему)
-                start_scale = zoom_factor
-                end_scale = 1.0
-            else:
-                # Зум наружу (от меньшего к большему)
-                start_scale = 1.0
-                end_scale = zoom_factor
+        Хранилище отображается в память только для чтения, поэтому
+        рабочие процессы получают кадры без копирования пикселей.
 
+        Args:
+            image_files: список изображений в порядке показа
+            store_path: путь к файлу хранилища
+            resolution: разрешение слайдов (по умолчанию из config)
+
+        Returns:
+            SlideStore: открытое хранилище слайдов
+        """
+        resolution = tuple(resolution or self.resolution)
+
+        def prepared_slides():
+            for image_file in image_files:
+                try:
+                    image = self._letterbox_image(str(image_file), resolution)
+                    pixels = np.asarray(image, dtype=np.uint8)
+                    yield str(image_file), pixels, self._slide_key(image_file)
+                except Exception as e:
+                    logging.warning(f"Ошибка подготовки слайда {image_file}: {e}")
+
+        return SlideStore.build(store_path, prepared_slides())
+
+    def _add_zoom_effect(self, clip, slide: SlidePlan):
+        """
+        Добавляет эффект зума (Ken Burns effect) к видеоклипу
+
+        Масштаб берется из ключевых кадров плана. Кадр увеличивается
+        относительно центра и обрезается, поэтому размер клипа не меняется.
+
+        Args:
+            clip: исходный видеоклип
+            slide: слайд плана с ключевыми кадрами зума
+
+        Returns:
+            видеоклип с эффектом зума
+        """
+        try:
             # Функция для плавного изменения масштаба
-            def resize_func(t):
-                progress = t / clip.duration
-                current_scale = start_scale + (end_scale - start_scale) * progress
-                return current_scale
+            def zoom_transform(get_frame, t):
+                return zoom_frame(get_frame(t), slide.scale_at(t))
 
-            # Применяем плавный зум через resize
-            return clip.resized(resize_func)
+            return clip.transform(zoom_transform)
 
         except Exception as e:
             logging.warning(f"Ошибка добавления эффекта зума: {e}")
             return clip
 
-    def _add_audio(self, video_clip, audio_file: str):
+    def _probe_audio(self, audio_file: str) -> Optional[dict]:
+        """
+        Определяет параметры аудиофайла (через кеш по хешу содержимого)
+
+        Длительность берется из заголовков контейнера; если ее там нет,
+        файл открывается через MoviePy. Громкость и пик измеряются, только
+        если включен audio_loudness_analysis.
+
+        Args:
+            audio_file: путь к аудиофайлу
+
+        Returns:
+            dict: параметры из AudioAnalysisCache.get или None при ошибке
+        """
+        try:
+            cache = AudioAnalysisCache(self.audio_cache_folder)
+            info = cache.get(audio_file, loudness=self.audio_loudness_analysis)
+            if info["duration"] is None:
+                audio_clip = AudioFileClip(audio_file)
+                info["duration"] = audio_clip.duration
+                audio_clip.close()
+            if info["loudness"] is not None:
+                logging.info(
+                    f"Громкость аудио: {info['loudness']:.1f} LUFS, "
+                    f"пик {info['peak']:.1f} dBFS"
+                )
+            return info
+        except Exception as e:
+            logging.error(f"Ошибка чтения аудио: {e}")
+            print(f"⚠️ Продолжаем без аудио из-за ошибки: {e}")
+            return None
+
+    def _plan_audio(
+        self,
+        audio_file: Optional[str],
+        audio_duration: Optional[float],
+        video_duration: float,
+        audio_info: Optional[dict] = None,
+    ):
+        """
+        Определяет операции над аудио для плана
+
+        Args:
+            audio_file: путь к аудиофайлу (или None)
+            audio_duration: длительность аудио (None - аудио нет)
+            video_duration: длительность видеоряда в секундах
+            audio_info: параметры и громкость аудио (см. _probe_audio)
+
+        Returns:
+            tuple: операции AudioOp
+        """
+        if not audio_file or audio_duration is None:
+            return ()
+
+        source = {"path": str(audio_file), "duration": audio_duration}
+        # Измеренная громкость попадает в план для нормализации и фейдов
+        if audio_info and audio_info.get("loudness") is not None:
+            source.update(loudness=audio_info["loudness"], peak=audio_info["peak"])
+        ops = [AudioOp.create("source", **source)]
+
+        # Видео всегда длится столько же, сколько аудио: длинное обрезается,
+        # короткое держит последний кадр до конца музыки
+        if video_duration > audio_duration:
+            ops.append(AudioOp.create("cut_video", duration=audio_duration))
+        elif video_duration < audio_duration:
+            ops.append(AudioOp.create("extend_video", duration=audio_duration))
+
+        return tuple(ops)
+
+    def _add_audio(self, video_clip, plan: RenderPlan):
         """
         Добавляет аудиодорожку к видео
 
         Args:
             video_clip: видеоклип
-            audio_file: путь к аудиофайлу
+            plan: план рендеринга с операциями над аудио
 
         Returns:
             видеоклип с аудио
@@ -333,20 +1688,14 @@ class VideoComposer:
             print(f"⚠️ Продолжаем без аудио из-за ошибки: {e}")
             return video_clip"""
 
-        # Новое определение длительности клипа
+        # Новое определение длительности клипа: решения приняты в плане,
+        # длительность видеоряда уже подогнана в _fit_duration
         try:
-            audio_clip = AudioFileClip(audio_file)
-            video_duration = video_clip.duration
-            audio_duration = audio_clip.duration
-
-            # Обрезаем или растягиваем видео под длину аудио
-            if video_duration > audio_duration:
-                video_clip = video_clip.subclip(0, audio_duration)
-                print(f"🎞️ Видео обрезано до {audio_duration:.1f} секунд")
-            elif audio_duration > video_duration:
-                # Можно зациклить видео, если нужно (по желанию)
-                pass
+            source = plan.audio_source
+            if source is None:
+                return video_clip
 
+            audio_clip = AudioFileClip(source.param("path"))
             final_clip = video_clip.with_audio(audio_clip)
             return final_clip
 
@@ -355,46 +1704,52 @@ class VideoComposer:
             print(f"⚠️ Продолжаем без аудио из-за ошибки: {e}")
             return video_clip
 
-    def _add_subtitles(self, video_clip, subtitles_file: str):
+    def _load_subtitle_cues(self, subtitles_file: str):
+        """
+        Загружает субтитры из файла в реплики плана
+
+        Args:
+            subtitles_file: путь к файлу субтитров (.srt или .vtt, кодировка
+                определяется автоматически)
+
+        Returns:
+            tuple: реплики SubtitleCue
+        """
+        try:
+            # Один проход по файлу, битые реплики пропускаются
+            table = load_subtitles_cached(subtitles_file)
+            logging.info(
+                f"Субтитры {subtitles_file}: {len(table)} реплик ({table.format}, {table.encoding})"
+            )
+            return table.to_cues()
+
+        except Exception as e:
+            logging.error(f"Ошибка чтения субтитров: {e}")
+            print(f"⚠️ Продолжаем без субтитров из-за ошибки: {e}")
+            return ()
+
+    def _add_subtitles(self, video_clip, plan: RenderPlan):
         """
         Добавляет субтитры к видео
 
         Args:
             video_clip: видеоклип
-            subtitles_file: путь к файлу субтитров (.srt)
+            plan: план рендеринга с репликами субтитров
 
         Returns:
             видеоклип с субтитрами
         """
         try:
-            # Загружаем субтитры
-            subtitles = pysrt.open(subtitles_file, encoding="utf-8")
+            style = plan.subtitle_style
+            font = self._subtitle_font(style.font)
 
             # Создаем список текстовых клипов
             subtitle_clips = []
 
-            for subtitle in subtitles:
-                # Конвертируем время из формата SRT в секунды
-                start_time = self._srt_time_to_seconds(subtitle.start)
-                end_time = self._srt_time_to_seconds(subtitle.end)
-                duration = end_time - start_time
-
-                # Создаем текстовый клип
+            for subtitle in plan.cues:
+                # Создаем текстовый клип (как и прямой рендеринг кадров)
                 try:
-                    text_clip = (
-                        TextClip(
-                            subtitle.text,
-                            fontsize=self.subtitle_fontsize,
-                            color=self.subtitle_color,
-                            font="Arial",  # Используем стандартный шрифт
-                            method="caption",
-                            size=(self.resolution[0] - 100, None),  # Отступы по бокам
-                        )
-                        .with_duration(duration)
-                        .with_start(start_time)
-                        .with_position(self.subtitle_position)
-                    )
-
+                    text_clip = subtitle_clip(subtitle, style, font, plan.resolution)
                     subtitle_clips.append(text_clip)
 
                 except Exception as e:
@@ -415,50 +1770,56 @@ class VideoComposer:
             print(f"⚠️ Продолжаем без субтитров из-за ошибки: {e}")
             return video_clip
 
-    def _srt_time_to_seconds(self, srt_time) -> float:
+    def _subtitle_font(self, font: Optional[str]) -> Optional[str]:
         """
-        Конвертирует время из формата SRT в секунды
+        Проверяет шрифт субтитров
+
+        MoviePy 2 принимает только файл шрифта (или имя, которое находит
+        Pillow). Если шрифт не найден, используется шрифт Pillow по умолчанию.
 
         Args:
-            srt_time: время в формате pysrt
+            font: путь к файлу шрифта или имя шрифта
 
         Returns:
-            float: время в секундах
+            str: шрифт для TextClip или None (шрифт по умолчанию)
         """
-        return (
-            srt_time.hours * 3600
-            + srt_time.minutes * 60
-            + srt_time.seconds
-            + srt_time.milliseconds / 1000.0
-        )
+        return subtitle_font(font)
 
-    def _save_video(self, video_clip, output_file: str):
+    def _save_video(
+        self,
+        video_clip,
+        output_file: str,
+        encoder: Optional[EncoderProfile] = None,
+        fps: Optional[float] = None,
+    ):
         """
         Сохраняет готовое видео в файл
 
         Args:
             video_clip: готовый видеоклип
             output_file: путь для сохранения
+            encoder: профиль кодирования (по умолчанию из config)
+            fps: частота кадров (по умолчанию из config)
         """
         try:
             # Создаем папку output если её нет
-            os.makedirs(os.path.dirname(output_file), exist_ok=True)
+            os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
 
             # Настройки кодирования
-            codec = self.config.get("video_codec", "libx264")
-            audio_codec = self.config.get("audio_codec", "aac")
-            bitrate = self.config.get("video_bitrate", "2000k")
+            if encoder is None:
+                encoder = EncoderProfile.from_config(self.config)
 
-            # Сохраняем видео
+            # Сохраняем видео (каждый кадр проверяет бюджет задачи)
             video_clip.write_videofile(
                 output_file,
-                fps=self.fps,
-                codec=codec,
-                audio_codec=audio_codec,
-                bitrate=bitrate,
+                fps=fps or self.fps,
+                threads=self.governor.encoder_threads,
+                codec=encoder.codec,
+                audio_codec=encoder.audio_codec,
+                bitrate=encoder.bitrate,
                 # verbose=False,  # Отключаем подробный вывод FFmpeg
                 # logger=None,  # Отключаем логи MoviePy
-                temp_audiofile="temp/resultTEMP_MPY_wvf_snd.mp4",
+                temp_audiofile=self.workspace.file("resultTEMP_MPY_wvf_snd.mp4"),
             )
 
             print(f"✅ Видео сохранено: {output_file}")
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Изолированные рабочие папки задач
+
+У каждой задачи своя временная папка: уменьшенные изображения,
+временное аудио MoviePy, хранилище слайдов и сегменты лежат в ней,
+поэтому параллельные задачи не перезаписывают файлы друг друга,
+а очистка одной задачи не трогает остальные.
+
+Папку можно разместить в памяти (tmpfs, например /dev/shm), чтобы
+промежуточные файлы не нагружали диск. Лимит размера проверяется
+до записи: задача падает сразу, а не после того, как заполнит диск.
+
+Автор: [@EvilBabayka]
+Дата: 2025
+"""
+
+import os
+import shutil
+import logging
+from pathlib import Path
+from typing import Optional
+
+# Папка tmpfs по умолчанию (есть почти во всех дистрибутивах Linux)
+DEFAULT_RAM_FOLDER = "/dev/shm/video_maker"
+
+
+class WorkspaceFullError(RuntimeError):
+    """Рабочая папка задачи превысила бы лимит размера"""
+
+
+class JobWorkspace:
+    """
+    Временная папка одной задачи
+    """
+
+    def __init__(
+        self,
+        job_id: str,
+        root: str = "temp/jobs",
+        use_ram: bool = False,
+        ram_root: str = DEFAULT_RAM_FOLDER,
+        size_limit: Optional[int] = None,
+    ):
+        """
+        Создает рабочую папку задачи
+
+        Args:
+            job_id: идентификатор задачи (имя папки)
+            root: корневая папка на диске
+            use_ram: разместить папку в tmpfs (если он доступен)
+            ram_root: корневая папка в tmpfs
+            size_limit: лимит размера папки в байтах (None - без лимита)
+        """
+        self.job_id = job_id
+        self.size_limit = size_limit
+        self.in_ram = False
+
+        if use_ram:
+            if os.path.isdir(os.path.dirname(ram_root.rstrip("/")) or "/"):
+                root = ram_root
+                self.in_ram = True
+            else:
+                logging.warning(
+                    f"tmpfs {ram_root} недоступен, рабочая папка будет на диске"
+                )
+
+        self.path = Path(root) / job_id
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        # Занятое место с учетом резервов: обходить папку на каждый резерв
+        # дорого (в ней остается каждый уменьшенный слайд)
+        self._used = self.usage()
+
+    def file(self, name: str) -> str:
+        """Возвращает путь к файлу внутри рабочей папки"""
+        return str(self.path / name)
+
+    def subdir(self, name: str) -> str:
+        """Создает (если нужно) и возвращает подпапку рабочей папки"""
+        folder = self.path / name
+        folder.mkdir(parents=True, exist_ok=True)
+        return str(folder)
+
+    def usage(self) -> int:
+        """Текущий размер рабочей папки в байтах"""
+        total = 0
+        for folder, _, files in os.walk(self.path):
+            for filename in files:
+                try:
+                    total += os.path.getsize(os.path.join(folder, filename))
+                except OSError:
+                    # Файл могли удалить во время обхода
+                    pass
+        return total
+
+    def reserve(self, nbytes: int, what: str = "данные"):
+        """
+        Проверяет, что запись еще nbytes байт не превысит лимиты
+
+        Проверяется и лимит задачи, и свободное место на файловой системе.
+        Резервы складываются в счетчик; папка обходится заново, только когда
+        по счетчику лимит превышен (резерв обычно больше записанного файла).
+
+        Args:
+            nbytes: сколько байт собираемся записать
+            what: что записываем (для сообщения об ошибке)
+
+        Raises:
+            WorkspaceFullError: если места не хватит
+        """
+        if self.size_limit is not None and self._used + nbytes > self.size_limit:
+            self._used = self.usage()
+        used = self._used
+
+        if self.size_limit is not None and used + nbytes > self.size_limit:
+            raise WorkspaceFullError(
+                f"Рабочая папка {self.path} превысит лимит: {what} "
+                f"({nbytes / (1024 * 1024):.1f} МБ), уже занято "
+                f"{used / (1024 * 1024):.1f} из {self.size_limit / (1024 * 1024):.1f} МБ"
+            )
+
+        free = shutil.disk_usage(self.path).free
+        if nbytes > free:
+            raise WorkspaceFullError(
+                f"Недостаточно места для {what} в {self.path}: нужно "
+                f"{nbytes / (1024 * 1024):.1f} МБ, свободно {free / (1024 * 1024):.1f} МБ"
+            )
+
+        self._used = used + nbytes
+
+    def check(self):
+        """
+        Проверяет лимит после записи
+
+        Raises:
+            WorkspaceFullError: если лимит уже превышен
+        """
+        self._used = self.usage()
+        self.reserve(0)
+
+    def cleanup(self):
+        """Удаляет рабочую папку задачи целиком"""
+        if self.path.exists():
+            shutil.rmtree(self.path, ignore_errors=True)
+            logging.info(f"Рабочая папка задачи удалена: {self.path}")